@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from src.config import Config
+from src.fakes import make_fake_llm
+from src.pdf_processor import PDFProcessor
+from src.vector_db import VectorStore
+from src.query_engine import QueryEngine
+from benchmarks.synthetic_pdfs import ACTIONS, EQUIPMENT, generate_library
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# End-to-end benchmark of ingestion, indexing and querying over synthetic
+# manuals, with deterministic fake embeddings and LLM so that runs only
+# measure this code. Results are printed as JSON to diff between runs:
+#
+#   python -m benchmarks.run --digital-pdfs 10 --scanned-pdfs 2 --pages 20 --output bench.json
+
+
+def percentile(values, q: float) -> float:
+    """The q-th percentile (0-100) of values, by linear interpolation."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def latency_summary(seconds) -> dict:
+    return {
+        "count": len(seconds),
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "max_ms": max(seconds, default=0.0) * 1000,
+    }
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its (OCR) child processes."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+    }
+
+
+def ocr_available() -> bool:
+    return shutil.which("tesseract") is not None and shutil.which("pdfinfo") is not None
+
+
+def make_queries(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        f"How do I {rng.choice(ACTIONS).lower()} the {rng.choice(EQUIPMENT)} valve V-{rng.randint(100, 999)}?"
+        for _ in range(count)
+    ]
+
+
+def bench_ingest(folder: str) -> tuple:
+    """Load every PDF of a folder; returns the pages and the elapsed seconds."""
+    start = time.perf_counter()
+    docs = PDFProcessor(folder).load_pdfs()
+    return docs, time.perf_counter() - start
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ship-ai-bench-")
+    # Caches would turn repeated runs into cache benchmarks.
+    Config.OCR_CACHE_ENABLED = False
+    results = {
+        "parameters": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": multiprocessing.cpu_count(),
+        },
+    }
+    try:
+        digital_folder = os.path.join(workdir, "digital")
+        scanned_folder = os.path.join(workdir, "scanned")
+        generate_library(digital_folder, args.digital_pdfs, 0, args.pages, seed=args.seed)
+        generate_library(scanned_folder, 0, args.scanned_pdfs, args.pages, seed=args.seed)
+
+        docs, seconds = bench_ingest(digital_folder)
+        results["ingest"] = {
+            "pages": len(docs),
+            "seconds": seconds,
+            "pages_per_second": len(docs) / seconds if seconds else 0.0,
+        }
+
+        if args.scanned_pdfs and ocr_available():
+            workers = Config.OCR_MAX_WORKERS or multiprocessing.cpu_count()
+            ocr_docs, seconds = bench_ingest(scanned_folder)
+            pages_per_second = len(ocr_docs) / seconds if seconds else 0.0
+            results["ocr"] = {
+                "pages": len(ocr_docs),
+                "seconds": seconds,
+                "workers": workers,
+                "pages_per_second": pages_per_second,
+                "pages_per_second_per_core": pages_per_second / workers,
+            }
+            docs = docs + ocr_docs
+        else:
+            reason = "no scanned PDFs requested" if not args.scanned_pdfs else "tesseract or poppler not installed"
+            results["ocr"] = {"skipped": reason}
+
+        processor = PDFProcessor(workdir)
+        start = time.perf_counter()
+        chunks = processor.split_documents(docs)
+        results["split"] = {"chunks": len(chunks), "seconds": time.perf_counter() - start}
+
+        embeddings = DeterministicFakeEmbedding(size=args.embedding_size)
+        vector_store = VectorStore(
+            persist_directory=os.path.join(workdir, "chroma"),
+            embeddings=embeddings,
+            lexical_index_path=os.path.join(workdir, "bm25_index.json"),
+        )
+        start = time.perf_counter()
+        vector_store.create_db(chunks)
+        index_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        retriever = vector_store.get_hybrid_retriever() if args.hybrid else vector_store.get_retriever()
+        results["index"] = {
+            "chunks": len(chunks),
+            "build_seconds": index_seconds,
+            "lexical_build_seconds": time.perf_counter() - start,
+        }
+
+        queries = make_queries(args.queries, seed=args.seed)
+        latencies = []
+        for question in queries:
+            start = time.perf_counter()
+            retriever.invoke(question)
+            latencies.append(time.perf_counter() - start)
+        results["retrieval"] = latency_summary(latencies)
+
+        engine = QueryEngine(vector_store, retriever, llm=make_fake_llm())
+        latencies = []
+        for question in queries:
+            # Every question is a first turn, as the fake answers are unrelated.
+            engine.memory.clear()
+            start = time.perf_counter()
+            engine.query(question)
+            latencies.append(time.perf_counter() - start)
+        results["query"] = latency_summary(latencies)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on synthetic manuals.")
+    parser.add_argument("--digital-pdfs", type=int, default=10)
+    parser.add_argument("--scanned-pdfs", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=20, help="Pages per PDF.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--embedding-size", type=int, default=1536)
+    parser.add_argument("--no-hybrid", dest="hybrid", action="store_false",
+                        help="Benchmark dense retrieval only.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    # Keep the per-query INFO logs of the pipeline out of the report.
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run(args)
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
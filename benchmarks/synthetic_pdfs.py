@@ -0,0 +1,117 @@
+import os
+import random
+from PIL import Image, ImageDraw, ImageFont
+
+# Deterministic synthetic ship manuals for the benchmarks: "digital" PDFs with
+# a text layer, written directly in PDF syntax, and "scanned" PDFs made of
+# page images only, which have to go through OCR.
+
+EQUIPMENT = [
+    "fuel oil separator", "main engine", "auxiliary boiler", "lubricating oil pump",
+    "fresh water generator", "air compressor", "steering gear", "ballast pump",
+    "sewage treatment plant", "incinerator", "purifier bowl", "cylinder head",
+]
+ACTIONS = [
+    "Inspect", "Clean", "Replace", "Tighten", "Drain", "Purge", "Calibrate",
+    "Lubricate", "Isolate", "Pressure test", "Overhaul", "Record",
+]
+DETAILS = [
+    "before restarting the unit", "every 500 running hours", "after each voyage",
+    "according to the maker's instructions", "with the system depressurised",
+    "and log the result in the engine log book", "using the special tool supplied",
+    "while wearing protective equipment", "once per watch", "at the next port call",
+]
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+LINES_PER_PAGE = 45
+
+
+def make_line(rng: random.Random) -> str:
+    """One line of manual-like text with part numbers and alarm codes."""
+    return (
+        f"{rng.choice(ACTIONS)} the {rng.choice(EQUIPMENT)} valve V-{rng.randint(100, 999)} "
+        f"{rng.choice(DETAILS)}. Alarm ALM-{rng.randint(1000, 9999)}."
+    )
+
+
+def make_pages(num_pages: int, seed: int = 0):
+    """Return num_pages pages, each a list of text lines, deterministically."""
+    rng = random.Random(seed)
+    return [
+        [f"Chapter {page + 1}"] + [make_line(rng) for _ in range(LINES_PER_PAGE - 1)]
+        for page in range(num_pages)
+    ]
+
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_digital_pdf(path: str, pages):
+    """Write a PDF whose pages carry the given lines as a Helvetica text layer."""
+    num_pages = len(pages)
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page.
+    page_ids = [4 + 2 * i for i in range(num_pages)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{page_id} 0 R" for page_id in page_ids), num_pages
+        )).encode("latin-1"),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id, lines in zip(page_ids, pages):
+        text = "".join(f"({escape_pdf_text(line)}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 {PAGE_HEIGHT - 50} Td {text}ET".encode("latin-1")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode("latin-1")
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for number in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_scanned_pdf(path: str, pages, dpi: int = 100):
+    """Write a PDF of page images with no text layer, as a scanner would."""
+    width, height = PAGE_WIDTH * dpi // 72, PAGE_HEIGHT * dpi // 72
+    try:
+        font = ImageFont.load_default(size=max(10, dpi // 7))
+    except TypeError:
+        font = ImageFont.load_default()
+    images = []
+    for lines in pages:
+        image = Image.new("L", (width, height), color=255)
+        draw = ImageDraw.Draw(image)
+        y = dpi // 2
+        for line in lines:
+            draw.text((dpi // 2, y), line, fill=0, font=font)
+            y += height // (LINES_PER_PAGE + 4)
+        images.append(image)
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+
+
+def generate_library(folder: str, digital_pdfs: int, scanned_pdfs: int, pages_per_pdf: int, seed: int = 0):
+    """Write a library of synthetic manuals into folder and return their paths."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(digital_pdfs):
+        path = os.path.join(folder, f"digital_{i:03d}.pdf")
+        write_digital_pdf(path, make_pages(pages_per_pdf, seed=seed + i))
+        paths.append(path)
+    for i in range(scanned_pdfs):
+        path = os.path.join(folder, f"scanned_{i:03d}.pdf")
+        write_scanned_pdf(path, make_pages(pages_per_pdf, seed=seed + 1000 + i))
+        paths.append(path)
+    return paths
@@ -0,0 +1,46 @@
+import argparse
+import logging
+import uvicorn
+from src.config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def build_engine_factory(fake: bool = False, latency: float = 0.0):
+    """Return the function creating the QueryEngine of each conversation."""
+    if fake:
+        from src.fakes import fake_engine_factory
+        return fake_engine_factory(latency=latency)
+
+    from src.ingest import initialize_vector_store
+    from src.query_engine import QueryEngine
+    from src.resources import get_answer_cache, get_retriever
+    vector_store = initialize_vector_store()
+    if vector_store is None:
+        raise SystemExit("No PDF documents found in the data folder.")
+    retriever = get_retriever(vector_store)
+    return lambda: QueryEngine(vector_store, retriever, answer_cache=get_answer_cache())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless HTTP query service for the Ship AI Agent.")
+    parser.add_argument("--host", default=Config.API_HOST)
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    parser.add_argument("--fake", action="store_true",
+                        help="Use fake LLM and embedding backends (no API key or network needed).")
+    parser.add_argument("--fake-latency", type=float, default=0.0,
+                        help="Simulated latency in seconds of each fake LLM call.")
+    parser.add_argument("--no-metrics", dest="metrics", action="store_false",
+                        help="Disable the instrumentation served on /metrics.")
+    args = parser.parse_args()
+
+    from src.api import create_app
+    from src.telemetry import telemetry
+    telemetry.enabled = args.metrics
+    app = create_app(build_engine_factory(args.fake, args.fake_latency))
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from src.config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def cosine_similarity(a, b, norm_a=None, norm_b=None) -> float:
+    norm_a = norm_a or math.sqrt(sum(x * x for x in a))
+    norm_b = norm_b or math.sqrt(sum(x * x for x in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return sum(x * y for x, y in zip(a, b)) / (norm_a * norm_b)
+
+
+class AnswerCache:
+    """
+    In-memory cache of answers to first-turn questions.
+
+    An answer is reused for a new question whose embedding is at least
+    ``similarity_threshold`` similar to the cached question, but only within
+    the same scope: the index version and the set of retrieved chunk IDs. A
+    change to the manuals, or a question that retrieves different chunks,
+    therefore never gets a stale answer. Entries are evicted least recently
+    used first once ``max_entries`` is reached, and expire after ``ttl_seconds``.
+    """
+
+    def __init__(self, similarity_threshold: float = Config.ANSWER_CACHE_SIMILARITY,
+                 max_entries: int = Config.ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = Config.ANSWER_CACHE_TTL_SECONDS,
+                 clock=time.monotonic):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        # entry id -> (scope, vector, norm, answer, created), least recently used first.
+        self._entries = OrderedDict()
+        self._scopes = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_scope(index_version: str, chunk_ids) -> str:
+        """Build the scope of an answer from the index version and retrieved chunk IDs."""
+        digest = hashlib.sha256(index_version.encode("utf-8"))
+        for chunk_id in sorted(set(chunk_ids)):
+            digest.update(b"\0" + chunk_id.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, vector, scope: str):
+        """Return the cached answer for a similar question in the same scope, or None."""
+        norm = math.sqrt(sum(x * x for x in vector))
+        now = self.clock()
+        with self._lock:
+            best_id, best_similarity = None, self.similarity_threshold
+            for entry_id in list(self._scopes.get(scope, ())):
+                _, cached_vector, cached_norm, _, created = self._entries[entry_id]
+                if now - created > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                similarity = cosine_similarity(vector, cached_vector, norm, cached_norm)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][3]
+
+    def put(self, vector, scope: str, answer: str):
+        """Cache an answer, evicting the least recently used entries if full."""
+        norm = math.sqrt(sum(x * x for x in vector))
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, list(vector), norm, answer, self.clock())
+            self._scopes.setdefault(scope, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id):
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._scopes[scope]
+        ids.discard(entry_id)
+        if not ids:
+            del self._scopes[scope]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
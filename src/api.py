@@ -0,0 +1,147 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from src.config import Config
+from src.telemetry import telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1)
+    # Omit to start a new conversation.
+    session_id: Optional[str] = None
+
+
+class QueryResponse(BaseModel):
+    session_id: str
+    answer: str
+    sources: list
+    timings: dict
+
+
+class Session:
+    """One conversation: its QueryEngine and a lock serializing its turns."""
+
+    def __init__(self, engine, now: float):
+        self.engine = engine
+        self.lock = asyncio.Lock()
+        self.last_used = now
+
+
+class SessionStore:
+    """
+    Conversations of the service keyed by session ID. Sessions idle for longer
+    than ttl_seconds are dropped, and the least recently used session is
+    dropped once max_sessions is reached.
+    """
+
+    def __init__(self, engine_factory, max_sessions: int = Config.API_MAX_SESSIONS,
+                 ttl_seconds: float = Config.API_SESSION_TTL_SECONDS, clock=time.monotonic):
+        self.engine_factory = engine_factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self) -> str:
+        """Start a new conversation and return its session ID."""
+        session_id = uuid.uuid4().hex
+        session = Session(self.engine_factory(), self.clock())
+        with self._lock:
+            self._expire()
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = self.clock()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        now = self.clock()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+
+def create_app(engine_factory, max_concurrent_requests: int = Config.API_MAX_CONCURRENT_REQUESTS,
+               request_timeout: float = Config.API_REQUEST_TIMEOUT, sessions: SessionStore = None) -> FastAPI:
+    """
+    Build the HTTP service. engine_factory creates the QueryEngine of each new
+    conversation. At most max_concurrent_requests queries are processed at
+    once; further requests wait for a free slot, and a request that has not
+    been answered within request_timeout seconds fails with 504.
+    """
+    app = FastAPI(title="Ship AI Agent")
+    app.state.sessions = sessions or SessionStore(engine_factory)
+    app.state.request_slots = asyncio.Semaphore(max_concurrent_requests)
+
+    async def answer_question(session: Session, question: str):
+        async with app.state.request_slots:
+            # Turns of one conversation are answered in order.
+            async with session.lock:
+                engine = session.engine
+                answer = await engine.aquery(question)
+                return answer, engine.last_sources, engine.last_timings
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "sessions": len(app.state.sessions)}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return telemetry.render_prometheus()
+
+    @app.post("/sessions")
+    async def create_session():
+        return {"session_id": app.state.sessions.create()}
+
+    @app.delete("/sessions/{session_id}")
+    async def delete_session(session_id: str):
+        if not app.state.sessions.delete(session_id):
+            raise HTTPException(status_code=404, detail="Unknown session.")
+        return {"session_id": session_id}
+
+    @app.post("/query", response_model=QueryResponse)
+    async def query(request: QueryRequest):
+        session_id = request.session_id or app.state.sessions.create()
+        session = app.state.sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired session.")
+        try:
+            with telemetry.span("api_query"):
+                answer, sources, timings = await asyncio.wait_for(
+                    answer_question(session, request.question), timeout=request_timeout
+                )
+        except asyncio.TimeoutError:
+            # Raised by wait_for, or when no LLM slot became free in time.
+            logger.warning("Query timed out in session %s.", session_id)
+            raise HTTPException(status_code=504, detail="The query timed out.")
+        return QueryResponse(session_id=session_id, answer=answer, sources=sources, timings=timings)
+
+    return app
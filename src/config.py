@@ -1,29 +1,205 @@
 import os
 import logging
-from dotenv import load_dotenv
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env
-load_dotenv()
-logger.info("Environment variables loaded from the .env file.")
+_environment_loaded = False
 
-class Config:
-    # OpenAI API key is loaded from the .env file
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    if OPENAI_API_KEY is None:
-        logger.error("OPENAI_API_KEY is not set in the .env file.")
-        raise ValueError("Please set your OPENAI_API_KEY in the .env file.")
-    else:
-        logger.info("OPENAI_API_KEY successfully loaded.")
+def load_environment():
+    """Load environment variables from the .env file, once."""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+        logger.info("Environment variables loaded from the .env file.")
 
+class LazyConfig(type):
+    """
+    Resolves the settings read from the environment on first access rather
+    than at import, so importing the configuration loads nothing and a
+    missing API key only fails the code that needs it.
+    """
+
+    def __getattr__(cls, name):
+        if name == "OPENAI_API_KEY":
+            # OpenAI API key is loaded from the .env file
+            load_environment()
+            value = os.getenv("OPENAI_API_KEY")
+            if value is None:
+                logger.error("OPENAI_API_KEY is not set in the .env file.")
+                raise ValueError("Please set your OPENAI_API_KEY in the .env file.")
+            logger.info("OPENAI_API_KEY successfully loaded.")
+        elif name == "SNAPSHOT_PATH":
+            # Prebuilt index snapshot (python -m src.snapshot export) imported
+            # on startup when there is no local vector database yet
+            load_environment()
+            value = os.getenv("SNAPSHOT_PATH")
+        else:
+            raise AttributeError(f"type object {cls.__name__!r} has no attribute {name!r}")
+        setattr(cls, name, value)
+        return value
+
+class Config(metaclass=LazyConfig):
     # Absolute path to the data folder (PDF files)
     DATA_FOLDER = "./data"
     
+    # Vector database backend: "chroma", or "numpy" for the compact
+    # memory-mapped store (see src/numpy_store.py)
+    VECTOR_BACKEND = "chroma"
+
     # Directory to persist the Chroma vector database
     CHROMA_DB_DIR = "./chroma_db"
+
+    # Per-manual sharding: every PDF gets its own collection of the backend
+    # above, under SHARDED_DB_DIR, and queries only search the shards whose
+    # centroid and keyword summary (the terms in most of the manual's chunks)
+    # best match them, several at once
+    VECTOR_SHARDING = False
+    SHARDED_DB_DIR = "./sharded_db"
+    SHARDS_PER_QUERY = 3
+    SHARD_KEYWORD_WEIGHT = 0.5
+    SHARD_SUMMARY_TERMS = 500
+    SHARD_SEARCH_WORKERS = 4
+
+    # Directory of the NumPy vector store, the dtype its vectors are stored
+    # in ("float32", "float16" or "int8") and its inverted file index: number
+    # of lists (0 searches every vector) and lists searched per query
+    NUMPY_DB_DIR = "./numpy_db"
+    NUMPY_VECTOR_DTYPE = "float16"
+    NUMPY_IVF_LISTS = 0
+    NUMPY_IVF_PROBES = 8
+
+    # Directory holding ingestion state kept alongside the vector database
+    INDEX_STATE_DIR = "./index_state"
+
+    # Manifest of ingested PDFs (size, mtime, content hash and chunk IDs)
+    MANIFEST_PATH = os.path.join(INDEX_STATE_DIR, "manifest.json")
     
+    # Directory for local caches (OCR results, embeddings, ...)
+    CACHE_DIR = "./.cache"
+
+    # Persistent per-page OCR result cache and its size limit
+    OCR_CACHE_ENABLED = True
+    OCR_CACHE_PATH = os.path.join(CACHE_DIR, "ocr_cache.sqlite3")
+    OCR_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+    # Rasterization resolution and Tesseract options for scanned PDFs. Pages
+    # are rasterized in grayscale at OCR_DPI and OCR'd again at each of
+    # OCR_RESCAN_DPIS in turn while Tesseract's mean word confidence (0-100)
+    # stays below OCR_MIN_CONFIDENCE
+    OCR_DPI = 150
+    OCR_RESCAN_DPIS = (300,)
+    OCR_MIN_CONFIDENCE = 70.0
+    OCR_GRAYSCALE = True
+    TESSERACT_CONFIG = ""
+
+    # Pages with less than this share of dark pixels are blank and not OCR'd
+    OCR_BLANK_INK_RATIO = 0.002
+
+    # Shared OCR process pool (None uses every CPU core) and work unit sizing
+    OCR_MAX_WORKERS = None
+    OCR_TARGET_UNIT_SECONDS = 10.0
+    OCR_MAX_UNIT_PAGES = 10
+
+    # A page's text layer is only trusted if it has at least this many
+    # alphanumeric characters and they make up this share of its non-space text
+    OCR_MIN_TEXT_CHARS = 20
+    OCR_MIN_ALNUM_RATIO = 0.5
+
+    # Embedding model and the local cache of document and query embeddings
+    EMBEDDING_MODEL = "text-embedding-ada-002"
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+
+    # Persistent BM25 index built from the same chunks as the vector database
+    LEXICAL_INDEX_PATH = os.path.join(INDEX_STATE_DIR, "bm25_index.json")
+
+    # Hybrid retrieval: chunks taken from the dense and lexical searches and
+    # the number of chunks kept after reciprocal rank fusion
+    HYBRID_RETRIEVAL = True
+    DENSE_K = 3
+    LEXICAL_K = 5
+    HYBRID_K = 4
+
+    # Chat model used to answer questions
+    LLM_MODEL = "gpt-4-turbo-preview"
+
+    # Smaller model used to rewrite follow-up questions and summarize history
+    CONDENSE_MODEL = "gpt-4o-mini"
+
+    # Questions with at least this many words and no reference to earlier
+    # turns are retrieved for directly, skipping the condensing LLM call
+    SELF_CONTAINED_MIN_WORDS = 5
+
+    # Retrieve on the raw question while the follow-up is being condensed,
+    # reusing the result if the standalone question shares this many words
+    SPECULATIVE_RETRIEVAL = True
+    SPECULATION_WORKERS = 4
+    SPECULATION_REUSE_THRESHOLD = 0.8
+
+    # Token budget of the retrieved context and the shingle overlap above
+    # which a context section counts as a near-duplicate of another
+    CONTEXT_MAX_TOKENS = 3000
+    CONTEXT_DUPLICATE_THRESHOLD = 0.8
+
+    # Conversation memory: turns kept verbatim and the token ceiling of the
+    # history (older turns are folded into a rolling summary)
+    MEMORY_KEEP_TURNS = 4
+    MEMORY_MAX_TOKENS = 1500
+
+    # Answers to first-turn questions are reused for questions whose embedding
+    # is at least this similar and that retrieve the same chunks; entries are
+    # evicted least recently used first and expire after the TTL
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_SIMILARITY = 0.95
+    ANSWER_CACHE_MAX_ENTRIES = 1000
+    ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+
+    # Clients shared by every session: HTTP connection pool size, LLM calls
+    # allowed in flight at once (further calls queue) and how long a call
+    # may wait for a slot before failing
+    HTTP_MAX_CONNECTIONS = 20
+    LLM_MAX_CONCURRENCY = 8
+    LLM_QUEUE_TIMEOUT = 120.0
+
+    # Headless HTTP service (service.py): address, requests handled at once
+    # (further requests wait), per-request timeout and conversation sessions
+    API_HOST = "0.0.0.0"
+    API_PORT = 8000
+    API_MAX_CONCURRENT_REQUESTS = 32
+    API_REQUEST_TIMEOUT = 60.0
+    API_MAX_SESSIONS = 1000
+    API_SESSION_TTL_SECONDS = 3600
+
+    # Instrumentation: stage timings and counters of ingestion and queries,
+    # optionally logged as JSON lines, and the port of the Prometheus
+    # endpoint of the Streamlit app (the HTTP service serves /metrics)
+    TELEMETRY_ENABLED = False
+    TELEMETRY_JSON_LOGS = False
+    METRICS_PORT = None
+
+    # Streaming ingestion: PDFs whose OCR is scheduled together and the
+    # number of chunks embedded and upserted per checkpointed batch
+    INGEST_LOOKAHEAD_FILES = 8
+    INGEST_BATCH_SIZE = 256
+
+    # Ingest-time clean-up of each PDF: lines (headers, footers, revision
+    # blocks, recurring warnings) found on at least this share of its pages,
+    # and on at least this many, are kept only on the first page they are on
+    BOILERPLATE_REMOVAL_ENABLED = True
+    BOILERPLATE_MIN_PAGE_RATIO = 0.5
+    BOILERPLATE_MIN_PAGES = 3
+
+    # Chunks of a PDF whose estimated word-shingle Jaccard similarity to an
+    # earlier chunk reaches this threshold are dropped, and the earlier chunk
+    # lists their pages (MinHash signatures, LSH banding for candidates)
+    NEAR_DUPLICATE_REMOVAL_ENABLED = True
+    NEAR_DUPLICATE_THRESHOLD = 0.85
+    MINHASH_PERMUTATIONS = 64
+    MINHASH_BANDS = 16
+
     # Parameters for splitting documents
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
@@ -0,0 +1,154 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Any, Optional
+from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
+from src.config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Header prepended to every chunk by PDFProcessor.split_documents().
+HEADER_PATTERN = re.compile(r"^\[(?P<source>.*) - Page (?P<page>[^\]]*)\]\n")
+
+# Shortest suffix/prefix overlap treated as the same text when merging chunks.
+MIN_MERGE_OVERLAP = 20
+
+
+@lru_cache(maxsize=None)
+def make_token_counter(model: str = Config.LLM_MODEL):
+    """
+    Return a function counting tokens with tiktoken for the given model,
+    falling back to a rough estimate if the encoding cannot be loaded.
+    The counter is created once per model and shared.
+    """
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"Could not load a tiktoken encoding, estimating tokens instead: {e}")
+        return lambda text: (len(text) + 3) // 4
+
+
+def merge_overlapping(first: str, second: str) -> str:
+    """
+    Merge two chunks of the same page. Chunks produced with CHUNK_OVERLAP share
+    a suffix/prefix, which is kept only once; contained chunks are dropped.
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+    for a, b in ((first, second), (second, first)):
+        for size in range(min(len(a), len(b)), MIN_MERGE_OVERLAP - 1, -1):
+            if a.endswith(b[:size]):
+                return a + b[size:]
+    return first + "\n" + second
+
+
+def shingles(text: str, size: int = 5):
+    """Return the set of word n-grams of a text, used to spot near-duplicates."""
+    words = text.lower().split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextPacker:
+    """
+    Assembles retrieved chunks into the context passed to the LLM.
+
+    Chunks from the same source page are merged into one section with a single
+    "[file - Page N]" header, sections that are near-duplicates of a better
+    ranked one are dropped, and sections are packed in rank order into an
+    explicit token budget.
+    """
+
+    def __init__(self, max_tokens: int = Config.CONTEXT_MAX_TOKENS,
+                 duplicate_threshold: float = Config.CONTEXT_DUPLICATE_THRESHOLD,
+                 token_counter=None):
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self._token_counter = token_counter
+
+    def count_tokens(self, text: str) -> int:
+        # The tiktoken encoding is only loaded when the first context is packed.
+        if self._token_counter is None:
+            self._token_counter = make_token_counter()
+        return self._token_counter(text)
+
+    def merge_pages(self, docs):
+        """Group chunks by source page, in order of each page's best rank."""
+        sections = {}
+        for doc in docs:
+            text = doc.page_content
+            match = HEADER_PATTERN.match(text)
+            if match:
+                text = text[match.end():]
+            source = doc.metadata.get("source", match.group("source") if match else "Unknown PDF")
+            page = doc.metadata.get("page", match.group("page") if match else "Unknown Page")
+            key = (source, str(page))
+            if key in sections:
+                sections[key]["text"] = merge_overlapping(sections[key]["text"], text)
+            else:
+                sections[key] = {"source": source, "page": page, "text": text, "metadata": dict(doc.metadata),
+                                 "chunk_ids": []}
+            if doc.id:
+                sections[key]["chunk_ids"].append(doc.id)
+        return list(sections.values())
+
+    def drop_duplicates(self, sections):
+        """Drop sections whose shingles mostly repeat those of a better ranked section."""
+        kept = []
+        kept_shingles = []
+        for section in sections:
+            current = shingles(section["text"])
+            duplicate = any(
+                len(current & other) / len(current | other) >= self.duplicate_threshold
+                for other in kept_shingles
+            )
+            if not duplicate:
+                kept.append(section)
+                kept_shingles.append(current)
+        return kept
+
+    def pack(self, docs, max_sections=None):
+        """Return the merged, de-duplicated sections that fit in the token budget."""
+        sections = self.drop_duplicates(self.merge_pages(docs))
+        packed = []
+        used = 0
+        for section in sections:
+            if max_sections is not None and len(packed) >= max_sections:
+                break
+            content = f"[{section['source']} - Page {section['page']}]\n{section['text']}"
+            tokens = self.count_tokens(content)
+            if used + tokens > self.max_tokens:
+                if packed:
+                    # Smaller, lower ranked sections may still fit.
+                    continue
+                # Never return an empty context: truncate the best section instead.
+                while content and tokens > self.max_tokens:
+                    content = content[:int(len(content) * self.max_tokens / tokens * 0.95)]
+                    tokens = self.count_tokens(content)
+            used += tokens
+            metadata = dict(section["metadata"], chunk_ids=section["chunk_ids"])
+            packed.append(Document(page_content=content, metadata=metadata))
+        logger.info(f"Packed {len(packed)} of {len(sections)} context sections into {used} tokens.")
+        return packed
+
+
+class PackedRetriever(BaseRetriever):
+    """Retriever that passes the results of another retriever through a ContextPacker."""
+
+    base_retriever: Any
+    packer: Any
+    max_sections: Optional[int] = None
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        docs = self.base_retriever.invoke(query)
+        return self.packer.pack(docs, max_sections=self.max_sections)
@@ -0,0 +1,185 @@
+import re
+import zlib
+import logging
+from collections import Counter, defaultdict
+import numpy as np
+from langchain.schema import Document
+from src.config import Config
+from src.context_packer import shingles
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Mersenne prime modulus of the MinHash permutations (a * x + b) % p, small
+# enough for the products of 31-bit values to fit in 64 bits.
+MINHASH_PRIME = (1 << 31) - 1
+
+# Lines at the top and bottom of a page considered header and footer lines.
+EDGE_LINES = 2
+
+DIGITS = re.compile(r"\d+")
+# Tokens holding a digit: part numbers, alarm codes, values and step numbers.
+IDENTIFIER = re.compile(r"\w*\d\w*")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_line(line: str, mask_digits: bool = False) -> str:
+    """
+    Canonical form of a line for spotting repeats. With mask_digits, numbers
+    are masked too, so that running headers and footers whose page number,
+    date or revision changes from page to page still match.
+    """
+    if mask_digits:
+        line = DIGITS.sub("#", line)
+    return WHITESPACE.sub(" ", line).strip().lower()
+
+
+def line_keys(text: str):
+    """
+    Return the repeat key of every line of a page. Numbers are only masked
+    in the first and last EDGE_LINES lines, where headers and footers are,
+    so body lines differing only in a part number or value never match.
+    """
+    lines = text.splitlines()
+    return [
+        (line, normalize_line(line, mask_digits=i < EDGE_LINES or i >= len(lines) - EDGE_LINES))
+        for i, line in enumerate(lines)
+    ]
+
+
+def identifiers(text: str) -> frozenset:
+    """Return the number- and code-bearing tokens of a text, lower-cased."""
+    return frozenset(token.lower() for token in IDENTIFIER.findall(text))
+
+
+def group_by_source(docs):
+    """Group documents by their "source" metadata, keeping their order."""
+    groups = defaultdict(list)
+    for doc in docs:
+        groups[doc.metadata.get("source")].append(doc)
+    return list(groups.values())
+
+
+def repeated_lines(pages, min_ratio: float = Config.BOILERPLATE_MIN_PAGE_RATIO,
+                   min_pages: int = Config.BOILERPLATE_MIN_PAGES):
+    """Return the line keys found on at least min_ratio (and min_pages) of the pages."""
+    threshold = max(min_pages, min_ratio * len(pages))
+    counts = Counter()
+    for page in pages:
+        counts.update({key for _, key in line_keys(page.page_content)} - {""})
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def strip_boilerplate(docs, min_ratio: float = Config.BOILERPLATE_MIN_PAGE_RATIO,
+                      min_pages: int = Config.BOILERPLATE_MIN_PAGES):
+    """
+    Remove the lines repeated across many pages of the same PDF (headers,
+    footers, revision blocks, recurring warnings). Each repeated line is kept
+    on the first page it appears on, so its content can still be retrieved
+    once. Returns new page documents.
+    """
+    cleaned = []
+    removed = 0
+    for pages in group_by_source(docs):
+        boilerplate = repeated_lines(pages, min_ratio, min_pages)
+        seen = set()
+        for page in pages:
+            lines = []
+            for line, key in line_keys(page.page_content):
+                if key in boilerplate:
+                    if key in seen:
+                        removed += 1
+                        continue
+                    seen.add(key)
+                lines.append(line)
+            cleaned.append(Document(page_content="\n".join(lines), metadata=dict(page.metadata)))
+    if removed:
+        logger.info(f"Removed {removed} repeated header, footer and boilerplate lines.")
+    return cleaned
+
+
+class MinHasher:
+    """
+    MinHash signatures of word-shingle sets, whose agreement estimates the
+    Jaccard similarity of the sets, with LSH banding to find candidate pairs
+    without comparing every chunk with every other one.
+    """
+
+    def __init__(self, num_permutations: int = Config.MINHASH_PERMUTATIONS, bands: int = Config.MINHASH_BANDS,
+                 seed: int = 0):
+        if num_permutations % bands:
+            raise ValueError("The number of permutations must be a multiple of the number of bands.")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MINHASH_PRIME, size=num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, MINHASH_PRIME, size=num_permutations, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_permutations // bands
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % MINHASH_PRIME for shingle in shingles(text)),
+            dtype=np.uint64,
+        )
+        return ((np.outer(hashes, self.a) + self.b) % MINHASH_PRIME).min(axis=0)
+
+    def band_keys(self, signature: np.ndarray):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        return float(np.mean(first == second))
+
+
+def deduplicate_chunks(chunks, threshold: float = Config.NEAR_DUPLICATE_THRESHOLD, hasher: MinHasher = None):
+    """
+    Drop chunks that are near-duplicates of an earlier chunk of the same PDF.
+    A chunk is only a duplicate if its number- and code-bearing tokens are
+    the same as the earlier chunk's too, so procedures sharing their text but
+    not their part number or alarm code are all kept and stay searchable.
+
+    The canonical (first) chunk lists the pages of its dropped duplicates in
+    its "duplicate_pages" metadata, a comma-separated string as vector
+    store metadata has to be scalar. Duplicates are only looked for within a
+    PDF, so the chunks of a manual never depend on another manual and
+    removing or re-ingesting one PDF leaves the others intact.
+    """
+    hasher = hasher or MinHasher()
+    kept = []
+    dropped = 0
+    for group in group_by_source(chunks):
+        canonical_chunks = []
+        signatures = []
+        chunk_identifiers = []
+        buckets = defaultdict(list)
+        duplicate_pages = defaultdict(list)
+        for chunk in group:
+            signature = hasher.signature(chunk.page_content)
+            chunk_ids = identifiers(chunk.page_content)
+            keys = hasher.band_keys(signature)
+            candidates = sorted({index for key in keys for index in buckets.get(key, ())})
+            canonical = next(
+                (
+                    index for index in candidates
+                    if chunk_identifiers[index] == chunk_ids
+                    and hasher.similarity(signatures[index], signature) >= threshold
+                ),
+                None,
+            )
+            if canonical is not None:
+                page = chunk.metadata.get("page")
+                if page != canonical_chunks[canonical].metadata.get("page") and page not in duplicate_pages[canonical]:
+                    duplicate_pages[canonical].append(page)
+                dropped += 1
+                continue
+            for key in keys:
+                buckets[key].append(len(canonical_chunks))
+            canonical_chunks.append(chunk)
+            signatures.append(signature)
+            chunk_identifiers.append(chunk_ids)
+        for index, pages in duplicate_pages.items():
+            if pages:
+                canonical_chunks[index].metadata["duplicate_pages"] = ", ".join(str(page) for page in pages)
+        kept.extend(canonical_chunks)
+    if dropped:
+        logger.info(f"Dropped {dropped} near-duplicate chunks.")
+    return kept
@@ -0,0 +1,133 @@
+import os
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from langchain_core.embeddings import Embeddings
+from src.config import Config
+from src.telemetry import telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize Unicode and whitespace so trivially different texts share a key."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Persistent store of embedding vectors keyed by model name and text hash.
+    The SQLite file is only opened on first use.
+    """
+
+    def __init__(self, path: str = Config.EMBEDDING_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Build the cache key for a text embedded with the given model."""
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def get_many(self, keys):
+        """Look up several keys at once and return a dict of the vectors found."""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            # Stay well below SQLite's limit on the number of bound parameters.
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array.array("d", blob).tolist()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store several (key, vector) pairs."""
+        rows = [(key, array.array("d", vector).tobytes()) for key, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for the lookups made so far."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from an EmbeddingCache.
+
+    Document and query embeddings share the cache. Lookups are batched and
+    only the texts that miss are sent to the wrapped embedding backend.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        vectors = self.cache.get_many(set(keys))
+
+        # Embed each distinct missing text once.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        telemetry.count("embedded_texts", len(texts) - len(missing), cached="true")
+        if missing:
+            logger.info(f"Embedding {len(missing)} of {len(texts)} texts not found in the cache.")
+            telemetry.count("embedded_texts", len(missing), cached="false")
+            with telemetry.span("embed", kind="documents"):
+                new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing, new_vectors))
+            self.cache.put_many(fresh.items())
+            vectors.update(fresh)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        key = EmbeddingCache.make_key(self.model, text)
+        vector = self.cache.get_many([key]).get(key)
+        telemetry.count("embedded_texts", 1, cached="true" if vector is not None else "false")
+        if vector is None:
+            with telemetry.span("embed", kind="query"):
+                vector = self.embeddings.embed_query(text)
+            self.cache.put_many([(key, vector)])
+        return vector
@@ -0,0 +1,68 @@
+import logging
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.vectorstores import InMemoryVectorStore
+from src.query_engine import QueryEngine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Offline stand-ins for the OpenAI backends, used to run and load-test the
+# service and the benchmarks without an API key or network access.
+
+FAKE_PAGES = [
+    ("purifier.pdf", 12, "To purge the fuel separator, stop the feed pump, open the sludge valve "
+                         "and flush the bowl with operating water for 30 seconds."),
+    ("purifier.pdf", 13, "Alarm ALM-4012 indicates high back pressure in the separator outlet. "
+                         "Check valve V-231 and the outlet pressure transmitter."),
+    ("main_engine.pdf", 88, "Cylinder head nuts are tightened hydraulically to 1500 bar in two steps. "
+                            "Always replace the O-rings when the head is removed."),
+    ("main_engine.pdf", 102, "Lubricating oil pressure below 2.5 bar triggers a slowdown. "
+                             "Inspect the filter differential pressure before restarting."),
+    ("boiler.pdf", 7, "Blow down the boiler water level gauge once per watch and record "
+                      "the salinity in the engine log book."),
+]
+
+FAKE_ANSWER = "Stop the feed pump, open the sludge valve and flush the bowl. (purifier.pdf - Page 12)"
+
+
+def make_fake_documents(pages=FAKE_PAGES):
+    return [
+        Document(page_content=f"[{source} - Page {page}]\n{text}", metadata={"source": source, "page": page})
+        for source, page, text in pages
+    ]
+
+
+def make_fake_llm(latency: float = 0.0, responses=(FAKE_ANSWER,)):
+    """Chat model returning canned responses after a simulated latency per call."""
+    return FakeListChatModel(responses=list(responses), sleep=latency or None)
+
+
+class FakeVectorStore:
+    """In-memory vector store over the fake pages, embedded with deterministic fake vectors."""
+
+    def __init__(self, docs=None, embedding_size: int = 256):
+        self.embeddings = DeterministicFakeEmbedding(size=embedding_size)
+        self.index_version = "fake"
+        self.db = InMemoryVectorStore(self.embeddings)
+        docs = docs if docs is not None else make_fake_documents()
+        self.db.add_documents(docs, ids=[f"fake-{i}" for i in range(len(docs))])
+
+    def get_retriever(self, k: int = 3):
+        return self.db.as_retriever(search_kwargs={"k": k})
+
+
+def fake_engine_factory(latency: float = 0.0, answer_cache=None):
+    """
+    Return a function creating QueryEngines that share one fake LLM and
+    retriever, as real engines share their clients.
+    """
+    vector_store = FakeVectorStore()
+    retriever = vector_store.get_retriever()
+    llm = make_fake_llm(latency)
+
+    def create():
+        return QueryEngine(vector_store, retriever, llm=llm, answer_cache=answer_cache)
+    logger.info("Using fake LLM and embedding backends.")
+    return create
@@ -0,0 +1,127 @@
+import os
+import logging
+from src.config import Config
+from src.manifest import IngestionManifest, make_chunk_id
+from src.pdf_processor import PDFProcessor
+from src.snapshot import import_snapshot_at_startup
+from src.vector_db import VectorStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def batched(iterable, batch_size: int):
+    """Yield lists of up to batch_size consecutive items from an iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestPipeline:
+    """
+    Streams PDFs from the data folder into the vector store.
+
+    Every stage is a generator (extract pages -> split -> embed and upsert in
+    batches), so only one window of pages and one batch of chunks are held in
+    memory regardless of the size of the library. The manifest is saved after
+    every batch, so an interrupted ingest resumes where it stopped instead of
+    re-embedding the chunks that were already stored.
+    """
+
+    def __init__(self, pdf_processor, vector_store, manifest, batch_size: int = Config.INGEST_BATCH_SIZE):
+        self.pdf_processor = pdf_processor
+        self.vector_store = vector_store
+        self.manifest = manifest
+        self.batch_size = batch_size
+
+    def run(self):
+        """
+        Bring the vector store in line with the PDFs in the data folder.
+        Unchanged PDFs are skipped, new or modified ones are parsed and upserted,
+        and deleted ones have their chunks removed. Returns the manifest diff.
+        """
+        diff = self.manifest.diff(self.pdf_processor.list_pdfs())
+        logger.info(
+            "Ingestion manifest: %d unchanged, %d added, %d modified, %d deleted.",
+            len(diff.unchanged), len(diff.added), len(diff.modified), len(diff.deleted)
+        )
+
+        for file_name in diff.deleted:
+            self.vector_store.delete_documents(self.manifest.remove(file_name))
+            self.manifest.save()
+
+        pending = diff.modified + diff.added
+        pages_by_file = self.pdf_processor.iter_pdfs(pending)
+        for (file_path, file_hash), docs in zip(pending, pages_by_file):
+            self.ingest_file(file_path, file_hash, docs)
+
+        self.pdf_processor.log_ocr_cache_stats()
+        self.vector_store.persist()
+
+        # Persist refreshed mtimes (and the manifest itself on first run).
+        self.manifest.save()
+        return diff
+
+    def ingest_file(self, file_path, file_hash, docs):
+        """
+        Split one PDF's pages and upsert its chunks batch by batch,
+        checkpointing the manifest after every batch.
+        """
+        file_name = os.path.basename(file_path)
+        done_ids = self.manifest.checkpoint(file_name, file_hash)
+        if done_ids:
+            logger.info(f"Resuming ingestion of {file_name} after {len(done_ids)} chunks.")
+        else:
+            # Drop the chunks of the previous version before upserting the new ones.
+            self.vector_store.delete_documents(self.manifest.remove(file_name))
+
+        chunk_ids = list(done_ids)
+        chunks = enumerate(self.pdf_processor.iter_chunks(docs))
+        for batch in batched(chunks, self.batch_size):
+            # Chunks stored before an interruption are regenerated but not re-embedded.
+            batch = [(index, chunk) for index, chunk in batch if index >= len(done_ids)]
+            if not batch:
+                continue
+            ids = [make_chunk_id(file_name, file_hash, index) for index, _ in batch]
+            self.vector_store.add_documents([chunk for _, chunk in batch], ids=ids)
+            chunk_ids.extend(ids)
+            self.manifest.record(file_path, file_hash, chunk_ids, complete=False)
+            self.manifest.save()
+
+        self.manifest.record(file_path, file_hash, chunk_ids)
+        self.manifest.save()
+        logger.info(f"Ingested {file_name}: {len(chunk_ids)} chunks.")
+
+
+def initialize_vector_store():
+    """
+    Load the vector store and bring it up to date with the data folder.
+    Returns None if there are no PDFs to answer questions from.
+    """
+    # A new deployment starts from the prebuilt snapshot, if one is configured,
+    # so that only PDFs changed since it was built are ingested below.
+    import_snapshot_at_startup()
+    pdf_processor = PDFProcessor()
+    manifest = IngestionManifest(Config.MANIFEST_PATH)
+
+    # Initialize the vector store (the configured backend), loading it if it already exists.
+    vector_store = VectorStore()
+    vector_store.load_db()
+    if vector_store.db is None:
+        # Without a database every PDF has to be ingested again.
+        manifest.clear()
+    elif not manifest.exists:
+        # A database built before the manifest existed has no stable chunk IDs,
+        # so rebuild it rather than duplicating its content.
+        vector_store.reset()
+
+    IngestPipeline(pdf_processor, vector_store, manifest).run()
+    if not manifest.entries:
+        logger.error("No PDF documents found in the data folder. Exiting.")
+        return None
+    return vector_store
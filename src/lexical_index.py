@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import math
+import heapq
+import logging
+from collections import Counter
+from typing import Callable, Optional
+from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
+from src.config import Config
+from src.telemetry import telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_VERSION = 1
+
+# Words and codes such as "V-231", "ALM4012" or "3.2.1" are kept together.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+
+def tokenize(text: str):
+    """
+    Split text into lower-case terms suited to part numbers and alarm codes.
+    A code like "V-231" yields "v-231", "v231", "v" and "231", and a word
+    followed by a number ("ALM 4012") also yields the joined term "alm4012",
+    so that the different ways engineers write the same code all match.
+    """
+    terms = []
+    previous = None
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            terms.append("".join(parts))
+            terms.extend(parts)
+        if previous is not None and previous.isalpha() and token.isdigit():
+            terms.append(previous + token)
+        previous = token
+    return terms
+
+
+class BM25Index:
+    """
+    Persistent inverted index over chunks, scored with Okapi BM25.
+
+    The index stores the chunk text and metadata next to the postings so that
+    lexical search can return documents without touching the vector store.
+    """
+
+    def __init__(self, path: str = Config.LEXICAL_INDEX_PATH, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        self.doc_len = {}
+        self.postings = {}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def load(self) -> bool:
+        """Load the index from disk; returns False if there is none to load."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read lexical index {self.path}: {e}")
+            return False
+        if data.get("version") != LEXICAL_INDEX_VERSION:
+            logger.warning(f"Ignoring lexical index {self.path} with unsupported version.")
+            return False
+        self.docs = data["docs"]
+        self.doc_len = data["doc_len"]
+        self.postings = data["postings"]
+        self.total_len = sum(self.doc_len.values())
+        logger.info(f"Loaded lexical index with {len(self.docs)} chunks.")
+        return True
+
+    def save(self):
+        """Atomically write the index to disk."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": LEXICAL_INDEX_VERSION,
+                "docs": self.docs,
+                "doc_len": self.doc_len,
+                "postings": self.postings,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.docs = {}
+        self.doc_len = {}
+        self.postings = {}
+        self.total_len = 0
+
+    def add_documents(self, docs, ids):
+        """Index (or re-index) documents under the given chunk IDs."""
+        self.delete(id_ for id_ in ids if id_ in self.docs)
+        for doc, doc_id in zip(docs, ids):
+            terms = Counter(tokenize(doc.page_content))
+            self.docs[doc_id] = {"text": doc.page_content, "metadata": dict(doc.metadata)}
+            self.doc_len[doc_id] = sum(terms.values())
+            self.total_len += self.doc_len[doc_id]
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+
+    def delete(self, ids):
+        """Remove the chunks with the given IDs from the index."""
+        for doc_id in list(ids):
+            doc = self.docs.pop(doc_id, None)
+            if doc is None:
+                continue
+            self.total_len -= self.doc_len.pop(doc_id)
+            for term in set(tokenize(doc["text"])):
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int = 5, sources=None):
+        """
+        Return the (chunk_id, score) pairs of the k best matching chunks,
+        only among the chunks of the given sources if any are given.
+        """
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_len = self.total_len / n_docs or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        if sources is not None:
+            scores = {
+                doc_id: score for doc_id, score in scores.items()
+                if self.docs[doc_id]["metadata"].get("source") in sources
+            }
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def get_document(self, doc_id: str) -> Document:
+        doc = self.docs[doc_id]
+        return Document(page_content=doc["text"], metadata=dict(doc["metadata"]), id=doc_id)
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """
+    Fuse several ranked lists of (key, document) pairs with reciprocal rank
+    fusion and return the documents ordered by their fused score.
+    """
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, (key, doc) in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [docs[key] for key in ordered]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing dense vector search with BM25 lexical search.
+    Exact tokens such as part numbers and alarm codes are found by the
+    lexical side even when the dense embeddings rank them poorly. With a
+    router, a callable returning the sources a query is routed to (see
+    ShardedVectorStore.routed_sources), lexical hits are limited to those.
+    """
+
+    dense_retriever: BaseRetriever
+    lexical_index: BM25Index
+    lexical_k: int = Config.LEXICAL_K
+    k: int = Config.HYBRID_K
+    rrf_k: int = 60
+    router: Optional[Callable[[str], set]] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        with telemetry.span("search", kind="dense"):
+            dense_docs = self.dense_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        dense_ranking = [(doc.id or doc.page_content, doc) for doc in dense_docs]
+        lexical_ranking = []
+        with telemetry.span("search", kind="lexical"):
+            sources = self.router(query) if self.router is not None else None
+            hits = self.lexical_index.search(query, self.lexical_k, sources=sources)
+        for doc_id, _ in hits:
+            doc = self.lexical_index.get_document(doc_id)
+            lexical_ranking.append((doc_id, doc))
+        fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], k=self.rrf_k)
+        return fused[:self.k]
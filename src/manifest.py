@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import logging
+from dataclasses import dataclass, field
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def compute_file_hash(file_path, block_size: int = 1 << 20) -> str:
+    """
+    Return the SHA-256 hex digest of a file's contents, reading it in blocks
+    so that large manuals are never held in memory at once.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def make_chunk_id(file_name: str, file_hash: str, index: int) -> str:
+    """
+    Build the deterministic ID of a PDF's index-th chunk from its file name
+    and content hash, so that re-ingesting the same file upserts rather than
+    duplicates. The file name (the manifest key) is part of the ID, so
+    identical copies of a PDF under different names never share chunks.
+    """
+    name_hash = hashlib.sha256(file_name.encode("utf-8")).hexdigest()
+    return f"{name_hash[:8]}-{file_hash[:16]}-{index}"
+
+
+def make_chunk_ids(file_name: str, file_hash: str, count: int):
+    """Build the IDs of the first count chunks of a PDF."""
+    return [make_chunk_id(file_name, file_hash, i) for i in range(count)]
+
+
+@dataclass
+class ManifestDiff:
+    """Result of comparing the PDFs on disk against the manifest."""
+    # Lists of (file_path, file_hash) tuples that need to be (re-)ingested.
+    added: list = field(default_factory=list)
+    modified: list = field(default_factory=list)
+    # File names that are already indexed and have not changed.
+    unchanged: list = field(default_factory=list)
+    # File names present in the manifest but no longer on disk.
+    deleted: list = field(default_factory=list)
+
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+
+class IngestionManifest:
+    """
+    Persistent record of which PDFs have been ingested into the vector store.
+
+    Each entry is keyed by file name (the same value stored as the "source"
+    metadata of every chunk) and holds the file path, size, mtime, content
+    hash and the IDs of the chunks that were upserted for it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.exists = os.path.exists(path)
+        if self.exists:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read ingestion manifest {self.path}: {e}")
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring ingestion manifest {self.path} with unsupported version.")
+            return
+        self.entries = data.get("files", {})
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def clear(self):
+        """Forget every entry (e.g. because the vector store was removed)."""
+        self.entries = {}
+
+    def diff(self, file_paths) -> ManifestDiff:
+        """
+        Compare the given PDF paths against the manifest.
+        Files whose size and mtime match their entry are treated as unchanged
+        without hashing; otherwise the content hash decides.
+        """
+        result = ManifestDiff()
+        seen = set()
+        for file_path in file_paths:
+            file_name = os.path.basename(file_path)
+            seen.add(file_name)
+            entry = self.entries.get(file_name)
+            stat = os.stat(file_path)
+            complete = entry is not None and entry.get("complete", True)
+            if complete and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                result.unchanged.append(file_name)
+                continue
+
+            file_hash = compute_file_hash(file_path)
+            if entry is None:
+                result.added.append((file_path, file_hash))
+            elif complete and entry["hash"] == file_hash:
+                # Only the timestamp changed (e.g. the file was copied); refresh it.
+                entry["mtime"] = stat.st_mtime
+                entry["path"] = file_path
+                result.unchanged.append(file_name)
+            else:
+                # Also covers PDFs whose ingestion was interrupted part-way.
+                result.modified.append((file_path, file_hash))
+
+        result.deleted = sorted(name for name in self.entries if name not in seen)
+        return result
+
+    def record(self, file_path: str, file_hash: str, chunk_ids, complete: bool = True):
+        """
+        Store (or replace) the entry for an ingested PDF.
+        Pass complete=False to checkpoint a PDF whose chunks are still being
+        upserted; chunk_ids then lists the chunks stored so far.
+        """
+        stat = os.stat(file_path)
+        self.entries[os.path.basename(file_path)] = {
+            "path": file_path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": file_hash,
+            "chunk_ids": list(chunk_ids),
+            "complete": complete,
+        }
+
+    def checkpoint(self, file_name: str, file_hash: str):
+        """
+        Return the chunk IDs already stored for an interrupted ingestion of
+        this exact file content, or an empty list if there is none to resume.
+        """
+        entry = self.entries.get(file_name)
+        if entry and not entry.get("complete", True) and entry["hash"] == file_hash:
+            return list(entry["chunk_ids"])
+        return []
+
+    def remove(self, file_name: str):
+        """Drop a PDF's entry and return the chunk IDs that belonged to it."""
+        entry = self.entries.pop(file_name, None)
+        return entry["chunk_ids"] if entry else []
+
+    def chunk_ids(self, file_name: str):
+        entry = self.entries.get(file_name)
+        return list(entry["chunk_ids"]) if entry else []
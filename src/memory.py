@@ -0,0 +1,111 @@
+import logging
+from contextlib import nullcontext
+from typing import Any, Optional
+from langchain_core.memory import BaseMemory
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from src.config import Config
+from src.context_packer import make_token_counter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """
+Progressively summarize the conversation between a ship engineer and a technical assistant,
+adding the new lines to the current summary. Keep equipment names, manual names, page numbers,
+part numbers and alarm codes. Return only the new summary.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:
+"""
+
+
+class SummarizingMemory(BaseMemory):
+    """
+    Conversation memory with a bounded size.
+
+    The last ``keep_turns`` question/answer turns are kept verbatim. Older turns,
+    and any verbatim turns that would push the history over ``max_tokens``, are
+    folded one at a time into a rolling summary produced by the LLM, so the
+    history passed to the prompt stays bounded for the life of a session.
+    """
+
+    llm: Any
+    memory_key: str = "chat_history"
+    max_tokens: int = Config.MEMORY_MAX_TOKENS
+    keep_turns: int = Config.MEMORY_KEEP_TURNS
+    token_counter: Optional[Any] = None
+    # Optional ConcurrencyLimiter the summarization calls queue on.
+    limiter: Optional[Any] = None
+    summary: str = ""
+    turns: list = []
+
+    @property
+    def memory_variables(self):
+        return [self.memory_key]
+
+    @property
+    def messages(self):
+        """The history as chat messages: the summary first, then the recent turns."""
+        messages = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation: {self.summary}"))
+        for question, answer in self.turns:
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        return messages
+
+    def history_text(self) -> str:
+        """The history as a single string, in the format used by the prompt."""
+        lines = []
+        if self.summary:
+            lines.append(f"Summary of the earlier conversation: {self.summary}")
+        for question, answer in self.turns:
+            lines.append(f"Human: {question}")
+            lines.append(f"Assistant: {answer}")
+        return "\n".join(lines)
+
+    def history_token_count(self) -> int:
+        """Number of tokens the history currently adds to the prompt."""
+        text = self.history_text()
+        if not text:
+            return 0
+        if self.token_counter is None:
+            self.token_counter = make_token_counter()
+        return self.token_counter(text)
+
+    def load_memory_variables(self, inputs):
+        return {self.memory_key: self.messages}
+
+    def save_context(self, inputs, outputs):
+        self.add_turn(inputs["question"], outputs["answer"])
+
+    def add_turn(self, question: str, answer: str):
+        """Record a turn, then compact the history back under its limits."""
+        self.turns.append((question, answer))
+        self.compact()
+
+    def compact(self):
+        """Fold the oldest turns into the summary until the history fits."""
+        while self.turns and (
+            len(self.turns) > self.keep_turns
+            or (len(self.turns) > 1 and self.history_token_count() > self.max_tokens)
+        ):
+            question, answer = self.turns.pop(0)
+            self.summary = self._summarize(f"Human: {question}\nAssistant: {answer}")
+        if self.history_token_count() > self.max_tokens:
+            logger.warning("Conversation history still exceeds its token limit after summarization.")
+
+    def _summarize(self, new_lines: str) -> str:
+        prompt = SUMMARY_PROMPT.format(summary=self.summary or "(none)", new_lines=new_lines)
+        with self.limiter.slot() if self.limiter is not None else nullcontext():
+            result = self.llm.invoke(prompt)
+        return getattr(result, "content", result).strip()
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
@@ -0,0 +1,512 @@
+import os
+import json
+import mmap
+import uuid
+import logging
+import threading
+import numpy as np
+from langchain.schema import Document
+from langchain_core.vectorstores import VectorStore as LangChainVectorStore
+from src.config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NUMPY_STORE_VERSION = 1
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Rows scored per matrix product, which bounds the float32 copy made of them
+# (12 MB for 1536-dimension vectors).
+SEARCH_BLOCK_ROWS = 2048
+
+# Share of deleted rows above which save() compacts the files.
+COMPACT_RATIO = 0.25
+
+HEADER_FILE = "header.json"
+VECTORS_FILE = "vectors.bin"
+SCALES_FILE = "scales.bin"
+LISTS_FILE = "lists.bin"
+OFFSETS_FILE = "offsets.bin"
+IDS_FILE = "ids.txt"
+DOCS_FILE = "docs.jsonl"
+DELETED_FILE = "deleted.txt"
+CENTROIDS_FILE = "centroids.npy"
+COMPACT_MARKER = "compact.json"
+
+
+def quantize(vectors, dtype: str):
+    """
+    Normalize vectors to unit length and convert them to the storage dtype.
+    Returns the stored rows and the per-row scale that restores them (only
+    int8 rows are scaled: each is stretched over the full int8 range).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(DTYPES[dtype]), np.ones(len(vectors), dtype=np.float32)
+
+
+def spherical_kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity and return the unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(n_lists):
+            members = vectors[assignment == i]
+            if len(members):
+                centroids[i] = members.sum(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids /= norms
+    return centroids
+
+
+class StoreView:
+    """
+    The rows of a NumpyVectorStore at one point in time, searched without
+    holding the store's lock. The store never modifies these arrays in place:
+    appends, deletes, compaction and training replace them, so a view stays
+    consistent while the store changes.
+    """
+
+    def __init__(self, store):
+        self.vectors = store._vectors
+        self.scales = store._scales
+        self.lists = store._lists
+        self.live = store._live
+        self.offsets = store._offsets
+        self.ids = store._ids
+        self.docs = store._docs
+        self.centroids = store._centroids
+
+    def document(self, row: int) -> Document:
+        start = int(self.offsets[row])
+        record = json.loads(self.docs[start:self.docs.find(b"\n", start)])
+        return Document(page_content=record["text"], metadata=record["metadata"], id=self.ids[row])
+
+
+class NumpyVectorStore(LangChainVectorStore):
+    """
+    Compact vector store kept in flat files and memory-mapped on load.
+
+    Embeddings are stored as unit vectors in a NumPy array of float32,
+    float16 or int8 (with a per-row scale), and chunk texts and metadata in
+    a JSON-lines sidecar read through an offsets index, so opening the store
+    only maps the files. Search is a vectorized dot product over every row,
+    or, once ``ivf_lists`` is set and the store is large enough, over the
+    rows of the ``nprobe`` inverted lists closest to the query.
+
+    Files are append-only: adding chunks appends rows and deleting them
+    records tombstones. save() compacts the files once enough rows are
+    deleted and (re)trains the inverted lists.
+    """
+
+    def __init__(self, persist_directory: str = None, embedding_function=None,
+                 dtype: str = Config.NUMPY_VECTOR_DTYPE, ivf_lists: int = Config.NUMPY_IVF_LISTS,
+                 nprobe: int = Config.NUMPY_IVF_PROBES):
+        if persist_directory is None:
+            raise ValueError("NumpyVectorStore needs a persist_directory.")
+        self.persist_directory = persist_directory
+        self._embedding = embedding_function
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        os.makedirs(persist_directory, exist_ok=True)
+        header = self._read_header()
+        # An existing store keeps the dtype it was written with.
+        self.dtype = header["dtype"] if header else dtype
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {self.dtype!r}.")
+        self.dim = header["dim"] if header else None
+        self._open()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    def _read_header(self):
+        try:
+            with open(self._path(HEADER_FILE), "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except FileNotFoundError:
+            return None
+        if header.get("version") != NUMPY_STORE_VERSION:
+            raise ValueError(f"Unsupported vector store version in {self.persist_directory}.")
+        return header
+
+    def _write_header(self):
+        tmp_path = self._path(HEADER_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": NUMPY_STORE_VERSION, "dtype": self.dtype, "dim": self.dim}, f)
+        os.replace(tmp_path, self._path(HEADER_FILE))
+
+    def _open(self):
+        """Map the files of the store, dropping rows left over by an interrupted write."""
+        self._finish_compaction()
+        self._offsets = self._read_array(OFFSETS_FILE, np.int64)
+        n = len(self._offsets)
+        row_bytes = (self.dim or 0) * np.dtype(DTYPES[self.dtype]).itemsize
+        # The offsets are written last, so they tell how many rows are complete.
+        for name, size in ((VECTORS_FILE, row_bytes), (SCALES_FILE, 4), (LISTS_FILE, 4)):
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > n * size:
+                os.truncate(path, n * size)
+        self._ids = []
+        if os.path.exists(self._path(IDS_FILE)):
+            with open(self._path(IDS_FILE), "r", encoding="utf-8") as f:
+                self._ids = f.read().splitlines()
+            if len(self._ids) > n:
+                self._ids = self._ids[:n]
+                self._rewrite_ids()
+        self._scales = self._read_array(SCALES_FILE, np.float32)
+        self._lists = self._read_array(LISTS_FILE, np.int32)
+        self._live = np.ones(n, dtype=bool)
+        if os.path.exists(self._path(DELETED_FILE)):
+            with open(self._path(DELETED_FILE), "r", encoding="utf-8") as f:
+                deleted = [int(line) for line in f if line.strip()]
+            self._live[[row for row in deleted if row < n]] = False
+        self._row = {doc_id: row for row, doc_id in enumerate(self._ids) if self._live[row]}
+        self._centroids = None
+        if os.path.exists(self._path(CENTROIDS_FILE)):
+            self._centroids = np.load(self._path(CENTROIDS_FILE))
+        self._map()
+
+    def _map(self):
+        n = len(self._offsets)
+        self._vectors = None
+        if n:
+            self._vectors = np.memmap(
+                self._path(VECTORS_FILE), dtype=DTYPES[self.dtype], mode="r", shape=(n, self.dim)
+            )
+        self._docs = None
+        if n and os.path.getsize(self._path(DOCS_FILE)):
+            with open(self._path(DOCS_FILE), "rb") as f:
+                self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_array(self, name: str, dtype):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=dtype)
+        return np.fromfile(path, dtype=dtype)
+
+    def _rewrite_ids(self):
+        tmp_path = self._path(IDS_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(doc_id + "\n" for doc_id in self._ids)
+        os.replace(tmp_path, self._path(IDS_FILE))
+
+    def __len__(self):
+        return len(self._row)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_directory=None, **kwargs):
+        store = cls(persist_directory=persist_directory, embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """Embed and upsert texts; chunks with an existing ID are replaced."""
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        with self._lock:
+            self._delete_rows([self._row[doc_id] for doc_id in set(ids) if doc_id in self._row])
+            self._append(ids, texts, metadatas, vectors)
+        return ids
+
+    def _append(self, ids, texts, metadatas, vectors):
+        rows, scales = quantize(vectors, self.dtype)
+        if self.dim is None:
+            self.dim = rows.shape[1]
+            self._write_header()
+        elif rows.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dimension {self.dim}, got {rows.shape[1]}.")
+        lists = np.full(len(rows), -1, dtype=np.int32)
+        if self._centroids is not None:
+            lists = np.argmax(rows.astype(np.float32) @ self._centroids.T, axis=1).astype(np.int32)
+
+        offsets = []
+        with open(self._path(DOCS_FILE), "ab") as f:
+            position = f.tell()
+            for text, metadata in zip(texts, metadatas):
+                line = json.dumps({"text": text, "metadata": metadata or {}}, ensure_ascii=False).encode("utf-8")
+                offsets.append(position)
+                f.write(line + b"\n")
+                position += len(line) + 1
+        offsets = np.asarray(offsets, dtype=np.int64)
+        for name, data in ((VECTORS_FILE, rows), (SCALES_FILE, scales), (LISTS_FILE, lists)):
+            with open(self._path(name), "ab") as f:
+                f.write(data.tobytes())
+        with open(self._path(IDS_FILE), "a", encoding="utf-8") as f:
+            f.writelines(doc_id + "\n" for doc_id in ids)
+        # Written last: the rows only exist once their offsets do.
+        with open(self._path(OFFSETS_FILE), "ab") as f:
+            f.write(offsets.tobytes())
+
+        start = len(self._ids)
+        self._ids.extend(ids)
+        self._offsets = np.concatenate([self._offsets, offsets])
+        self._scales = np.concatenate([self._scales, scales])
+        self._lists = np.concatenate([self._lists, lists])
+        self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+        for i, doc_id in enumerate(ids):
+            # With duplicate IDs in one batch the last one wins.
+            if doc_id in self._row:
+                self._delete_rows([self._row[doc_id]])
+            self._row[doc_id] = start + i
+        self._map()
+
+    def delete(self, ids=None, **kwargs):
+        """Delete the chunks with the given IDs (every chunk if ids is None)."""
+        with self._lock:
+            if ids is None:
+                self.reset_collection()
+                return True
+            self._delete_rows([self._row[doc_id] for doc_id in ids if doc_id in self._row])
+        return True
+
+    def _delete_rows(self, rows):
+        if not rows:
+            return
+        with open(self._path(DELETED_FILE), "a", encoding="utf-8") as f:
+            f.writelines(f"{row}\n" for row in rows)
+        # Copied rather than changed in place, as searches may be reading it.
+        live = self._live.copy()
+        live[rows] = False
+        self._live = live
+        for row in rows:
+            self._row.pop(self._ids[row], None)
+
+    def reset_collection(self):
+        """Remove every chunk."""
+        with self._lock:
+            for name in (VECTORS_FILE, SCALES_FILE, LISTS_FILE, OFFSETS_FILE, IDS_FILE, DOCS_FILE,
+                         DELETED_FILE, CENTROIDS_FILE, HEADER_FILE):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self.dim = None
+            self._open()
+
+    def _record(self, row: int) -> dict:
+        start = int(self._offsets[row])
+        end = self._docs.find(b"\n", start)
+        return json.loads(self._docs[start:end])
+
+    def _document(self, row: int) -> Document:
+        record = self._record(row)
+        return Document(page_content=record["text"], metadata=record["metadata"], id=self._ids[row])
+
+    def get(self, ids=None, include=None):
+        """
+        Return the stored chunks like Chroma's get(): ids, documents and
+        metadatas, and with include=["embeddings"] their unit vectors.
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            if ids is None:
+                rows = np.nonzero(self._live)[0].tolist()
+            else:
+                rows = [self._row[doc_id] for doc_id in ids if doc_id in self._row]
+            needs_records = "documents" in include or "metadatas" in include
+            records = [self._record(row) for row in rows] if needs_records else []
+            result = {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [r["text"] for r in records] if "documents" in include else None,
+                "metadatas": [r["metadata"] for r in records] if "metadatas" in include else None,
+            }
+            if "embeddings" in include:
+                result["embeddings"] = (
+                    self._vectors[rows].astype(np.float32) * self._scales[rows, None]
+                    if rows else np.zeros((0, self.dim or 0), dtype=np.float32)
+                )
+            return result
+
+    def get_by_ids(self, ids, /):
+        with self._lock:
+            return [self._document(self._row[doc_id]) for doc_id in ids if doc_id in self._row]
+
+    def _candidate_rows(self, view: StoreView, query: np.ndarray, k: int):
+        """
+        Rows to score: every row, or those of the inverted lists closest to the
+        query. At least nprobe lists are searched, and further lists in order
+        of closeness until they hold k live rows, so that lists emptied by
+        deletes never leave a search without results.
+        """
+        if view.centroids is None:
+            return None
+        order = np.argsort(-(view.centroids @ query))
+        assigned = view.lists >= 0
+        live_per_list = np.bincount(view.lists[view.live & assigned], minlength=len(view.centroids))
+        # Rows added since the lists were trained are always scored.
+        covered = np.count_nonzero(view.live & ~assigned) + np.cumsum(live_per_list[order])
+        probes = order[:max(self.nprobe, int(np.searchsorted(covered, k)) + 1)]
+        return np.nonzero(np.isin(view.lists, probes) | ~assigned)[0]
+
+    @staticmethod
+    def _scores(view: StoreView, query: np.ndarray, rows):
+        if rows is None:
+            scores = np.empty(len(view.offsets), dtype=np.float32)
+            for start in range(0, len(scores), SEARCH_BLOCK_ROWS):
+                block = view.vectors[start:start + SEARCH_BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32) @ query
+            scores *= view.scales
+            scores[~view.live] = -np.inf
+            return scores
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block_rows = rows[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block_rows)] = view.vectors[block_rows].astype(np.float32) @ query
+        scores *= view.scales[rows]
+        scores[~view.live[rows]] = -np.inf
+        return scores
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, filter: dict = None):
+        """Return the k (document, cosine similarity) pairs closest to an embedding."""
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        # Only taking the view needs the lock, so concurrent searches run in parallel.
+        with self._lock:
+            if not self._row:
+                return []
+            view = StoreView(self)
+        rows = self._candidate_rows(view, query, k)
+        scores = self._scores(view, query, rows)
+        if filter:
+            order = np.argsort(-scores)
+        else:
+            top = min(k, len(scores))
+            order = np.argpartition(-scores, top - 1)[:top]
+            order = order[np.argsort(-scores[order])]
+        results = []
+        for index in order:
+            if scores[index] == -np.inf or len(results) >= k:
+                break
+            doc = view.document(int(rows[index]) if rows is not None else int(index))
+            if filter and any(doc.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            results.append((doc, float(scores[index])))
+        return results
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4, filter: dict = None, **kwargs):
+        """Chroma's name for the search above; scores map to relevance with _select_relevance_score_fn."""
+        return self.similarity_search_by_vector_with_score(embedding, k, filter)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict = None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: dict = None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped to a relevance in [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    def save(self):
+        """Compact the files if many rows were deleted and keep the inverted lists trained."""
+        with self._lock:
+            n = len(self._offsets)
+            if n and (n - len(self._row)) / n > COMPACT_RATIO:
+                self.compact()
+            if self.ivf_lists and len(self._row) >= self.ivf_lists * 10:
+                # Retrain once the store has doubled since the lists were trained.
+                trained_rows = (self._read_header() or {}).get("ivf_trained_rows", 0)
+                if self._centroids is None or len(self._row) > 2 * trained_rows:
+                    self.train_ivf()
+
+    def train_ivf(self, sample_size: int = 50000):
+        """Cluster the stored vectors into ivf_lists inverted lists and assign every row."""
+        with self._lock:
+            live_rows = np.nonzero(self._live)[0]
+            rng = np.random.default_rng(0)
+            sample = live_rows if len(live_rows) <= sample_size else np.sort(
+                rng.choice(live_rows, sample_size, replace=False)
+            )
+            vectors = self._vectors[sample].astype(np.float32) * self._scales[sample, None]
+            logger.info(f"Training {self.ivf_lists} inverted lists on {len(sample)} vectors...")
+            centroids = spherical_kmeans(vectors, self.ivf_lists).astype(np.float32)
+            lists = np.empty(len(self._offsets), dtype=np.int32)
+            for start in range(0, len(lists), SEARCH_BLOCK_ROWS):
+                block = self._vectors[start:start + SEARCH_BLOCK_ROWS].astype(np.float32)
+                lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            tmp_path = self._path(LISTS_FILE + ".tmp")
+            lists.tofile(tmp_path)
+            os.replace(tmp_path, self._path(LISTS_FILE))
+            with open(self._path(CENTROIDS_FILE + ".tmp"), "wb") as f:
+                np.save(f, centroids)
+            os.replace(self._path(CENTROIDS_FILE + ".tmp"), self._path(CENTROIDS_FILE))
+            self._lists = lists
+            self._centroids = centroids
+            header = self._read_header()
+            header["ivf_trained_rows"] = len(live_rows)
+            tmp_path = self._path(HEADER_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(header, f)
+            os.replace(tmp_path, self._path(HEADER_FILE))
+
+    def compact(self):
+        """Rewrite the files without the deleted rows."""
+        with self._lock:
+            rows = np.nonzero(self._live)[0]
+            logger.info(f"Compacting the vector store from {len(self._offsets)} to {len(rows)} rows...")
+            new_files = {}
+            docs_path = self._path(DOCS_FILE + ".new")
+            offsets = []
+            with open(docs_path, "wb") as f:
+                for row in rows:
+                    start = int(self._offsets[row])
+                    line = self._docs[start:self._docs.find(b"\n", start) + 1]
+                    offsets.append(f.tell())
+                    f.write(line)
+            new_files[DOCS_FILE] = docs_path
+            arrays = {
+                VECTORS_FILE: np.ascontiguousarray(self._vectors[rows]) if len(rows) else np.zeros(0),
+                SCALES_FILE: self._scales[rows],
+                LISTS_FILE: self._lists[rows],
+                OFFSETS_FILE: np.asarray(offsets, dtype=np.int64),
+            }
+            for name, data in arrays.items():
+                data.tofile(self._path(name + ".new"))
+                new_files[name] = self._path(name + ".new")
+            with open(self._path(IDS_FILE + ".new"), "w", encoding="utf-8") as f:
+                f.writelines(self._ids[row] + "\n" for row in rows)
+            new_files[IDS_FILE] = self._path(IDS_FILE + ".new")
+            # Once the marker exists the new files are complete and are moved
+            # into place, on the next open if this process stops first.
+            with open(self._path(COMPACT_MARKER), "w", encoding="utf-8") as f:
+                json.dump(sorted(new_files), f)
+            # The old maps are not closed: searches may still be reading them
+            # through a view, and they are released with the last one.
+            self._vectors = None
+            self._docs = None
+            self._open()
+
+    def _finish_compaction(self):
+        marker = self._path(COMPACT_MARKER)
+        if not os.path.exists(marker):
+            return
+        with open(marker, "r", encoding="utf-8") as f:
+            names = json.load(f)
+        for name in names:
+            if os.path.exists(self._path(name + ".new")):
+                os.replace(self._path(name + ".new"), self._path(name))
+        if os.path.exists(self._path(DELETED_FILE)):
+            os.remove(self._path(DELETED_FILE))
+        os.remove(marker)
@@ -0,0 +1,156 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from src.config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_tesseract_signature = None
+
+
+def tesseract_signature(tesseract_config: str = "") -> str:
+    """
+    Return a string identifying the Tesseract version and configuration,
+    so that cached OCR results are invalidated when either changes.
+    """
+    global _tesseract_signature
+    if _tesseract_signature is None:
+        try:
+            import pytesseract
+            _tesseract_signature = f"tesseract-{pytesseract.get_tesseract_version()}"
+        except Exception as e:
+            logger.warning(f"Could not determine the Tesseract version: {e}")
+            _tesseract_signature = "tesseract-unknown"
+    return f"{_tesseract_signature}|{tesseract_config}"
+
+
+class OCRCache:
+    """
+    Persistent, size-bounded cache of OCR text for individual PDF pages.
+
+    Entries are content-addressed: the key is derived from the PDF's content
+    hash, the page number, the rasterization DPI and the OCR engine signature.
+    When the total size of the cached text exceeds ``max_bytes`` the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = Config.OCR_CACHE_PATH, max_bytes: int = Config.OCR_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_pages ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_pages").fetchone()[0]
+
+    @staticmethod
+    def make_key(file_hash: str, page: int, dpi: int, engine_signature: str) -> str:
+        """Build the content-addressed cache key for one page."""
+        raw = f"{file_hash}|{page}|{dpi}|{engine_signature}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once and return a dict of the ones found.
+        Hit and miss counters are updated for every key requested.
+        """
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's limit on the number of bound parameters.
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, text FROM ocr_pages WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE ocr_pages SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str):
+        """Return the cached text for a key, or None if it is not cached."""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Store several (key, text) pairs and evict old entries if needed."""
+        items = [(key, text, len(text.encode("utf-8"))) for key, text in items]
+        if not items:
+            return
+        with self._lock:
+            now = time.time()
+            for key, text, size in items:
+                row = self._conn.execute("SELECT size FROM ocr_pages WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self._size -= row[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ocr_pages (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, text, size, now)
+                )
+                self._size += size
+            self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, text: str):
+        self.put_many([(key, text)])
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM ocr_pages ORDER BY last_access ASC LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                break
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM ocr_pages WHERE key = ?", (key,))
+                self._size -= size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM ocr_pages").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "size_bytes": self._size,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM ocr_pages")
+            self._conn.commit()
+            self._size = 0
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,170 @@
+import math
+import time
+import atexit
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from src.config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Target number of work units per worker when no timings are known yet.
+UNITS_PER_WORKER = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """
+    Return the process-wide OCR pool, creating it on first use.
+    The pool is shared by every PDF and lives until the interpreter exits.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_workers = Config.OCR_MAX_WORKERS or multiprocessing.cpu_count()
+            logger.info(f"Starting shared OCR process pool with {max_workers} workers.")
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+        return _pool
+
+
+def shutdown_ocr_pool():
+    """Shut down the shared OCR pool (a new one is created on next use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+atexit.register(shutdown_ocr_pool)
+
+
+def timed_call(fn, *args):
+    """Run fn(*args) and return its result together with the elapsed seconds."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class OCRJob:
+    """The pages of one PDF that need OCR."""
+
+    def __init__(self, file_path: str, file_name: str, pages):
+        self.file_path = file_path
+        self.file_name = file_name
+        self.pages = sorted(pages)
+
+
+class OCRScheduler:
+    """
+    Schedules OCR work for many PDFs at once on a shared executor.
+
+    Pages from every pending job are cut into work units of consecutive pages.
+    Units are sized so that all workers stay busy until the very end: at first
+    the remaining pages are spread over the workers, and once per-page timings
+    have been observed each unit is capped to roughly ``target_unit_seconds``
+    of work. Results are reassembled per job in page order.
+    """
+
+    def __init__(self, worker, worker_args=(), executor=None, max_workers=None,
+                 target_unit_seconds: float = Config.OCR_TARGET_UNIT_SECONDS,
+                 max_unit_pages: int = Config.OCR_MAX_UNIT_PAGES):
+        self.worker = worker
+        self.worker_args = tuple(worker_args)
+        self.executor = executor or get_ocr_pool()
+        self.max_workers = (
+            max_workers
+            or getattr(self.executor, "_max_workers", None)
+            or multiprocessing.cpu_count()
+        )
+        self.target_unit_seconds = target_unit_seconds
+        self.max_unit_pages = max_unit_pages
+        # Exponential moving average of the observed seconds per page.
+        self.seconds_per_page = None
+
+    def unit_size(self, unscheduled_pages: int) -> int:
+        """Return the number of pages to put in the next work unit."""
+        size = math.ceil(unscheduled_pages / (self.max_workers * UNITS_PER_WORKER))
+        if self.seconds_per_page:
+            size = min(size, int(self.target_unit_seconds / self.seconds_per_page))
+        return max(1, min(size, self.max_unit_pages))
+
+    def _observe(self, pages: int, seconds: float):
+        per_page = seconds / pages
+        if self.seconds_per_page is None:
+            self.seconds_per_page = per_page
+        else:
+            self.seconds_per_page = 0.8 * self.seconds_per_page + 0.2 * per_page
+
+    def run(self, jobs):
+        """
+        OCR every job and yield (job_index, docs) in the order the jobs were
+        given, as soon as a job and all jobs before it are complete.
+        The docs of each job are sorted by page number.
+        """
+        jobs = list(jobs)
+        # Queue of (job_index, start_page, last_page) runs of consecutive pages.
+        queue = deque()
+        for index, job in enumerate(jobs):
+            for page in job.pages:
+                if queue and queue[-1][0] == index and queue[-1][2] == page - 1:
+                    queue[-1] = (index, queue[-1][1], page)
+                else:
+                    queue.append((index, page, page))
+        unscheduled = sum(len(job.pages) for job in jobs)
+        remaining = [len(job.pages) for job in jobs]
+        results = [[] for _ in jobs]
+        in_flight = {}
+        next_to_yield = 0
+
+        def submit_next():
+            nonlocal unscheduled
+            index, start_page, last_page = queue.popleft()
+            size = self.unit_size(unscheduled)
+            if last_page - start_page + 1 > size:
+                # Put the rest of the run back at the front of the queue.
+                queue.appendleft((index, start_page + size, last_page))
+                last_page = start_page + size - 1
+            unscheduled -= last_page - start_page + 1
+            job = jobs[index]
+            future = self.executor.submit(
+                timed_call, self.worker, job.file_path, start_page, last_page, job.file_name,
+                *self.worker_args
+            )
+            in_flight[future] = (index, start_page, last_page)
+
+        # Keep a couple of units queued per worker so none of them go idle.
+        max_in_flight = self.max_workers * 2
+        while queue and len(in_flight) < max_in_flight:
+            submit_next()
+
+        while in_flight or next_to_yield < len(jobs):
+            if in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, start_page, last_page = in_flight.pop(future)
+                    pages = last_page - start_page + 1
+                    try:
+                        docs, seconds = future.result()
+                        self._observe(pages, seconds)
+                    except Exception as e:
+                        logger.error(
+                            f"Error processing pages {start_page} to {last_page} "
+                            f"of {jobs[index].file_name}: {e}"
+                        )
+                        docs = []
+                    results[index].extend(docs)
+                    remaining[index] -= pages
+                while queue and len(in_flight) < max_in_flight:
+                    submit_next()
+
+            while next_to_yield < len(jobs) and remaining[next_to_yield] == 0:
+                docs = sorted(results[next_to_yield], key=lambda doc: doc.metadata["page"])
+                results[next_to_yield] = None
+                yield next_to_yield, docs
+                next_to_yield += 1
@@ -1,128 +1,447 @@
 import os
+import re
+import time
 import logging
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import importlib
+from itertools import islice
 from langchain.schema import Document
 from src.config import Config
-
-# Imports for OCR on scanned PDFs
-from pdf2image import pdfinfo_from_path, convert_from_path
-import pytesseract
-from concurrent.futures import ProcessPoolExecutor, as_completed
-import multiprocessing
+from src.dedup import deduplicate_chunks, strip_boilerplate
+from src.manifest import compute_file_hash
+from src.ocr_cache import OCRCache, tesseract_signature
+from src.ocr_scheduler import OCRJob, OCRScheduler
+from src.telemetry import telemetry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_chunk(file_path, start_page, last_page, file_name, dpi):
+# PDF parsing, splitting and OCR dependencies, only imported once ingestion
+# needs them so that serving an existing index does not pay for them. They
+# resolve as module attributes (see __getattr__), where tests replace them.
+LAZY_IMPORTS = {
+    "PyPDFLoader": ("langchain_community.document_loaders", "PyPDFLoader"),
+    "RecursiveCharacterTextSplitter": ("langchain_text_splitters", "RecursiveCharacterTextSplitter"),
+    "convert_from_path": ("pdf2image", "convert_from_path"),
+    "pdfinfo_from_path": ("pdf2image", "pdfinfo_from_path"),
+    "pytesseract": ("pytesseract", None),
+}
+
+def __getattr__(name):
+    if name not in LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = LAZY_IMPORTS[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+def lazy(name):
+    """Return a lazily imported dependency (or its replacement set on this module)."""
+    return globals()[name] if name in globals() else __getattr__(name)
+
+# Pixels darker than this gray level count as ink when looking for blank pages.
+INK_LEVEL = 128
+
+def ocr_settings_signature(tesseract_config: str = "") -> str:
     """
-    Convert a chunk of pages from the PDF to images and perform OCR on each page.
-    Returns a list of Document objects.
+    Identify the OCR engine and every setting that changes its output, so
+    that cached OCR results are invalidated when any of them changes.
     """
-    try:
-        pages = convert_from_path(
-            file_path,
-            dpi=dpi,
-            first_page=start_page,
-            last_page=last_page
-        )
-    except Exception as e:
-        logger.error(f"Error converting pages {start_page} to {last_page} of {file_name}: {e}")
-        return []
-    
-    docs = []
-    for i, page in enumerate(pages):
-        page_number = start_page + i
-        logger.info(f"Performing OCR on page {page_number} of {file_name}...")
+    return (
+        f"{tesseract_signature(tesseract_config)}|dpi={Config.OCR_DPI},{','.join(map(str, Config.OCR_RESCAN_DPIS))}"
+        f"|min_confidence={Config.OCR_MIN_CONFIDENCE}|grayscale={Config.OCR_GRAYSCALE}"
+        f"|blank={Config.OCR_BLANK_INK_RATIO}"
+    )
+
+def ink_ratio(image) -> float:
+    """Return the share of dark pixels of a page image."""
+    histogram = (image if image.mode == "L" else image.convert("L")).histogram()
+    return sum(histogram[:INK_LEVEL]) / max(sum(histogram), 1)
+
+def ocr_image(image, tesseract_config=""):
+    """
+    OCR a page image with a single Tesseract run and return its text and the
+    mean confidence (0-100) of the words recognised, 0 when there are none.
+    """
+    pytesseract = lazy("pytesseract")
+    data = pytesseract.image_to_data(image, config=tesseract_config, output_type=pytesseract.Output.DICT)
+    paragraphs = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        confidence = float(data["conf"][i])
+        if not word or confidence < 0:
+            continue
+        confidences.append(confidence)
+        paragraph = paragraphs.setdefault((data["block_num"][i], data["par_num"][i]), {})
+        paragraph.setdefault(data["line_num"][i], []).append(word)
+    text = "\n\n".join(
+        "\n".join(" ".join(words) for words in lines.values()) for lines in paragraphs.values()
+    )
+    return text, sum(confidences) / len(confidences) if confidences else 0.0
+
+def ocr_page(file_path, page_number, file_name, dpis, tesseract_config="",
+             min_confidence=Config.OCR_MIN_CONFIDENCE, grayscale=Config.OCR_GRAYSCALE,
+             blank_ink_ratio=Config.OCR_BLANK_INK_RATIO):
+    """
+    Rasterize and OCR one page, at each resolution of dpis in turn until
+    Tesseract's confidence reaches min_confidence, keeping the most
+    confident result. Blank pages are detected on the first raster and not
+    OCR'd. Returns a Document, or None if the page could not be rasterized.
+    """
+    metadata = {"source": file_name, "page": page_number, "rasterize_seconds": 0.0, "ocr_seconds": 0.0}
+    best = None
+    for attempt, dpi in enumerate(dpis):
+        start = time.perf_counter()
+        try:
+            images = lazy("convert_from_path")(
+                file_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=grayscale
+            )
+        except Exception as e:
+            logger.error(f"Error converting page {page_number} of {file_name} at {dpi} DPI: {e}")
+            images = []
+        metadata["rasterize_seconds"] += time.perf_counter() - start
+        if not images:
+            if attempt == 0:
+                return None
+            break
+        image = images[0]
+        del images
+        if attempt == 0 and ink_ratio(image) < blank_ink_ratio:
+            metadata.update(ocr_blank=True, ocr_dpi=dpi)
+            logger.info(f"Page {page_number} of {file_name} is blank, skipping OCR.")
+            return Document(page_content="", metadata=metadata)
+
+        start = time.perf_counter()
         try:
-            text = pytesseract.image_to_string(page)
+            text, confidence = ocr_image(image, tesseract_config)
         except Exception as ex:
-            logger.error(f"Error during OCR on page {page_number}: {ex}")
-            text = ""
-        metadata = {"source": file_name, "page": page_number}
-        docs.append(Document(page_content=text, metadata=metadata))
+            logger.error(f"Error during OCR on page {page_number} at {dpi} DPI: {ex}")
+            break
+        finally:
+            metadata["ocr_seconds"] += time.perf_counter() - start
+        # Release the raster before a higher resolution one is made.
+        del image
+        if best is None or confidence > best[1]:
+            best = (text, confidence, dpi)
+        if confidence >= min_confidence:
+            break
+
+    if best is None:
+        # Flag the failure so the empty result is not cached.
+        metadata["ocr_error"] = True
+        return Document(page_content="", metadata=metadata)
+    text, confidence, dpi = best
+    metadata.update(ocr_confidence=confidence, ocr_dpi=dpi, ocr_attempts=attempt + 1)
+    logger.info(
+        f"OCR of page {page_number} of {file_name}: confidence {confidence:.0f} at {dpi} DPI "
+        f"in {metadata['rasterize_seconds'] + metadata['ocr_seconds']:.2f}s ({attempt + 1} attempts)."
+    )
+    return Document(page_content=text, metadata=metadata)
+
+def process_chunk(file_path, start_page, last_page, file_name, dpis, tesseract_config="",
+                  min_confidence=Config.OCR_MIN_CONFIDENCE, grayscale=Config.OCR_GRAYSCALE,
+                  blank_ink_ratio=Config.OCR_BLANK_INK_RATIO):
+    """
+    OCR a range of pages of a PDF, rasterizing one page at a time so that
+    only a single page image is held in memory. Returns a list of Document
+    objects; pages that could not be rasterized are left out.
+    """
+    docs = []
+    for page_number in range(start_page, last_page + 1):
+        doc = ocr_page(
+            file_path, page_number, file_name, dpis, tesseract_config, min_confidence, grayscale, blank_ink_ratio
+        )
+        if doc is not None:
+            docs.append(doc)
     return docs
 
+# Glyphs without a Unicode mapping are extracted as "(cid:123)" escapes.
+CID_ESCAPE = re.compile(r"\(cid:\d+\)")
+
+def page_needs_ocr(text: str) -> bool:
+    """
+    Decide whether a page's extracted text layer is too thin or too garbled
+    to be used, in which case the page should be OCR'd instead.
+    """
+    stripped = text.strip()
+    cleaned = CID_ESCAPE.sub("", stripped)
+    alnum = sum(ch.isalnum() for ch in cleaned)
+    if alnum < Config.OCR_MIN_TEXT_CHARS:
+        return True
+    non_space = sum(not ch.isspace() for ch in stripped)
+    return alnum / non_space < Config.OCR_MIN_ALNUM_RATIO
+
 class PDFProcessor:
-    def __init__(self, data_folder: str = Config.DATA_FOLDER):
+    def __init__(self, data_folder: str = Config.DATA_FOLDER, ocr_cache=None, ocr_executor=None):
         self.data_folder = data_folder
         self.documents = []
+        self._ocr_cache = ocr_cache
+        # Executor for OCR work; defaults to the process-wide shared pool.
+        self.ocr_executor = ocr_executor
+
+    @property
+    def ocr_cache(self):
+        """The OCR result cache, opened on first use (None when disabled)."""
+        if self._ocr_cache is None and Config.OCR_CACHE_ENABLED:
+            self._ocr_cache = OCRCache()
+        return self._ocr_cache
     
+    def list_pdfs(self):
+        """
+        Return the paths of all PDF files in the data folder, sorted by name.
+        """
+        pdf_files = sorted(f for f in os.listdir(self.data_folder) if f.lower().endswith('.pdf'))
+        return [os.path.join(self.data_folder, f) for f in pdf_files]
+
     def load_pdfs(self):
         """
         Load all PDF files from the data folder and store metadata.
-        If a PDF appears to be scanned (i.e., no text is extracted), use OCR.
+        Pages without a usable text layer are OCR'd, with the OCR work of all
+        PDFs scheduled together on the shared process pool.
         """
-        pdf_files = [f for f in os.listdir(self.data_folder) if f.lower().endswith('.pdf')]
-        if not pdf_files:
+        pdf_paths = self.list_pdfs()
+        if not pdf_paths:
             logger.warning(f"No PDF files found in {self.data_folder}.")
-        for pdf_file in pdf_files:
-            file_path = os.path.join(self.data_folder, pdf_file)
-            logger.info(f"Loading {file_path} ...")
-            loader = PyPDFLoader(file_path)
-            docs = loader.load()
-            
-            # Check if the loaded documents contain meaningful text.
-            # If not, assume this is a scanned PDF and use OCR.
-            if not docs or all(len(doc.page_content.strip()) == 0 for doc in docs):
-                logger.info(f"No text extracted from {pdf_file}. Assuming it's a scanned PDF. Running OCR...")
-                docs = self.load_scanned_pdf(file_path)
-            else:
-                # For non-scanned PDFs, ensure metadata (source and page number) is set.
-                for i, doc in enumerate(docs):
-                    doc.metadata["source"] = pdf_file
-                    doc.metadata["page"] = i + 1
-            
+        for docs in self.iter_pdfs((file_path, None) for file_path in pdf_paths):
             self.documents.extend(docs)
+        self.log_ocr_cache_stats()
         return self.documents
 
-    def load_scanned_pdf(self, file_path):
+    def log_ocr_cache_stats(self):
+        """Log the OCR cache hit/miss counters if the cache has been used."""
+        if self._ocr_cache is not None:
+            logger.info("OCR cache stats: %s", self._ocr_cache.stats())
+
+    def load_pdf(self, file_path, file_hash=None):
         """
-        Convert scanned PDF pages in chunks of 10 pages at a time,
-        perform OCR on each chunk concurrently using a process pool,
-        and return a list of Document objects with the OCR results.
+        Load a single PDF file and return its pages as Document objects.
+        Pages with a usable text layer are taken as-is; pages that appear to be
+        scanned (no or garbled text) are sent through OCR.
         """
-        ocr_docs = []
-        try:
-            info = pdfinfo_from_path(file_path)
-            maxPages = info["Pages"]
-        except Exception as e:
-            logger.error(f"Error getting page count from {file_path}: {e}")
-            return ocr_docs
-
-        file_name = os.path.basename(file_path)
-        dpi = 200
-        # Create a list of chunks (each chunk is 10 pages)
-        chunks = []
-        for start_page in range(1, maxPages + 1, 10):
-            last_page = min(start_page + 10 - 1, maxPages)
-            chunks.append((file_path, start_page, last_page, file_name, dpi))
-            logger.info(f"Scheduled conversion for pages {start_page} to {last_page} of {file_name}...")
-
-        # Use ProcessPoolExecutor to process each chunk concurrently.
-        max_workers = min(len(chunks), multiprocessing.cpu_count())
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(process_chunk, *chunk) for chunk in chunks]
-            for future in as_completed(futures):
-                try:
-                    chunk_docs = future.result()
-                    ocr_docs.extend(chunk_docs)
-                except Exception as e:
-                    logger.error(f"Error processing a chunk: {e}")
-
-        return ocr_docs
+        return next(self.iter_pdfs([(file_path, file_hash)]))
+
+    def iter_pdfs(self, files, lookahead: int = Config.INGEST_LOOKAHEAD_FILES):
+        """
+        Yield the pages of each (file_path, file_hash) pair, in order.
+        Files are processed in windows of up to ``lookahead`` files: the text
+        layer of every file in the window is extracted first, then the pages
+        that need OCR are scheduled across all of them at once. Only one
+        window of pages is held in memory at a time.
+        """
+        files = iter(files)
+        while True:
+            window = list(islice(files, lookahead))
+            if not window:
+                return
+            extracted = []
+            requests = []
+            for file_path, file_hash in window:
+                docs, ocr_pages = self._extract_text_pages(file_path)
+                extracted.append(docs)
+                requests.append((file_path, file_hash, ocr_pages))
+
+            for docs, ocr_docs in zip(extracted, self.ocr_pdfs(requests)):
+                if not docs:
+                    yield ocr_docs
+                    continue
+                for ocr_doc in ocr_docs:
+                    # Keep the text layer if OCR produced nothing better.
+                    if ocr_doc.page_content.strip():
+                        docs[ocr_doc.metadata["page"] - 1] = ocr_doc
+                yield docs
+
+    def _extract_text_pages(self, file_path):
+        """
+        Extract the text layer of a PDF with PyPDF and classify its pages.
+        Returns the page documents and the page numbers that need OCR
+        (None meaning every page, when no pages could be extracted).
+        """
+        pdf_file = os.path.basename(file_path)
+        logger.info(f"Loading {file_path} ...")
+        with telemetry.span("pdf_load"):
+            loader = lazy("PyPDFLoader")(file_path)
+            docs = loader.load()
+        telemetry.count("pdf_pages", len(docs))
+
+        if not docs:
+            logger.info(f"No pages extracted from {pdf_file}. Assuming it's a scanned PDF. Running OCR...")
+            return [], None
+
+        # Ensure metadata (source and page number) is set on every page.
+        for i, doc in enumerate(docs):
+            doc.metadata["source"] = pdf_file
+            doc.metadata["page"] = i + 1
+
+        # Classify each page and only OCR the ones without a usable text layer.
+        ocr_pages = [i + 1 for i, doc in enumerate(docs) if page_needs_ocr(doc.page_content)]
+        telemetry.count("pdf_pages_needing_ocr", len(ocr_pages))
+        if ocr_pages:
+            logger.info(
+                f"{len(ocr_pages)} of {len(docs)} pages of {pdf_file} have no usable text layer. "
+                "Running OCR on them..."
+            )
+        return docs, ocr_pages
+
+    def load_scanned_pdf(self, file_path, file_hash=None, pages=None):
+        """
+        Perform OCR on a scanned PDF (or only the given 1-based page numbers)
+        and return a list of Document objects ordered by page.
+        """
+        return self.ocr_pdfs([(file_path, file_hash, pages)])[0]
+
+    def ocr_pdfs(self, requests):
+        """
+        Perform OCR for several (file_path, file_hash, pages) requests, where
+        pages is a list of 1-based page numbers or None for every page.
+        Pages already present in the OCR cache are served from it; the rest of
+        every request is scheduled together on the shared OCR process pool.
+        Returns one page-ordered list of Document objects per request.
+        """
+        requests = list(requests)
+        results = [[] for _ in requests]
+        dpi = Config.OCR_DPI
+        dpis = (dpi, *(rescan for rescan in Config.OCR_RESCAN_DPIS if rescan > dpi))
+        tesseract_config = Config.TESSERACT_CONFIG
+        cache = None
+        signature = None
+
+        jobs = []
+        job_requests = []
+        job_keys = []
+        for index, (file_path, file_hash, pages) in enumerate(requests):
+            if pages is not None and not pages:
+                continue
+            try:
+                info = lazy("pdfinfo_from_path")(file_path)
+                maxPages = info["Pages"]
+            except Exception as e:
+                logger.error(f"Error getting page count from {file_path}: {e}")
+                continue
+
+            if pages is None:
+                pages = range(1, maxPages + 1)
+            pages = sorted(page for page in set(pages) if 1 <= page <= maxPages)
+            file_name = os.path.basename(file_path)
+
+            # Serve whatever we can from the cache, keyed by the PDF's content hash.
+            keys = {}
+            if cache is None and self.ocr_cache is not None:
+                cache = self.ocr_cache
+                signature = ocr_settings_signature(tesseract_config)
+            if cache is not None:
+                if file_hash is None:
+                    file_hash = compute_file_hash(file_path)
+                keys = {
+                    page: OCRCache.make_key(file_hash, page, dpi, signature)
+                    for page in pages
+                }
+                cached = cache.get_many(keys.values())
+                for page, key in keys.items():
+                    if key in cached:
+                        metadata = {"source": file_name, "page": page}
+                        results[index].append(Document(page_content=cached[key], metadata=metadata))
+                logger.info(
+                    f"{len(results[index])} of {len(pages)} pages of {file_name} served from the OCR cache."
+                )
+                telemetry.count("ocr_pages", len(results[index]), cached="true")
+            cached_pages = {doc.metadata["page"] for doc in results[index]}
+            uncached_pages = [page for page in pages if page not in cached_pages]
+            if uncached_pages:
+                logger.info(f"Scheduled OCR for {len(uncached_pages)} pages of {file_name}...")
+                jobs.append(OCRJob(file_path, file_name, uncached_pages))
+                job_requests.append(index)
+                job_keys.append(keys)
+
+        if jobs:
+            scheduler = OCRScheduler(
+                process_chunk,
+                worker_args=(
+                    dpis, tesseract_config, Config.OCR_MIN_CONFIDENCE, Config.OCR_GRAYSCALE,
+                    Config.OCR_BLANK_INK_RATIO,
+                ),
+                executor=self.ocr_executor,
+            )
+            for job_index, docs in scheduler.run(jobs):
+                index = job_requests[job_index]
+                self._record_ocr_stats(jobs[job_index].file_name, docs)
+                telemetry.count("ocr_pages", len(docs), cached="false")
+                results[index].extend(docs)
+                if cache is not None:
+                    keys = job_keys[job_index]
+                    cache.put_many(
+                        (keys[doc.metadata["page"]], doc.page_content)
+                        for doc in docs if not doc.metadata.get("ocr_error")
+                    )
+
+        for docs in results:
+            docs.sort(key=lambda doc: doc.metadata["page"])
+        return results
+
+    @staticmethod
+    def _record_ocr_stats(file_name, docs):
+        """
+        Move the per-page OCR statistics the workers report in the page
+        metadata to telemetry, and log a summary of them for the file.
+        Cached pages carry none, so pages have the same metadata either way.
+        """
+        confidences = []
+        rescanned = blank = 0
+        for doc in docs:
+            telemetry.observe("rasterize_page", doc.metadata.pop("rasterize_seconds", 0.0))
+            telemetry.observe("ocr_page", doc.metadata.pop("ocr_seconds", 0.0))
+            blank += doc.metadata.pop("ocr_blank", False)
+            rescanned += doc.metadata.pop("ocr_attempts", 1) > 1
+            confidence = doc.metadata.pop("ocr_confidence", None)
+            doc.metadata.pop("ocr_dpi", None)
+            if confidence is not None:
+                confidences.append(confidence)
+        low = sum(confidence < Config.OCR_MIN_CONFIDENCE for confidence in confidences)
+        telemetry.count("ocr_pages_blank", blank)
+        telemetry.count("ocr_pages_rescanned", rescanned)
+        telemetry.count("ocr_pages_low_confidence", low)
+        if confidences:
+            logger.info(
+                f"OCR of {file_name}: mean confidence {sum(confidences) / len(confidences):.0f} over "
+                f"{len(confidences)} pages, {rescanned} rescanned at a higher DPI, {low} still below "
+                f"{Config.OCR_MIN_CONFIDENCE:.0f}, {blank} blank."
+            )
+
+    def iter_chunks(self, docs):
+        """
+        Lazily split page documents into chunks, one page at a time.
+        Yields the same chunks, in the same order, as split_documents(docs).
+        Boilerplate and near-duplicate removal need every page of a PDF, so
+        with them enabled the PDF is split at once.
+        """
+        if Config.BOILERPLATE_REMOVAL_ENABLED or Config.NEAR_DUPLICATE_REMOVAL_ENABLED:
+            yield from self.split_documents(docs)
+            return
+        for doc in docs:
+            yield from self.split_documents([doc])
 
     def split_documents(self, docs=None):
         """
         Split documents into smaller chunks for better retrieval while preserving metadata.
+        Lines repeated across the pages of a PDF are stripped first, and chunks
+        that nearly duplicate an earlier chunk of the same PDF are dropped.
         """
         if docs is None:
             docs = self.documents
-        text_splitter = RecursiveCharacterTextSplitter(
+        if Config.BOILERPLATE_REMOVAL_ENABLED:
+            docs = strip_boilerplate(docs)
+        text_splitter = lazy("RecursiveCharacterTextSplitter")(
             chunk_size=Config.CHUNK_SIZE,
             chunk_overlap=Config.CHUNK_OVERLAP
         )
-        split_docs = text_splitter.split_documents(docs)
+        with telemetry.span("split"):
+            split_docs = text_splitter.split_documents(docs)
+        if Config.NEAR_DUPLICATE_REMOVAL_ENABLED:
+            count = len(split_docs)
+            split_docs = deduplicate_chunks(split_docs)
+            telemetry.count("chunks_deduplicated", count - len(split_docs))
+        telemetry.count("chunks", len(split_docs))
 
         # Prepend source info (PDF file and page number) to each chunk's content.
         for doc in split_docs:
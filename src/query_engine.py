@@ -1,57 +1,385 @@
+import re
+import time
+import asyncio
 import logging
-from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from langchain.prompts import PromptTemplate
-from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain_core.output_parsers import StrOutputParser
 from src.config import Config
+from src.answer_cache import AnswerCache
+from src.context_packer import ContextPacker, PackedRetriever
+from src.memory import SummarizingMemory
+from src.resources import get_chat_model, get_llm_limiter, registry
+from src.telemetry import telemetry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Words that make a follow-up question depend on the conversation so far.
+FOLLOW_UP_MARKERS = re.compile(
+    r"\b(it|its|it's|this|that|these|those|they|them|their|there|he|she|him|her|"
+    r"above|previous|previously|same|former|latter|again|also|else|next|then|"
+    r"what about|how about|and the)\b",
+    re.IGNORECASE
+)
+
+_speculation_pool = None
+_speculation_lock = threading.Lock()
+
+
+def get_speculation_pool():
+    """Return the shared thread pool used for speculative retrieval."""
+    global _speculation_pool
+    with _speculation_lock:
+        if _speculation_pool is None:
+            _speculation_pool = ThreadPoolExecutor(
+                max_workers=Config.SPECULATION_WORKERS, thread_name_prefix="speculative-retrieval"
+            )
+        return _speculation_pool
+
+
+def is_self_contained(question: str) -> bool:
+    """
+    Decide locally whether a question can be answered without rewriting it
+    using the conversation history: it must not refer back to earlier turns
+    and must be long enough to carry its own subject.
+    """
+    if len(question.split()) < Config.SELF_CONTAINED_MIN_WORDS:
+        return False
+    return FOLLOW_UP_MARKERS.search(question) is None
+
+
+def same_question(first: str, second: str) -> bool:
+    """Whether two phrasings share enough words to retrieve the same context."""
+    a = set(re.findall(r"\w+", first.lower()))
+    b = set(re.findall(r"\w+", second.lower()))
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= Config.SPECULATION_REUSE_THRESHOLD
+
+
+def build_qa_chain(llm):
+    """Chain answering a question from the retrieved context and the history."""
+    qa_prompt = PromptTemplate(
+        input_variables=["context", "chat_history", "question"],
+        template=Config.PROMPT_TEMPLATE
+    )
+    return qa_prompt | llm | StrOutputParser()
+
+
+def build_condense_chain(llm):
+    """Chain rewriting a follow-up question into a standalone question."""
+    return CONDENSE_QUESTION_PROMPT | llm | StrOutputParser()
+
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    """Record the wall-clock duration of a stage, in seconds, into timings."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
 class QueryEngine:
-    def __init__(self, vector_store, retriever, temperature: float = 0.0, top_k: int = 3):
+    def __init__(self, vector_store, retriever, temperature: float = 0.0, top_k: int = 3, packer=None,
+                 llm=None, condense_llm=None, answer_cache=None, llm_limiter=None):
         """
         Initializes the QueryEngine with a vector store, retriever, and conversation memory.
+        Retrieved chunks are merged per page, de-duplicated and packed into the
+        context token budget, keeping at most top_k page sections.
+        Follow-up questions are rewritten into standalone questions by
+        condense_llm (Config.CONDENSE_MODEL by default), which also summarizes
+        older conversation turns.
+        First-turn questions are answered from answer_cache, if given, when a
+        similar question retrieving the same chunks was answered before.
+
+        Unless models are injected, the chat clients and compiled chains are
+        shared by every QueryEngine in the process, so an engine only holds
+        per-conversation state. Every LLM call waits for a slot of llm_limiter
+        (the process-wide limiter by default).
         """
         self.vector_store = vector_store
-        self.llm = ChatOpenAI(
-            temperature=temperature,
-            openai_api_key=Config.OPENAI_API_KEY,
-            model='gpt-4-turbo-preview'
-        )
-        self.retriever = retriever
+        if llm is None:
+            self.llm = get_chat_model(Config.LLM_MODEL, temperature)
+            self.qa_chain = registry.get(
+                ("qa_chain", Config.LLM_MODEL, temperature), lambda: build_qa_chain(self.llm)
+            )
+        else:
+            self.llm = llm
+            self.qa_chain = build_qa_chain(llm)
+        if condense_llm is None and llm is None and Config.CONDENSE_MODEL:
+            self.condense_llm = get_chat_model(Config.CONDENSE_MODEL, 0.0)
+            self.condense_chain = registry.get(
+                ("condense_chain", Config.CONDENSE_MODEL), lambda: build_condense_chain(self.condense_llm)
+            )
+        else:
+            self.condense_llm = condense_llm or self.llm
+            self.condense_chain = build_condense_chain(self.condense_llm)
+        self.llm_limiter = llm_limiter or get_llm_limiter()
         self.top_k = top_k
+        self.answer_cache = answer_cache
+        self.packer = packer or ContextPacker()
+        self.retriever = PackedRetriever(base_retriever=retriever, packer=self.packer, max_sections=top_k)
 
-        # Initialize conversation memory. Set return_messages=True so that the memory
-        # keeps a list of message objects.
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+        # Initialize conversation memory. Recent turns are kept verbatim and older
+        # ones are summarized so the history stays under its token ceiling.
+        self.memory = SummarizingMemory(llm=self.condense_llm, memory_key="chat_history", limiter=self.llm_limiter)
 
-        # Prompt template that includes PDF context and the conversation history.
-        qa_prompt = PromptTemplate(
-            input_variables=["context", "chat_history", "question"],
-            template=Config.PROMPT_TEMPLATE
-        )
+        # Per-stage timings (in seconds) and cited sources of the most recent query.
+        self.last_timings = {}
+        self.last_sources = []
+        logger.info("QueryEngine initialized.")
+
+    def condense_question(self, question: str, chat_history: str) -> str:
+        """Rewrite a follow-up question into a standalone question."""
+        with self.llm_limiter.slot():
+            return self.condense_chain.invoke({"question": question, "chat_history": chat_history}).strip()
+
+    def retrieve(self, question: str, chat_history: str, timings: dict):
+        """
+        Return the standalone question and the packed context documents.
+
+        The condensing LLM call is skipped on the first turn and for questions
+        that are detected locally as self-contained. Otherwise retrieval on the
+        raw question runs speculatively while the question is condensed, and
+        its result is used if the standalone question turns out to be
+        essentially the same.
+        """
+        if not chat_history or is_self_contained(question):
+            timings["condense"] = 0.0
+            with timed(timings, "retrieve"):
+                docs = self.retriever.invoke(question)
+            return question, docs
+
+        speculative = None
+        if Config.SPECULATIVE_RETRIEVAL:
+            speculative = get_speculation_pool().submit(self._timed_retrieve, question)
+        with timed(timings, "condense"):
+            standalone = self.condense_question(question, chat_history) or question
+        logger.info("Standalone question: %s", standalone)
+
+        if speculative is not None and same_question(question, standalone):
+            logger.info("Using the speculative retrieval on the raw question.")
+            with timed(timings, "retrieve_wait"):
+                docs, timings["retrieve"] = speculative.result()
+            return standalone, docs
+
+        with timed(timings, "retrieve"):
+            docs = self.retriever.invoke(standalone)
+        return standalone, docs
 
-        # Conversational retrieval chain that uses our LLM, retriever, and memory.
-        self.qa_chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.retriever,
-            memory=self.memory,
-            combine_docs_chain_kwargs={"prompt": qa_prompt}
+    async def aretrieve(self, question: str, chat_history: str, timings: dict):
+        """Async version of retrieve(); speculative retrieval runs as a concurrent task."""
+        if not chat_history or is_self_contained(question):
+            timings["condense"] = 0.0
+            with timed(timings, "retrieve"):
+                docs = await self.retriever.ainvoke(question)
+            return question, docs
+
+        speculative = None
+        if Config.SPECULATIVE_RETRIEVAL:
+            speculative = asyncio.create_task(self._atimed_retrieve(question))
+        with timed(timings, "condense"):
+            async with self.llm_limiter.aslot():
+                standalone = (await self.condense_chain.ainvoke(
+                    {"question": question, "chat_history": chat_history}
+                )).strip() or question
+        logger.info("Standalone question: %s", standalone)
+
+        if speculative is not None and same_question(question, standalone):
+            logger.info("Using the speculative retrieval on the raw question.")
+            with timed(timings, "retrieve_wait"):
+                docs, timings["retrieve"] = await speculative
+            return standalone, docs
+
+        if speculative is not None:
+            speculative.cancel()
+        with timed(timings, "retrieve"):
+            docs = await self.retriever.ainvoke(standalone)
+        return standalone, docs
+
+    async def _atimed_retrieve(self, question: str):
+        start = time.perf_counter()
+        docs = await self.retriever.ainvoke(question)
+        return docs, time.perf_counter() - start
+
+    def _timed_retrieve(self, question: str):
+        start = time.perf_counter()
+        docs = self.retriever.invoke(question)
+        return docs, time.perf_counter() - start
+
+    def _prepare(self, question: str, timings: dict):
+        """Retrieve context for a question and build the answer prompt inputs."""
+        chat_history = self.memory.history_text()
+        logger.info("Conversation history: %d tokens.", self.memory.history_token_count())
+        standalone, docs = self.retrieve(question, chat_history, timings)
+        return answer_inputs(standalone, docs, chat_history), docs
+
+    def _cached_answer(self, question: str, inputs: dict, docs, timings: dict):
+        """
+        Look a first-turn question up in the answer cache.
+        Returns the cached answer (or None) and the key under which a newly
+        generated answer should be cached (None if it is not eligible).
+        """
+        if self.answer_cache is None or inputs["chat_history"]:
+            return None, None
+        with timed(timings, "cache"):
+            # The retriever has just embedded the same question, so this is
+            # served by the embedding cache.
+            vector = self.vector_store.embeddings.embed_query(question)
+            scope = AnswerCache.make_scope(getattr(self.vector_store, "index_version", ""), chunk_ids_of(docs))
+            answer = self.answer_cache.get(vector, scope)
+        telemetry.count("answer_cache_lookups", result="hit" if answer is not None else "miss")
+        stats = self.answer_cache.stats()
+        logger.info("Answer cache %s (hit rate %.0f%% over %d lookups).",
+                    "hit" if answer is not None else "miss",
+                    stats["hit_rate"] * 100, stats["hits"] + stats["misses"])
+        return answer, (vector, scope)
+
+    def _finish(self, question: str, answer: str, timings: dict, docs, inputs: dict):
+        """Store a completed turn in memory and report the stage timings."""
+        with timed(timings, "memory"):
+            self.memory.add_turn(question, answer)
+        self.last_timings = timings
+        self.last_sources = sources_of(docs)
+        logger.info(
+            "LLM response obtained. Stage timings: %s",
+            ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items())
         )
-        logger.info("QueryEngine initialized.")
+        if telemetry.enabled:
+            telemetry.count("queries")
+            for stage, seconds in timings.items():
+                telemetry.observe("query_stage", seconds, stage=stage)
+            if "generate" in timings:
+                # Approximate: the prompt template itself is not counted.
+                telemetry.count("llm_tokens", sum(map(self.packer.count_tokens, inputs.values())), direction="in")
+                telemetry.count("llm_tokens", self.packer.count_tokens(answer), direction="out")
 
     def query(self, question: str) -> str:
         logger.info("Processing query: %s", question)
-        chat_history_messages = self.memory.chat_memory.messages
-        chat_history = "\n".join([msg.content for msg in chat_history_messages])
-        
-        result = self.qa_chain.invoke({
-            "question": question,
-            "chat_history": chat_history
-        })
-        logger.info("LLM response obtained.")
-        return result['answer']
\ No newline at end of file
+        timings = {}
+        with timed(timings, "total"):
+            inputs, docs = self._prepare(question, timings)
+            answer, cache_key = self._cached_answer(question, inputs, docs, timings)
+            if answer is None:
+                with self.llm_limiter.slot() as timings["llm_wait"], timed(timings, "generate"):
+                    answer = self.qa_chain.invoke(inputs)
+                if cache_key is not None:
+                    self.answer_cache.put(*cache_key, answer)
+        self._finish(question, answer, timings, docs, inputs)
+        return answer
+
+    async def aquery(self, question: str) -> str:
+        """
+        Async version of query(): retrieval and LLM calls are awaited so many
+        conversations can be served concurrently from one event loop.
+        """
+        logger.info("Processing async query: %s", question)
+        timings = {}
+        with timed(timings, "total"):
+            chat_history = self.memory.history_text()
+            standalone, docs = await self.aretrieve(question, chat_history, timings)
+            inputs = answer_inputs(standalone, docs, chat_history)
+            answer, cache_key = await asyncio.to_thread(self._cached_answer, question, inputs, docs, timings)
+            if answer is None:
+                async with self.llm_limiter.aslot() as timings["llm_wait"]:
+                    with timed(timings, "generate"):
+                        answer = await self.qa_chain.ainvoke(inputs)
+                if cache_key is not None:
+                    self.answer_cache.put(*cache_key, answer)
+        # Summarizing older turns may call the LLM, so keep it off the event loop.
+        await asyncio.to_thread(self._finish, question, answer, timings, docs, inputs)
+        return answer
+
+    def stream(self, question: str) -> "AnswerStream":
+        """
+        Answer a question, streaming the answer as it is generated.
+        Returns an AnswerStream yielding answer tokens; once it is exhausted it
+        also holds the complete answer, the cited sources and stage timings.
+        """
+        return AnswerStream(self._stream(question))
+
+    def _stream(self, question: str):
+        logger.info("Processing streamed query: %s", question)
+        timings = {}
+        start = time.perf_counter()
+        inputs, docs = self._prepare(question, timings)
+        answer, cache_key = self._cached_answer(question, inputs, docs, timings)
+        if answer is not None:
+            timings["first_token"] = time.perf_counter() - start
+            yield answer
+        else:
+            parts = []
+            # The slot is held until the last token has been streamed.
+            with self.llm_limiter.slot() as timings["llm_wait"]:
+                generate_start = time.perf_counter()
+                for token in self.qa_chain.stream(inputs):
+                    if not parts:
+                        timings["first_token"] = time.perf_counter() - start
+                        logger.info("Time to first token: %.3fs", timings["first_token"])
+                    parts.append(token)
+                    yield token
+                timings["generate"] = time.perf_counter() - generate_start
+            answer = "".join(parts)
+            if cache_key is not None:
+                self.answer_cache.put(*cache_key, answer)
+        timings["total"] = time.perf_counter() - start
+        self._finish(question, answer, timings, docs, inputs)
+        return {"answer": answer, "sources": sources_of(docs), "timings": timings}
+
+
+def answer_inputs(question: str, docs, chat_history: str) -> dict:
+    """Inputs of the answer chain for a standalone question and its context."""
+    return {
+        "context": "\n\n".join(doc.page_content for doc in docs),
+        "chat_history": chat_history,
+        "question": question
+    }
+
+
+def sources_of(docs):
+    """
+    Return the distinct (source, page) pairs of the context documents, in
+    order, with the other pages holding the same text where there are any.
+    """
+    sources = []
+    for doc in docs:
+        source = {"source": doc.metadata.get("source"), "page": doc.metadata.get("page")}
+        if doc.metadata.get("duplicate_pages"):
+            source["duplicate_pages"] = doc.metadata["duplicate_pages"]
+        if source not in sources:
+            sources.append(source)
+    return sources
+
+
+def chunk_ids_of(docs):
+    """Return the IDs of the chunks behind the packed context documents."""
+    chunk_ids = []
+    for doc in docs:
+        # Chunks without an ID are identified by their content.
+        chunk_ids.extend(doc.metadata.get("chunk_ids") or [doc.page_content])
+    return chunk_ids
+
+
+class AnswerStream:
+    """
+    Iterator over the tokens of a streamed answer.
+    After iteration, answer, sources and timings describe the complete answer.
+    """
+
+    def __init__(self, generator):
+        self._generator = generator
+        self.answer = None
+        self.sources = []
+        self.timings = {}
+
+    def __iter__(self):
+        result = yield from self._generator
+        self.answer = result["answer"]
+        self.sources = result["sources"]
+        self.timings = result["timings"]
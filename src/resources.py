@@ -0,0 +1,255 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+import httpx
+from src.config import Config
+from src.answer_cache import AnswerCache
+from src.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """
+    Process-wide store of heavy, stateless resources (HTTP clients, LLM and
+    embedding clients, retrievers, compiled chains) shared by every session.
+    Each resource is created once, on first use, by the factory passed to get().
+    """
+
+    def __init__(self):
+        self._resources = {}
+        self._lock = threading.RLock()
+
+    def get(self, key, factory):
+        """Return the resource stored under key, creating it with factory if needed."""
+        with self._lock:
+            if key not in self._resources:
+                logger.info(f"Creating shared resource {key!r}.")
+                self._resources[key] = factory()
+            return self._resources[key]
+
+    def __contains__(self, key):
+        return key in self._resources
+
+    def clear(self):
+        """Forget every resource, closing those that hold connections."""
+        with self._lock:
+            for resource in self._resources.values():
+                close = getattr(resource, "close", None)
+                if callable(close):
+                    try:
+                        close()
+                    except Exception as e:
+                        logger.warning(f"Could not close a shared resource: {e}")
+            self._resources.clear()
+
+
+class _Waiter:
+    """A caller queued for a slot, woken through notify() when one is handed to it."""
+
+    __slots__ = ("notify", "granted")
+
+    def __init__(self, notify):
+        self.notify = notify
+        self.granted = False
+
+
+def _grant(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of LLM calls in flight across the process. Callers beyond
+    the cap, from threads and event loops alike, wait in one first-in,
+    first-out queue: a freed slot is handed straight to the longest waiting
+    caller, which is woken exactly once. Callers fail with TimeoutError if no
+    slot is handed to them within the timeout.
+    """
+
+    def __init__(self, max_in_flight: int = Config.LLM_MAX_CONCURRENCY,
+                 timeout: float = Config.LLM_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._available = max_in_flight
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.queued_calls = 0
+        self.total_wait = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _enqueue(self, notify):
+        """Take a free slot if nobody is queued (returning None), or join the queue."""
+        with self._lock:
+            if self._available and not self._waiters:
+                self._available -= 1
+                return None
+            waiter = _Waiter(notify)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter) -> bool:
+        """Leave the queue; returns True if a slot was handed over in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _hand_over(self):
+        """Give a freed slot to the longest waiting caller, or return it to the pool."""
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._available += 1
+                    return
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+            try:
+                waiter.notify()
+                return
+            except RuntimeError:
+                # The waiter's event loop is closed, so it will never use the slot.
+                continue
+
+    @contextmanager
+    def slot(self):
+        """Hold one slot for the duration of the block; yields the seconds spent waiting."""
+        start = time.perf_counter()
+        event = threading.Event()
+        waiter = self._enqueue(event.set)
+        if waiter is not None and not event.wait(self.timeout) and not self._abandon(waiter):
+            raise TimeoutError(f"No LLM slot became free within {self.timeout:.0f}s.")
+        waited = self._acquired(start)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Async version of slot() that waits without blocking the event loop."""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enqueue(lambda: loop.call_soon_threadsafe(_grant, future))
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(future, self.timeout)
+            except TimeoutError:
+                if not self._abandon(waiter):
+                    raise TimeoutError(f"No LLM slot became free within {self.timeout:.0f}s.") from None
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    self._hand_over()
+                raise
+        waited = self._acquired(start)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def _acquired(self, start: float) -> float:
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+            self.total_wait += waited
+            if waited > 0.01:
+                self.queued_calls += 1
+        if waited > 0.01:
+            logger.info(f"Waited {waited:.2f}s for one of {self.max_in_flight} LLM slots.")
+        return waited
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._hand_over()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "waiting": len(self._waiters),
+                "calls": self.calls,
+                "queued_calls": self.queued_calls,
+                "average_wait": self.total_wait / self.calls if self.calls else 0.0,
+            }
+
+
+registry = ResourceRegistry()
+
+
+def get_http_client():
+    """Pooled HTTP client shared by the OpenAI chat and embedding clients."""
+    return registry.get("http_client", lambda: httpx.Client(
+        limits=httpx.Limits(
+            max_connections=Config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.HTTP_MAX_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0)
+    ))
+
+
+def get_chat_model(model: str, temperature: float = 0.0):
+    """Shared chat model client for the given model and temperature."""
+    def create():
+        # The OpenAI SDK is slow to import and unused with fake backends.
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            temperature=temperature,
+            openai_api_key=Config.OPENAI_API_KEY,
+            model=model,
+            http_client=get_http_client()
+        )
+    return registry.get(("chat_model", model, temperature), create)
+
+
+def get_embeddings():
+    """Shared embedding client, wrapped in the embedding cache if enabled."""
+    def create():
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(
+            model=Config.EMBEDDING_MODEL,
+            openai_api_key=Config.OPENAI_API_KEY,
+            http_client=get_http_client()
+        )
+        if Config.EMBEDDING_CACHE_ENABLED:
+            embeddings = CachedEmbeddings(
+                embeddings, EmbeddingCache(Config.EMBEDDING_CACHE_PATH), Config.EMBEDDING_MODEL
+            )
+        return embeddings
+    return registry.get("embeddings", create)
+
+
+def get_llm_limiter() -> ConcurrencyLimiter:
+    """Limiter shared by every LLM call made in the process."""
+    return registry.get("llm_limiter", ConcurrencyLimiter)
+
+
+def get_retriever(vector_store):
+    """
+    Retriever over the vector store shared by every session. Each store gets
+    its own; the key holds the store itself rather than its id(), so a
+    rebuilt store never inherits the retriever of one since collected.
+    """
+    def create():
+        if Config.HYBRID_RETRIEVAL:
+            return vector_store.get_hybrid_retriever()
+        return vector_store.get_retriever()
+    return registry.get(("retriever", vector_store), create)
+
+
+def get_answer_cache():
+    """Answer cache shared by every session, or None if it is disabled."""
+    return registry.get("answer_cache", lambda: AnswerCache() if Config.ANSWER_CACHE_ENABLED else None)
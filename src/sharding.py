@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import math
+import uuid
+import hashlib
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.vectorstores import VectorStore as LangChainVectorStore
+from src.config import Config
+from src.lexical_index import tokenize
+from src.resources import registry
+from src.telemetry import telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHARD_VERSION = 1
+SHARD_SUMMARY_FILE = "shard.json"
+SHARD_CENTROID_FILE = "centroid.npy"
+SHARD_DB_DIR = "db"
+
+
+def shard_directory_name(source: str) -> str:
+    """A file-system safe, collision-free directory name for a manual's shard."""
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", source)[:64]
+    return f"{safe}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+
+
+def get_search_executor():
+    """Thread pool shared by every sharded store to search shards in parallel."""
+    return registry.get("shard_search_executor", lambda: ThreadPoolExecutor(
+        max_workers=Config.SHARD_SEARCH_WORKERS, thread_name_prefix="shard-search"
+    ))
+
+
+class Shard:
+    """
+    The collection of one manual and the summary the router matches queries
+    against: the sum of its chunk embeddings (whose direction is the
+    centroid) and the document frequency of its most common terms.
+    """
+
+    def __init__(self, directory: str, source: str):
+        self.directory = directory
+        self.source = source
+        self.ids = set()
+        self.vector_sum = None
+        self.terms = Counter()
+        self.db = None
+
+    @classmethod
+    def load(cls, directory: str):
+        with open(os.path.join(directory, SHARD_SUMMARY_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SHARD_VERSION:
+            raise ValueError(f"Unsupported shard version in {directory}.")
+        shard = cls(directory, data["source"])
+        shard.ids = set(data["ids"])
+        shard.terms = Counter(data["terms"])
+        centroid_path = os.path.join(directory, SHARD_CENTROID_FILE)
+        if os.path.exists(centroid_path):
+            shard.vector_sum = np.load(centroid_path)
+        return shard
+
+    def save(self):
+        """Atomically write the shard summary next to its collection."""
+        os.makedirs(self.directory, exist_ok=True)
+        centroid_path = os.path.join(self.directory, SHARD_CENTROID_FILE)
+        if self.vector_sum is not None:
+            tmp_path = centroid_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, self.vector_sum)
+            os.replace(tmp_path, centroid_path)
+        elif os.path.exists(centroid_path):
+            os.remove(centroid_path)
+        tmp_path = os.path.join(self.directory, SHARD_SUMMARY_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SHARD_VERSION,
+                "source": self.source,
+                "ids": sorted(self.ids),
+                "terms": dict(self.terms.most_common(Config.SHARD_SUMMARY_TERMS)),
+            }, f)
+        os.replace(tmp_path, os.path.join(self.directory, SHARD_SUMMARY_FILE))
+
+    def update(self, ids, texts, embeddings, sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) chunks from the summary."""
+        if sign > 0:
+            self.ids.update(ids)
+        else:
+            self.ids.difference_update(ids)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            total = (embeddings / norms).sum(axis=0)
+            self.vector_sum = sign * total if self.vector_sum is None else self.vector_sum + sign * total
+        for text in texts:
+            for term in set(tokenize(text)):
+                self.terms[term] += sign
+        self.terms = +self.terms
+
+    def clear(self):
+        self.ids = set()
+        self.vector_sum = None
+        self.terms = Counter()
+
+    def centroid(self):
+        if self.vector_sum is None:
+            return None
+        norm = np.linalg.norm(self.vector_sum)
+        return self.vector_sum / norm if norm else None
+
+
+class ShardedVectorStore(LangChainVectorStore):
+    """
+    Vector store keeping every manual (chunk "source") in its own collection.
+
+    Each shard is an instance of the configured backend in its own
+    directory, opened on first use. A query is embedded once, routed to the
+    shards whose centroid and keyword summary match it best, searched in
+    parallel on those shards only, and the results are merged by relevance
+    score. All shards share one embedding space, so their scores compare,
+    and a weakly matching manual only contributes chunks that score as well
+    as the best manual's. Search cost is therefore bounded by
+    shards_per_query instead of the size of the library, and the context
+    comes from the few manuals relevant to the question.
+    """
+
+    def __init__(self, persist_directory: str = None, embedding_function=None, shard_class=None,
+                 shards_per_query: int = Config.SHARDS_PER_QUERY,
+                 keyword_weight: float = Config.SHARD_KEYWORD_WEIGHT):
+        if persist_directory is None or shard_class is None:
+            raise ValueError("ShardedVectorStore needs a persist_directory and a shard_class.")
+        self.persist_directory = persist_directory
+        self._embedding = embedding_function
+        self.shard_class = shard_class
+        self.shards_per_query = shards_per_query
+        self.keyword_weight = keyword_weight
+        self._lock = threading.RLock()
+        self.shards = {}
+        if os.path.isdir(persist_directory):
+            for name in sorted(os.listdir(persist_directory)):
+                directory = os.path.join(persist_directory, name)
+                if os.path.exists(os.path.join(directory, SHARD_SUMMARY_FILE)):
+                    shard = Shard.load(directory)
+                    self.shards[shard.source] = shard
+        logger.info(f"Loaded {len(self.shards)} vector store shards.")
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_directory=None, **kwargs):
+        store = cls(persist_directory=persist_directory, embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def _db(self, shard: Shard):
+        if shard.db is None:
+            shard.db = self.shard_class(
+                persist_directory=os.path.join(shard.directory, SHARD_DB_DIR), embedding_function=self._embedding
+            )
+        return shard.db
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """Upsert texts into the shard of their "source" manual."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        groups = {}
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            groups.setdefault((metadata or {}).get("source", "unknown"), []).append((doc_id, text, metadata))
+        with self._lock:
+            for source, items in groups.items():
+                group_ids = [doc_id for doc_id, _, _ in items]
+                shard = self.shards.get(source)
+                if shard is None:
+                    shard = Shard(os.path.join(self.persist_directory, shard_directory_name(source)), source)
+                    self.shards[source] = shard
+                db = self._db(shard)
+                self._forget(shard, [doc_id for doc_id in group_ids if doc_id in shard.ids])
+                db.add_texts(
+                    [text for _, text, _ in items], metadatas=[metadata for _, _, metadata in items], ids=group_ids
+                )
+                # Read the vectors back rather than embedding the texts twice.
+                stored = db.get(ids=group_ids, include=["embeddings"])
+                shard.update(stored["ids"], [text for _, text, _ in items], stored["embeddings"])
+                shard.save()
+        return ids
+
+    def _forget(self, shard: Shard, ids):
+        """Remove chunks that are about to be replaced or deleted from a shard's summary."""
+        if not ids:
+            return
+        stored = self._db(shard).get(ids=ids, include=["documents", "embeddings"])
+        shard.update(stored["ids"], stored["documents"], stored["embeddings"], sign=-1)
+
+    def delete(self, ids=None, **kwargs):
+        """Delete chunks by ID; a shard left without chunks is emptied."""
+        with self._lock:
+            if ids is None:
+                self.reset_collection()
+                return True
+            for shard in list(self.shards.values()):
+                shard_ids = sorted(shard.ids.intersection(ids))
+                if not shard_ids:
+                    continue
+                if len(shard_ids) == len(shard.ids):
+                    self._empty_shard(shard)
+                    continue
+                self._forget(shard, shard_ids)
+                self._db(shard).delete(ids=shard_ids)
+                shard.save()
+        return True
+
+    def _empty_shard(self, shard: Shard):
+        """
+        Remove every chunk of a shard. Its directory is kept and reused when
+        the manual is added again: the backend may hold it open (Chroma
+        caches its client per path), so it must not be deleted under it.
+        """
+        self._db(shard).reset_collection()
+        shard.clear()
+        shard.save()
+
+    def reset_collection(self):
+        """Empty every shard."""
+        with self._lock:
+            for shard in self.shards.values():
+                self._empty_shard(shard)
+
+    def get(self, ids=None, include=None):
+        """Return the stored chunks of every shard, like Chroma's get()."""
+        include = ["documents", "metadatas"] if include is None else include
+        result = {"ids": [], "documents": [] if "documents" in include else None,
+                  "metadatas": [] if "metadatas" in include else None}
+        wanted = None if ids is None else set(ids)
+        with self._lock:
+            for shard in self.shards.values():
+                shard_ids = sorted(shard.ids) if wanted is None else sorted(shard.ids & wanted)
+                if not shard_ids:
+                    continue
+                stored = self._db(shard).get(ids=shard_ids, include=include)
+                result["ids"].extend(stored["ids"])
+                for key in ("documents", "metadatas"):
+                    if result[key] is not None:
+                        result[key].extend(stored[key])
+        return result
+
+    def save(self):
+        """Let the shard collections compact themselves if they can."""
+        with self._lock:
+            for shard in self.shards.values():
+                if shard.db is not None and hasattr(shard.db, "save"):
+                    shard.db.save()
+
+    def route(self, query: str, embedding, n: int = None):
+        """
+        Return the n shards best matching a query, best first. Shards are
+        scored by the cosine similarity of their centroid to the query plus
+        keyword_weight times the IDF-weighted share of the query's terms
+        found in their keyword summary.
+        """
+        n = n or self.shards_per_query
+        shards = [shard for shard in self.shards.values() if shard.ids]
+        if len(shards) <= n:
+            return shards
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        terms = set(tokenize(query))
+        # Terms found in every manual say nothing about which one to search.
+        idf = {
+            term: math.log(1 + len(shards) / (1 + sum(term in shard.terms for shard in shards)))
+            for term in terms
+        }
+        total_idf = sum(idf.values())
+        scores = []
+        for shard in shards:
+            centroid = shard.centroid()
+            score = float(centroid @ vector) if centroid is not None else 0.0
+            if total_idf:
+                score += self.keyword_weight * sum(idf[term] for term in terms if term in shard.terms) / total_idf
+            scores.append(score)
+        order = sorted(range(len(shards)), key=lambda i: scores[i], reverse=True)
+        return [shards[i] for i in order[:n]]
+
+    def routed_sources(self, query: str):
+        """Return the sources of the shards a query is routed to."""
+        embedding = self._embedding.embed_query(query)
+        with self._lock:
+            return {shard.source for shard in self.route(query, embedding)}
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4, query: str = "", **kwargs):
+        """
+        Search the shards routed to in parallel and return the k best
+        (document, relevance) pairs across them, relevance in [0, 1].
+        """
+        with self._lock:
+            shards = self.route(query, embedding)
+            dbs = [self._db(shard) for shard in shards]
+        telemetry.count("shards_searched", len(dbs))
+
+        def search(db):
+            with telemetry.span("search", kind="shard"):
+                relevance = db._select_relevance_score_fn()
+                return [
+                    (doc, relevance(score))
+                    for doc, score in db.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+                ]
+
+        if len(dbs) > 1:
+            results = list(get_search_executor().map(search, dbs))
+        else:
+            results = [search(db) for db in dbs]
+        # The sort is stable and results are in routing order, so ties favour the best shard.
+        merged = [pair for pairs in results for pair in pairs]
+        merged.sort(key=lambda pair: pair[1], reverse=True)
+        return merged[:k]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, query: str = "", **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, query)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, query=query)
+
+    def _select_relevance_score_fn(self):
+        # Shard results are already relevance scores.
+        return lambda score: score
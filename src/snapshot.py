@@ -0,0 +1,259 @@
+import io
+import os
+import json
+import time
+import shutil
+import tarfile
+import logging
+import argparse
+import tempfile
+from src.config import Config
+from src.manifest import IngestionManifest, compute_file_hash
+from src.vector_db import default_persist_directory
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MANIFEST = "snapshot.json"
+
+# Names of the directories inside the snapshot archive.
+VECTOR_DB_ARCHIVE_DIR = "vector_db"
+INDEX_STATE_ARCHIVE_DIR = "index_state"
+
+
+class SnapshotMismatchError(ValueError):
+    """The snapshot was built with a configuration this process cannot use."""
+
+
+def index_config() -> dict:
+    """
+    The settings an index depends on: vectors from another embedding model,
+    chunks split or cleaned up differently or another backend's files
+    cannot be reused.
+    """
+    config = {
+        "embedding_model": Config.EMBEDDING_MODEL,
+        "chunk_size": Config.CHUNK_SIZE,
+        "chunk_overlap": Config.CHUNK_OVERLAP,
+        "boilerplate_removal": Config.BOILERPLATE_REMOVAL_ENABLED,
+        "near_duplicate_threshold": (
+            Config.NEAR_DUPLICATE_THRESHOLD if Config.NEAR_DUPLICATE_REMOVAL_ENABLED else None
+        ),
+        "vector_backend": Config.VECTOR_BACKEND,
+        "vector_sharding": Config.VECTOR_SHARDING,
+    }
+    if Config.VECTOR_BACKEND == "numpy":
+        config["vector_dtype"] = Config.NUMPY_VECTOR_DTYPE
+    return config
+
+
+def config_mismatches(snapshot: dict, config: dict = None) -> dict:
+    """Return {setting: (snapshot value, current value)} for every setting that differs."""
+    config = config or index_config()
+    stored = snapshot.get("config", {})
+    return {
+        key: (stored.get(key), value)
+        for key, value in config.items()
+        if stored.get(key) != value
+    }
+
+
+def source_mismatches(snapshot: dict, data_folder: str) -> dict:
+    """
+    Compare the PDFs the snapshot was built from with those in data_folder.
+    Returns the file names that were added, modified or deleted since.
+    """
+    stored = snapshot.get("sources", {})
+    current = {}
+    if os.path.isdir(data_folder):
+        for file_name in sorted(os.listdir(data_folder)):
+            if file_name.lower().endswith(".pdf"):
+                current[file_name] = compute_file_hash(os.path.join(data_folder, file_name))
+    return {
+        "added": sorted(name for name in current if name not in stored),
+        "modified": sorted(name for name in current if name in stored and stored[name] != current[name]),
+        "deleted": sorted(name for name in stored if name not in current),
+    }
+
+
+def export_snapshot(output_path: str, vector_dir: str = None, index_state_dir: str = Config.INDEX_STATE_DIR,
+                    manifest_path: str = Config.MANIFEST_PATH) -> dict:
+    """
+    Write the vector database and the ingestion state into a single
+    .tar.gz archive with a snapshot.json describing how it was built.
+    Returns that description.
+    """
+    vector_dir = vector_dir or default_persist_directory()
+    if not os.path.isdir(vector_dir) or not os.listdir(vector_dir):
+        raise ValueError(f"No vector database to export in {vector_dir}.")
+    manifest = IngestionManifest(manifest_path)
+    if not manifest.entries:
+        raise ValueError(f"No ingestion manifest to export at {manifest_path}.")
+    incomplete = sorted(name for name, entry in manifest.entries.items() if not entry.get("complete", True))
+    if incomplete:
+        raise ValueError(f"Ingestion of {', '.join(incomplete)} is incomplete; finish it before exporting.")
+
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": index_config(),
+        "sources": {name: entry["hash"] for name, entry in sorted(manifest.entries.items())},
+        "chunks": sum(len(entry["chunk_ids"]) for entry in manifest.entries.values()),
+    }
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with tarfile.open(tmp_path, "w:gz") as tar:
+        data = json.dumps(snapshot, indent=2, sort_keys=True).encode("utf-8")
+        info = tarfile.TarInfo(SNAPSHOT_MANIFEST)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+        tar.add(vector_dir, arcname=VECTOR_DB_ARCHIVE_DIR)
+        tar.add(index_state_dir, arcname=INDEX_STATE_ARCHIVE_DIR)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Exported a snapshot of {len(snapshot['sources'])} PDFs ({snapshot['chunks']} chunks) "
+                f"to {output_path}.")
+    return snapshot
+
+
+def read_snapshot(path: str) -> dict:
+    """Return the snapshot.json of an archive, checking its version."""
+    with tarfile.open(path, "r:*") as tar:
+        member = tar.extractfile(SNAPSHOT_MANIFEST)
+        if member is None:
+            raise ValueError(f"{path} is not an index snapshot.")
+        snapshot = json.load(member)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotMismatchError(f"Unsupported snapshot version {snapshot.get('version')!r} in {path}.")
+    return snapshot
+
+
+def import_snapshot(path: str, vector_dir: str = None, index_state_dir: str = Config.INDEX_STATE_DIR,
+                    data_folder: str = Config.DATA_FOLDER) -> dict:
+    """
+    Replace the local vector database and ingestion state with a snapshot.
+
+    Raises SnapshotMismatchError if the snapshot was built with another
+    embedding model, chunking or backend. PDFs that changed since the
+    snapshot are only logged: the imported manifest still holds the hashes
+    they were ingested with, so the next ingestion run re-ingests just those.
+    Returns the source differences.
+    """
+    vector_dir = vector_dir or default_persist_directory()
+    snapshot = read_snapshot(path)
+    mismatches = config_mismatches(snapshot)
+    if mismatches:
+        details = ", ".join(f"{key}: snapshot {old!r} != current {new!r}" for key, (old, new) in mismatches.items())
+        raise SnapshotMismatchError(f"Snapshot {path} does not match the configuration ({details}).")
+
+    sources = source_mismatches(snapshot, data_folder)
+    if any(sources.values()):
+        logger.warning(
+            "Snapshot sources differ from the data folder (%d added, %d modified, %d deleted); "
+            "those PDFs will be re-indexed.",
+            len(sources["added"]), len(sources["modified"]), len(sources["deleted"])
+        )
+
+    # Extract next to the targets, move both current directories aside, then
+    # move both new ones in. If anything fails the current directories are
+    # put back, so the vector database and the manifest always match.
+    parent = os.path.dirname(os.path.abspath(vector_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+    targets = ((VECTOR_DB_ARCHIVE_DIR, vector_dir), (INDEX_STATE_ARCHIVE_DIR, index_state_dir))
+    backups = []
+    swapping = False
+    try:
+        with tarfile.open(path, "r:*") as tar:
+            tar.extractall(staging, filter="data")
+        for name, _ in targets:
+            if not os.path.isdir(os.path.join(staging, name)):
+                raise ValueError(f"Snapshot {path} has no {name} directory.")
+        for name, target in targets:
+            if os.path.exists(target):
+                backup = tempfile.mkdtemp(prefix=".snapshot-old-", dir=os.path.dirname(os.path.abspath(target)))
+                os.replace(target, os.path.join(backup, name))
+                backups.append((name, target, backup))
+        swapping = True
+        for name, target in targets:
+            shutil.move(os.path.join(staging, name), target)
+    except BaseException:
+        if swapping:
+            for _, target in targets:
+                shutil.rmtree(target, ignore_errors=True)
+        for name, target, backup in backups:
+            os.replace(os.path.join(backup, name), target)
+            os.rmdir(backup)
+        raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    for _, _, backup in backups:
+        shutil.rmtree(backup, ignore_errors=True)
+    logger.info(f"Imported snapshot {path} ({snapshot['chunks']} chunks, created {snapshot['created']}).")
+    return sources
+
+
+def import_snapshot_at_startup(path: str = None, vector_dir: str = None,
+                               index_state_dir: str = Config.INDEX_STATE_DIR,
+                               data_folder: str = Config.DATA_FOLDER) -> bool:
+    """
+    Seed an empty deployment from the snapshot at path (Config.SNAPSHOT_PATH
+    by default), if there is one.
+    An existing local index is never replaced, and a snapshot that does not
+    match the configuration is skipped so the index is built from scratch.
+    Returns whether a snapshot was imported.
+    """
+    path = Config.SNAPSHOT_PATH if path is None else path
+    vector_dir = vector_dir or default_persist_directory()
+    if not path or not os.path.exists(path):
+        return False
+    if os.path.isdir(vector_dir) and os.listdir(vector_dir):
+        logger.info(f"Keeping the existing vector database in {vector_dir} instead of snapshot {path}.")
+        return False
+    try:
+        import_snapshot(path, vector_dir, index_state_dir, data_folder)
+    except (ValueError, OSError, tarfile.TarError) as e:
+        logger.error(f"Not using snapshot {path}: {e}")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, import or verify prebuilt index snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the current index into a snapshot archive.")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--build", action="store_true",
+                               help="Ingest the data folder first so the snapshot is up to date.")
+    import_parser = commands.add_parser("import", help="Replace the local index with a snapshot.")
+    import_parser.add_argument("path")
+    verify_parser = commands.add_parser("verify", help="Compare a snapshot with the configuration and data folder.")
+    verify_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        if args.build:
+            from src.ingest import initialize_vector_store
+            initialize_vector_store()
+        export_snapshot(args.path)
+    elif args.command == "import":
+        try:
+            import_snapshot(args.path)
+        except SnapshotMismatchError as e:
+            raise SystemExit(str(e))
+    else:
+        snapshot = read_snapshot(args.path)
+        report = {
+            "snapshot": {key: snapshot[key] for key in ("version", "created", "config", "chunks")},
+            "config_mismatches": config_mismatches(snapshot),
+            "source_mismatches": source_mismatches(snapshot, Config.DATA_FOLDER),
+        }
+        print(json.dumps(report, indent=2))
+        if report["config_mismatches"]:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "ship_ai_"
+
+# Upper bounds, in seconds, of the duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Returned by span() when telemetry is disabled, so that instrumented code
+# only pays for one attribute lookup.
+NOOP_SPAN = nullcontext()
+
+
+def label_key(labels: dict):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(key, extra=()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class Span:
+    """Times a block and records it as a duration of the telemetry it belongs to."""
+
+    __slots__ = ("telemetry", "name", "labels", "start")
+
+    def __init__(self, telemetry, name: str, labels: dict):
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.labels["error"] = exc_type.__name__
+        self.telemetry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Telemetry:
+    """
+    In-process counters and duration histograms.
+
+    Durations are recorded with span() or observe() and counts with count().
+    Everything can be exported in the Prometheus text format, and each
+    recorded value can also be written as a structured JSON log line. While
+    disabled, every call returns immediately.
+    """
+
+    def __init__(self, enabled: bool = Config.TELEMETRY_ENABLED, json_logs: bool = Config.TELEMETRY_JSON_LOGS):
+        self.enabled = enabled
+        self.json_logs = json_logs
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def span(self, name: str, **labels):
+        """Context manager recording the duration of its block as name."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, labels)
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record a duration that was measured elsewhere."""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0
+                }
+            index = bisect.bisect_left(DURATION_BUCKETS, seconds)
+            if index < len(DURATION_BUCKETS):
+                histogram["buckets"][index] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+        if self.json_logs:
+            logger.info(json.dumps({"metric": name, "seconds": round(seconds, 6), **labels}))
+
+    def count(self, name: str, value: float = 1, **labels):
+        """Add value to the counter name."""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self.json_logs:
+            logger.info(json.dumps({"metric": name, "count": value, **labels}))
+
+    def snapshot(self) -> dict:
+        """Current counters and duration totals, keyed by metric name and labels."""
+        with self._lock:
+            return {
+                "counters": {
+                    f"{name}{format_labels(key)}": value for (name, key), value in self._counters.items()
+                },
+                "durations": {
+                    f"{name}{format_labels(key)}": {"count": h["count"], "sum": h["sum"]}
+                    for (name, key), h in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Export every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                metric = f"{METRIC_PREFIX}{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter, key), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{metric}{format_labels(key)} {value}")
+            for name in sorted({name for name, _ in self._histograms}):
+                metric = f"{METRIC_PREFIX}{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for (histogram_name, key), h in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket in zip(DURATION_BUCKETS, h["buckets"]):
+                        cumulative += bucket
+                        lines.append(f"{metric}_bucket{format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{metric}_bucket{format_labels(key, [('le', '+Inf')])} {h['count']}")
+                    lines.append(f"{metric}_sum{format_labels(key)} {h['sum']}")
+                    lines.append(f"{metric}_count{format_labels(key)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+telemetry = Telemetry()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """
+    Serve the Prometheus metrics on http://host:port/metrics from a daemon
+    thread, for entry points without their own HTTP server (the Streamlit app).
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = telemetry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on port {port}.")
+    return server
@@ -12,18 +12,19 @@ def run_ui(query_engine):
         st.session_state.messages = []
         logger.info("Initialized conversation history in session_state.")
 
+    # Display the conversation messages.
+    for msg in st.session_state.messages:
+        st.chat_message(msg["role"]).markdown(msg["content"])
+
     # Check for new input.
     user_input = st.chat_input("Type your message here...")
     if user_input:
         logger.info("Received user input: %s", user_input)
-        # Append the user's message.
+        # Append and display the user's message.
         st.session_state.messages.append({"role": "user", "content": user_input})
-        # Get the assistant's response.
-        with st.spinner("Chatbot is thinking..."):
-            bot_response = query_engine.query(user_input)
-            logger.info("Assistant response obtained.")
-        st.session_state.messages.append({"role": "assistant", "content": bot_response})
-
-    # Display the conversation messages.
-    for msg in st.session_state.messages:
-        st.chat_message(msg["role"]).markdown(msg["content"])
\ No newline at end of file
+        st.chat_message("user").markdown(user_input)
+        # Render the assistant's response token by token as it is generated.
+        stream = query_engine.stream(user_input)
+        bot_response = st.chat_message("assistant").write_stream(stream)
+        logger.info("Assistant response obtained. Time to first token: %s", stream.timings.get("first_token"))
+        st.session_state.messages.append({"role": "assistant", "content": stream.answer or bot_response})
\ No newline at end of file
@@ -1,32 +1,183 @@
 import os
 import logging
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from langchain.schema import Document
 from src.config import Config
+from src.lexical_index import BM25Index, HybridRetriever
+from src.numpy_store import NumpyVectorStore
+from src.resources import get_embeddings
+from src.sharding import ShardedVectorStore
+from src.telemetry import telemetry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def __getattr__(name):
+    # chromadb takes most of the import time of this module and is not
+    # needed with the NumPy backend, so Chroma is imported on first use.
+    if name == "Chroma":
+        from langchain_chroma import Chroma
+        globals()["Chroma"] = Chroma
+        return Chroma
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def build_embeddings():
+    """
+    Return the OpenAI embedding client, wrapped in the local embedding cache
+    unless it is disabled in the configuration. The client is shared by every
+    VectorStore in the process.
+    """
+    return get_embeddings()
+
+def get_backend(name: str):
+    """
+    Return the vector database class of a backend. Backends are LangChain
+    vector stores that also provide Chroma's persist_directory constructor,
+    get(ids, include), delete(ids) and reset_collection().
+    """
+    if name == "numpy":
+        return NumpyVectorStore
+    if name == "chroma":
+        return globals()["Chroma"] if "Chroma" in globals() else __getattr__("Chroma")
+    raise ValueError(f"Unknown vector backend {name!r}, expected 'chroma' or 'numpy'.")
+
+def default_persist_directory(backend: str = None, sharded: bool = None) -> str:
+    """Directory of the vector database of a backend, sharded per manual or not."""
+    backend = backend or Config.VECTOR_BACKEND
+    sharded = Config.VECTOR_SHARDING if sharded is None else sharded
+    if sharded:
+        return Config.SHARDED_DB_DIR
+    return Config.NUMPY_DB_DIR if backend == "numpy" else Config.CHROMA_DB_DIR
+
 class VectorStore:
-    def __init__(self, persist_directory: str = Config.CHROMA_DB_DIR):
-        self.persist_directory = persist_directory
-        self.embeddings = OpenAIEmbeddings(openai_api_key=Config.OPENAI_API_KEY)
+    def __init__(self, persist_directory: str = None, embeddings=None,
+                 lexical_index_path: str = Config.LEXICAL_INDEX_PATH, backend: str = Config.VECTOR_BACKEND,
+                 sharded: bool = Config.VECTOR_SHARDING):
+        self.backend = backend
+        # With sharding, every manual is kept in its own collection of the backend.
+        self.sharded = sharded
+        self.persist_directory = persist_directory or default_persist_directory(backend, sharded)
+        self.embeddings = embeddings if embeddings is not None else build_embeddings()
         self.db = None
+        # BM25 index kept in step with the vector database for hybrid retrieval.
+        self.lexical_index = BM25Index(lexical_index_path)
+        self._lexical_ready = False
+        # Bumped on every change to the indexed chunks, see index_version.
+        self._revision = 0
+
+    @property
+    def index_version(self) -> str:
+        """
+        Identifies the current content of the index: the embedding model, the
+        chunking parameters and a counter bumped whenever chunks are added,
+        deleted or reset. Answers cached against one version are not reused
+        after the manuals change.
+        """
+        return f"{Config.EMBEDDING_MODEL}:{Config.CHUNK_SIZE}:{Config.CHUNK_OVERLAP}:{self._revision}"
 
     def create_db(self, docs):
-        """Create a new Chroma vector database from the documents and persist it."""
-        logger.info("Creating a new Chroma vector database...")
-        self.db = Chroma.from_documents(
-            docs, self.embeddings, persist_directory=self.persist_directory
+        """Create a new vector database from the documents and persist it."""
+        logger.info(f"Creating a new {self.backend} vector database...")
+        db_class, kwargs = self._db_class()
+        self.db = db_class.from_documents(
+            docs, self.embeddings, persist_directory=self.persist_directory, **kwargs
         )
+        self._revision += 1
+
+    def _db_class(self):
+        """The vector database class and the extra arguments it is created with."""
+        if self.sharded:
+            return ShardedVectorStore, {"shard_class": get_backend(self.backend)}
+        return get_backend(self.backend), {}
+
+    def add_documents(self, docs, ids=None):
+        """
+        Upsert documents into the vector database, creating it if needed.
+        Passing stable IDs makes repeated ingestion of the same chunks idempotent.
+        """
+        if not docs:
+            return
+        if ids is not None:
+            self.ensure_lexical_index()
+        with telemetry.span("upsert"):
+            if self.db is None:
+                logger.info(f"Creating a new {self.backend} vector database...")
+                db_class, kwargs = self._db_class()
+                self.db = db_class.from_documents(
+                    docs, self.embeddings, ids=ids, persist_directory=self.persist_directory, **kwargs
+                )
+            else:
+                logger.info(f"Upserting {len(docs)} chunks into the {self.backend} vector database...")
+                self.db.add_documents(docs, ids=ids)
+        telemetry.count("chunks_upserted", len(docs))
+        if ids is not None:
+            self.lexical_index.add_documents(docs, ids)
+        self._revision += 1
+
+    def delete_documents(self, ids):
+        """Remove the chunks with the given IDs from the vector database."""
+        if not ids or self.db is None:
+            return
+        self.ensure_lexical_index()
+        logger.info(f"Deleting {len(ids)} chunks from the {self.backend} vector database...")
+        self.db.delete(ids=list(ids))
+        self.lexical_index.delete(ids)
+        telemetry.count("chunks_deleted", len(ids))
+        self._revision += 1
+
+    def reset(self):
+        """Remove every chunk from the vector database, keeping the collection."""
+        if self.db is not None:
+            logger.info(f"Resetting the {self.backend} vector database...")
+            self.db.reset_collection()
+        self.lexical_index.clear()
+        self._lexical_ready = True
+        self._revision += 1
+
+    def ensure_lexical_index(self):
+        """
+        Make sure the BM25 index matches the vector database, loading it from
+        disk or rebuilding it from the database's chunks when it is missing
+        or out of date (e.g. after an interrupted ingest).
+        """
+        if self._lexical_ready:
+            return
+        self._lexical_ready = True
+        if self.db is None:
+            return
+        stored_ids = self.db.get(include=[])["ids"]
+        if self.lexical_index.load() and set(self.lexical_index.docs) == set(stored_ids):
+            return
+
+        logger.info(f"Rebuilding the lexical index from the {self.backend} vector database...")
+        self.lexical_index.clear()
+        for start in range(0, len(stored_ids), 1000):
+            batch = self.db.get(ids=stored_ids[start:start + 1000], include=["documents", "metadatas"])
+            docs = [
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(batch["documents"], batch["metadatas"])
+            ]
+            self.lexical_index.add_documents(docs, batch["ids"])
+        self.lexical_index.save()
+
+    def persist(self):
+        """
+        Write the lexical index to disk and let the vector database compact
+        itself if it can (Chroma persists itself on every change).
+        """
+        if self._lexical_ready:
+            self.lexical_index.save()
+        if hasattr(self.db, "save"):
+            self.db.save()
 
     def load_db(self):
-        """Load an existing Chroma database."""
+        """Load an existing vector database."""
         if os.path.exists(self.persist_directory) and os.listdir(self.persist_directory):
-            logger.info("Loading existing Chroma database...")
-            self.db = Chroma(
+            logger.info(f"Loading existing {self.backend} database...")
+            db_class, kwargs = self._db_class()
+            self.db = db_class(
                 persist_directory=self.persist_directory,
-                embedding_function=self.embeddings
+                embedding_function=self.embeddings,
+                **kwargs
             )
         else:
             logger.warning("No existing database found at the specified directory.")
@@ -37,4 +188,25 @@ class VectorStore:
             self.load_db()
         if self.db is None:
             raise ValueError("Vector database is not initialized.")
-        return self.db.as_retriever()
\ No newline at end of file
+        return self.db.as_retriever()
+
+    def get_hybrid_retriever(self, dense_k: int = Config.DENSE_K, lexical_k: int = Config.LEXICAL_K,
+                             k: int = Config.HYBRID_K):
+        """
+        Return a retriever fusing dense search over the vector database with
+        BM25 search over the same chunks using reciprocal rank fusion.
+        """
+        if self.db is None:
+            self.load_db()
+        if self.db is None:
+            raise ValueError("Vector database is not initialized.")
+        self.ensure_lexical_index()
+        dense_retriever = self.db.as_retriever(search_kwargs={"k": dense_k})
+        return HybridRetriever(
+            dense_retriever=dense_retriever,
+            lexical_index=self.lexical_index,
+            lexical_k=lexical_k,
+            k=k,
+            # With a sharded store, keyword hits come from the routed manuals only.
+            router=getattr(self.db, "routed_sources", None),
+        )
\ No newline at end of file
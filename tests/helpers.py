@@ -0,0 +1,42 @@
+from langchain_core.language_models import FakeListChatModel
+from langchain.schema import Document
+from src.query_engine import QueryEngine
+from src.context_packer import ContextPacker
+
+
+# A clock whose time only moves when a test sets it.
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+# A fake chat model that records every prompt it receives.
+class RecordingChatModel(FakeListChatModel):
+    prompts: list = []
+
+    def _call(self, messages, *args, **kwargs):
+        self.prompts.append(messages[-1].content)
+        return super()._call(messages, *args, **kwargs)
+
+# A dummy retriever that records the questions it was asked.
+class DummyRetriever:
+    def __init__(self):
+        self.questions = []
+
+    def invoke(self, question):
+        self.questions.append(question)
+        return [Document(page_content="[manual.pdf - Page 4]\nUnscrew the nuts.", metadata={"source": "manual.pdf", "page": 4})]
+
+class DummyVectorStore:
+    pass
+
+def make_engine(answers, condensed=(), retriever=None, **kwargs):
+    llm = RecordingChatModel(responses=list(answers), prompts=[])
+    condense_llm = RecordingChatModel(responses=list(condensed) + ["summary"] * 10, prompts=[])
+    packer = ContextPacker(token_counter=lambda text: len(text.split()))
+    engine = QueryEngine(
+        DummyVectorStore(), retriever or DummyRetriever(), packer=packer,
+        llm=llm, condense_llm=condense_llm, **kwargs
+    )
+    return engine, llm, condense_llm
@@ -0,0 +1,44 @@
+from src.answer_cache import AnswerCache
+from tests.helpers import FakeClock
+
+def test_similar_questions_in_the_same_scope_hit():
+    cache = AnswerCache(similarity_threshold=0.95)
+    scope = AnswerCache.make_scope("v1", ["h-1", "h-2"])
+    cache.put([1.0, 0.0, 0.0], scope, "Open the drain valve.")
+    assert cache.get([0.99, 0.05, 0.0], scope) == "Open the drain valve."
+    assert cache.get([0.0, 1.0, 0.0], scope) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_scope_depends_on_index_version_and_chunk_ids():
+    scope = AnswerCache.make_scope("v1", ["h-1", "h-2"])
+    assert scope == AnswerCache.make_scope("v1", ["h-2", "h-1"])
+    assert scope != AnswerCache.make_scope("v2", ["h-1", "h-2"])
+    assert scope != AnswerCache.make_scope("v1", ["h-1", "h-3"])
+
+    cache = AnswerCache()
+    cache.put([1.0, 0.0], scope, "answer")
+    assert cache.get([1.0, 0.0], AnswerCache.make_scope("v2", ["h-1", "h-2"])) is None
+
+def test_least_recently_used_entries_are_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put([1.0, 0.0], "a", "A")
+    cache.put([1.0, 0.0], "b", "B")
+    # Touch "a" so that "b" becomes the least recently used entry.
+    assert cache.get([1.0, 0.0], "a") == "A"
+    cache.put([1.0, 0.0], "c", "C")
+    assert cache.get([1.0, 0.0], "b") is None
+    assert cache.get([1.0, 0.0], "a") == "A"
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = AnswerCache(ttl_seconds=60, clock=clock)
+    cache.put([1.0, 0.0], "a", "A")
+    clock.now = 61
+    assert cache.get([1.0, 0.0], "a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models import FakeListChatModel
+from src.api import SessionStore, create_app
+from src.fakes import FakeVectorStore, fake_engine_factory
+from src.query_engine import QueryEngine
+from tests.helpers import FakeClock
+
+def test_query_starts_and_continues_a_conversation():
+    client = TestClient(create_app(fake_engine_factory()))
+    first = client.post("/query", json={"question": "How do I purge the fuel separator?"})
+    assert first.status_code == 200
+    body = first.json()
+    assert body["answer"]
+    assert {"source": "purifier.pdf", "page": 12} in body["sources"]
+    assert "generate" in body["timings"]
+
+    second = client.post("/query", json={"question": "And then?", "session_id": body["session_id"]})
+    assert second.status_code == 200
+    assert second.json()["session_id"] == body["session_id"]
+    assert client.get("/health").json()["sessions"] == 1
+
+def test_unknown_and_deleted_sessions_are_rejected():
+    client = TestClient(create_app(fake_engine_factory()))
+    session_id = client.post("/sessions").json()["session_id"]
+    assert client.delete(f"/sessions/{session_id}").status_code == 200
+    response = client.post("/query", json={"question": "Hello there", "session_id": session_id})
+    assert response.status_code == 404
+
+def test_slow_queries_time_out():
+    vector_store = FakeVectorStore()
+    llm = FakeListChatModel(responses=["late"], sleep=0.5)
+    factory = lambda: QueryEngine(vector_store, vector_store.get_retriever(), llm=llm)
+    client = TestClient(create_app(factory, request_timeout=0.1))
+    response = client.post("/query", json={"question": "How do I purge the fuel separator?"})
+    assert response.status_code == 504
+
+def test_conversations_are_answered_concurrently():
+    # Each fake LLM call takes 0.2s; ten conversations must overlap.
+    app = create_app(fake_engine_factory(latency=0.2), max_concurrent_requests=10)
+    sessions = [app.state.sessions.create() for _ in range(10)]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        engines = [app.state.sessions.get(session_id).engine for session_id in sessions]
+        await asyncio.gather(*(engine.aquery("How do I purge the fuel separator?") for engine in engines))
+        return loop.time() - start
+
+    assert asyncio.run(run()) < 1.0
+
+def test_session_store_expires_and_evicts_sessions():
+    clock = FakeClock()
+    store = SessionStore(lambda: object(), max_sessions=2, ttl_seconds=60, clock=clock)
+    first = store.create()
+    second = store.create()
+    store.create()
+    # The least recently used session was dropped.
+    assert store.get(first) is None
+    assert store.get(second) is not None
+    clock.now = 61
+    assert store.get(second) is None
+    assert len(store) == 0
+
+def test_metrics_endpoint_serves_prometheus_text():
+    from src.telemetry import telemetry
+    telemetry.reset()
+    telemetry.enabled = True
+    try:
+        client = TestClient(create_app(fake_engine_factory()))
+        client.post("/query", json={"question": "How do I purge the fuel separator?"})
+        response = client.get("/metrics")
+    finally:
+        telemetry.enabled = False
+        telemetry.reset()
+    assert response.status_code == 200
+    assert "ship_ai_queries_total 1" in response.text
+    assert "ship_ai_api_query_seconds_count 1" in response.text
@@ -0,0 +1,27 @@
+from pypdf import PdfReader
+from benchmarks.run import percentile
+from benchmarks.synthetic_pdfs import generate_library, make_pages
+from src.pdf_processor import page_needs_ocr
+
+def test_synthetic_digital_pdfs_have_a_usable_text_layer(tmp_path):
+    digital, scanned = generate_library(str(tmp_path), digital_pdfs=1, scanned_pdfs=1, pages_per_pdf=3)
+    pages = PdfReader(digital).pages
+    assert len(pages) == 3
+    text = pages[1].extract_text()
+    assert make_pages(3)[1][1] in text
+    assert not page_needs_ocr(text)
+
+    # Scanned PDFs only contain images and have to be OCR'd.
+    scanned_pages = PdfReader(scanned).pages
+    assert len(scanned_pages) == 3
+    assert page_needs_ocr(scanned_pages[0].extract_text())
+
+def test_synthetic_pages_are_deterministic():
+    assert make_pages(2, seed=7) == make_pages(2, seed=7)
+    assert make_pages(2, seed=7) != make_pages(2, seed=8)
+
+def test_percentile_interpolates():
+    values = [1, 2, 3, 4, 5]
+    assert percentile(values, 50) == 3
+    assert percentile(values, 95) == 4.8
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,68 @@
+from langchain.schema import Document
+from src.context_packer import ContextPacker, PackedRetriever, merge_overlapping
+
+def word_counter(text):
+    return len(text.split())
+
+def chunk(source, page, text):
+    return Document(page_content=f"[{source} - Page {page}]\n{text}", metadata={"source": source, "page": page})
+
+def test_merge_overlapping_keeps_shared_text_once():
+    first = "Step 1: isolate the purifier. Step 2: open the drain valve"
+    second = "Step 2: open the drain valve. Step 3: close the inlet."
+    assert merge_overlapping(first, second) == first + ". Step 3: close the inlet."
+    assert merge_overlapping(second, first) == first + ". Step 3: close the inlet."
+    assert merge_overlapping(first, "open the drain") == first
+
+def test_chunks_of_the_same_page_share_one_header():
+    packer = ContextPacker(max_tokens=1000, token_counter=word_counter)
+    docs = [
+        chunk("a.pdf", 3, "Step 1: isolate the purifier. Step 2: open the drain valve"),
+        chunk("b.pdf", 1, "Lubricating oil pump overhaul instructions."),
+        chunk("a.pdf", 3, "Step 2: open the drain valve. Step 3: close the inlet."),
+    ]
+    packed = packer.pack(docs)
+    assert [doc.page_content.count("[a.pdf - Page 3]") for doc in packed] == [1, 0]
+    assert "Step 3: close the inlet." in packed[0].page_content
+    assert packed[1].metadata == {"source": "b.pdf", "page": 1, "chunk_ids": []}
+
+def test_packed_sections_keep_their_chunk_ids():
+    packer = ContextPacker(max_tokens=1000, token_counter=word_counter)
+    first = chunk("a.pdf", 3, "Isolate the purifier.")
+    second = chunk("a.pdf", 3, "Open the drain valve.")
+    first.id, second.id = "h-1", "h-2"
+    packed = packer.pack([first, second])
+    assert packed[0].metadata["chunk_ids"] == ["h-1", "h-2"]
+
+def test_near_duplicates_are_dropped():
+    warning = "WARNING: Always wear protective equipment when handling fuel oil under pressure."
+    packer = ContextPacker(max_tokens=1000, token_counter=word_counter)
+    packed = packer.pack([chunk("a.pdf", 1, warning), chunk("a.pdf", 7, warning + " Note.")])
+    assert len(packed) == 1
+
+def test_sections_are_packed_into_the_token_budget():
+    # Headers count as four words here.
+    packer = ContextPacker(max_tokens=15, token_counter=word_counter)
+    docs = [
+        chunk("a.pdf", 1, "one two three four five six"),
+        chunk("a.pdf", 2, "seven eight nine ten eleven twelve thirteen"),
+        chunk("a.pdf", 3, "fourteen"),
+    ]
+    packed = packer.pack(docs)
+    assert [doc.metadata["page"] for doc in packed] == [1, 3]
+    assert sum(word_counter(doc.page_content) for doc in packed) <= 15
+
+    # The best section is truncated rather than returning no context at all.
+    tiny = ContextPacker(max_tokens=5, token_counter=word_counter)
+    packed = tiny.pack(docs[:1])
+    assert len(packed) == 1
+    assert word_counter(packed[0].page_content) <= 5
+
+def test_packed_retriever_limits_sections():
+    class ListRetriever:
+        def invoke(self, query):
+            return [chunk("a.pdf", page, f"text of page {page}") for page in range(1, 6)]
+
+    packer = ContextPacker(max_tokens=1000, token_counter=word_counter)
+    retriever = PackedRetriever(base_retriever=ListRetriever(), packer=packer, max_sections=3)
+    assert len(retriever.invoke("question")) == 3
@@ -0,0 +1,100 @@
+from langchain.schema import Document
+from src.dedup import MinHasher, deduplicate_chunks, normalize_line, strip_boilerplate
+from src.pdf_processor import PDFProcessor
+
+
+def make_body(page):
+    # Body lines differ by more than their numbers from page to page.
+    return "\n".join(f"Procedure {'ABCDEFGHIJ'[page - 1] * 3} step {step} for bowl {page * 7}." for step in range(1, 6))
+
+
+def make_page(page, body):
+    text = f"ACME Marine - Fuel Oil Separator Manual Rev. {page % 3}\n{body}\nPage {page} of 10"
+    return Document(page_content=text, metadata={"source": "manual.pdf", "page": page})
+
+
+def test_normalize_line_masks_numbers():
+    assert normalize_line("  Page 3 of  120 ", mask_digits=True) == "page # of #"
+    assert normalize_line("Page 14 of 120", mask_digits=True) == "page # of #"
+    assert normalize_line("Close  V-231") == "close v-231"
+
+
+def test_strip_boilerplate_keeps_first_occurrence():
+    pages = [make_page(page, make_body(page)) for page in range(1, 11)]
+    cleaned = strip_boilerplate(pages)
+    assert cleaned[0].page_content.startswith("ACME Marine")
+    assert cleaned[0].page_content.endswith("Page 1 of 10")
+    for page in cleaned[1:]:
+        assert page.page_content == make_body(page.metadata["page"])
+    # Pages are only compared within the same PDF.
+    other = Document(page_content="Page 1 of 10", metadata={"source": "other.pdf", "page": 1})
+    assert strip_boilerplate(pages + [other])[-1].page_content == "Page 1 of 10"
+
+
+def test_minhash_similarity_estimates_jaccard():
+    hasher = MinHasher(num_permutations=128, bands=16)
+    text = " ".join(f"word{i}" for i in range(200))
+    assert hasher.similarity(hasher.signature(text), hasher.signature(text)) == 1.0
+    edited = text.replace("word100", "changed")
+    assert hasher.similarity(hasher.signature(text), hasher.signature(edited)) > 0.8
+    unrelated = " ".join(f"other{i}" for i in range(200))
+    assert hasher.similarity(hasher.signature(text), hasher.signature(unrelated)) < 0.2
+
+
+def test_deduplicate_chunks_keeps_canonical_with_back_references():
+    warning = " ".join(
+        f"WARNING {i}: before opening the separator bowl make sure the unit is stopped, isolated and "
+        "depressurised, and that the bowl has come to a complete standstill."
+        for i in range(5)
+    )
+    chunks = [
+        Document(page_content=warning, metadata={"source": "a.pdf", "page": 2}),
+        Document(page_content="Clean the disc stack every 500 running hours.", metadata={"source": "a.pdf", "page": 3}),
+        Document(page_content=warning.replace("complete standstill", "full standstill", 1), metadata={"source": "a.pdf", "page": 5}),
+        Document(page_content=warning, metadata={"source": "a.pdf", "page": 9}),
+        Document(page_content=warning, metadata={"source": "b.pdf", "page": 1}),
+    ]
+    kept = deduplicate_chunks(chunks)
+    assert [(doc.metadata["source"], doc.metadata["page"]) for doc in kept] == [("a.pdf", 2), ("a.pdf", 3), ("b.pdf", 1)]
+    assert kept[0].metadata["duplicate_pages"] == "5, 9"
+    assert "duplicate_pages" not in kept[1].metadata
+    assert "duplicate_pages" not in kept[2].metadata
+
+
+def test_split_documents_removes_repeated_content():
+    processor = PDFProcessor(data_folder="dummy")
+    pages = [make_page(page, make_body(page)) for page in range(1, 11)]
+    chunks = processor.split_documents(pages)
+    assert sum("ACME Marine" in chunk.page_content for chunk in chunks) == 1
+    assert chunks[1].page_content == "[manual.pdf - Page 2]\n" + make_body(2)
+
+
+def test_body_lines_differing_in_numbers_are_kept():
+    pages = [
+        Document(
+            page_content="\n".join(["Header", "Intro", f"Tighten bolt B-{page} to {40 + page} Nm.", "Notes", "Footer"]),
+            metadata={"source": "manual.pdf", "page": page},
+        )
+        for page in range(1, 6)
+    ]
+    cleaned = strip_boilerplate(pages)
+    assert all(f"B-{page.metadata['page']}" in page.page_content for page in cleaned)
+    assert all("Header" not in page.page_content for page in cleaned[1:])
+
+
+def test_chunks_differing_only_in_a_code_are_kept():
+    body = (
+        "When the alarm is raised, stop the purifier, close the feed valve, check the sludge discharge and "
+        "the operating water pressure, then restart the unit and acknowledge the alarm on the panel."
+    )
+    chunks = [
+        Document(page_content=f"Alarm AL-{code}: {body}", metadata={"source": "a.pdf", "page": page})
+        for page, code in enumerate(range(211, 217), start=1)
+    ]
+    chunks.append(Document(page_content=f"Alarm AL-211: {body}", metadata={"source": "a.pdf", "page": 9}))
+    chunks.append(Document(page_content=f"Replace seal kit P/N 4471-02. {body}", metadata={"source": "a.pdf", "page": 10}))
+    chunks.append(Document(page_content=f"Replace seal kit P/N 4471-03. {body}", metadata={"source": "a.pdf", "page": 11}))
+    kept = deduplicate_chunks(chunks)
+    assert [doc.metadata["page"] for doc in kept] == [1, 2, 3, 4, 5, 6, 10, 11]
+    # Exact repeats of a code are still merged.
+    assert kept[0].metadata["duplicate_pages"] == "9"
@@ -0,0 +1,53 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """A deterministic local embedder that records which texts it was asked to embed."""
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return super().embed_query(text)
+
+def make_cached(tmp_path, model="fake-model"):
+    backend = CountingEmbeddings(size=8, calls=[])
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite3"))
+    return backend, CachedEmbeddings(backend, cache, model)
+
+def test_only_misses_reach_the_backend(tmp_path):
+    backend, cached = make_cached(tmp_path)
+    first = cached.embed_documents(["alpha", "beta", "alpha"])
+    assert backend.calls == [["alpha", "beta"]]
+    assert first[0] == first[2]
+
+    second = cached.embed_documents(["beta", "gamma"])
+    assert backend.calls[-1] == ["gamma"]
+    assert second[0] == first[1]
+    assert cached.cache.stats()["hits"] == 1
+
+def test_queries_share_the_cache_and_text_is_normalized(tmp_path):
+    backend, cached = make_cached(tmp_path)
+    cached.embed_documents(["purge the fuel separator"])
+    vector = cached.embed_query("  purge the   fuel separator\n")
+    assert len(backend.calls) == 1
+    assert len(vector) == 8
+
+def test_cache_is_keyed_by_model_and_persisted(tmp_path):
+    backend, cached = make_cached(tmp_path)
+    cached.embed_documents(["alpha"])
+
+    other_backend, other_model = make_cached(tmp_path, model="other-model")
+    other_model.embed_documents(["alpha"])
+    assert other_backend.calls == [["alpha"]]
+
+    reopened_backend, reopened = make_cached(tmp_path)
+    reopened.embed_documents(["alpha"])
+    assert reopened_backend.calls == []
+
+def test_cache_is_not_created_until_used(tmp_path):
+    EmbeddingCache(path=str(tmp_path / "embeddings.sqlite3"))
+    assert not (tmp_path / "embeddings.sqlite3").exists()
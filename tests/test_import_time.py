@@ -0,0 +1,59 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the app and the HTTP service import to answer queries from an
+# existing index.
+QUERY_PATH = "import src.ingest, src.query_engine, src.api"
+
+# Dependencies only needed to ingest or OCR PDFs, by a backend that is not
+# in use, or to reach OpenAI.
+DEFERRED_MODULES = {"pypdf", "pdf2image", "pytesseract", "pandas", "chromadb", "openai", "dotenv"}
+
+# Generous, so that only a regression (not a slow machine) fails the test.
+IMPORT_BUDGET_SECONDS = 6.0
+
+
+def import_times(statement: str) -> dict:
+    """Cumulative import time in seconds of every module the statement imports."""
+    env = {name: value for name, value in os.environ.items() if name != "OPENAI_API_KEY"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Top-level imports are not indented, so their times cover the rest.
+        times[name.rstrip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_query_path_defers_heavy_imports():
+    times = import_times(QUERY_PATH)
+    loaded = {name.strip() for name in times}
+    assert loaded & DEFERRED_MODULES == set()
+    total = sum(seconds for name, seconds in times.items() if not name.startswith(" "))
+    assert total < IMPORT_BUDGET_SECONDS
+
+
+def test_config_is_validated_on_first_use():
+    statement = (
+        "import src.config\n"
+        "from src.config import Config\n"
+        "assert Config.CHUNK_SIZE\n"
+        "# Ignore any local .env file holding a key.\n"
+        "src.config._environment_loaded = True\n"
+        "try:\n"
+        "    Config.OPENAI_API_KEY\n"
+        "except ValueError:\n"
+        "    print('missing key')\n"
+    )
+    env = {name: value for name, value in os.environ.items() if name != "OPENAI_API_KEY"}
+    result = subprocess.run([sys.executable, "-c", statement], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0
+    assert result.stdout.strip() == "missing key"
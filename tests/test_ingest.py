@@ -0,0 +1,89 @@
+import pytest
+from langchain.schema import Document
+from src.ingest import IngestPipeline, batched
+from src.manifest import IngestionManifest
+
+class FakeProcessor:
+    """A PDF processor whose PDFs each have one page split into one chunk per word."""
+    def __init__(self, data_folder):
+        self.data_folder = data_folder
+    def list_pdfs(self):
+        return sorted(str(p) for p in self.data_folder.glob("*.pdf"))
+    def iter_pdfs(self, files):
+        for file_path, _ in files:
+            text = open(file_path).read()
+            yield [Document(page_content=text, metadata={"source": file_path, "page": 1})]
+    def iter_chunks(self, docs):
+        for doc in docs:
+            for word in doc.page_content.split():
+                yield Document(page_content=word, metadata=dict(doc.metadata))
+    def log_ocr_cache_stats(self):
+        pass
+
+class FakeVectorStore:
+    def __init__(self, fail_after=None):
+        self.chunks = {}
+        self.upserts = []
+        self.fail_after = fail_after
+    def add_documents(self, docs, ids=None):
+        if self.fail_after is not None and len(self.upserts) >= self.fail_after:
+            raise RuntimeError("embedding backend unavailable")
+        self.upserts.append(list(ids))
+        self.chunks.update(zip(ids, (doc.page_content for doc in docs)))
+    def delete_documents(self, ids):
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+    def persist(self):
+        pass
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+def test_pipeline_upserts_in_batches_and_removes_deleted_files(tmp_path):
+    (tmp_path / "a.pdf").write_text("one two three four five")
+    (tmp_path / "b.pdf").write_text("six seven")
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    store = FakeVectorStore()
+
+    IngestPipeline(FakeProcessor(tmp_path), store, manifest, batch_size=2).run()
+    assert [len(ids) for ids in store.upserts] == [2, 2, 1, 2]
+    assert sorted(store.chunks.values()) == sorted("one two three four five six seven".split())
+    assert all(entry["complete"] for entry in manifest.entries.values())
+
+    (tmp_path / "a.pdf").unlink()
+    diff = IngestPipeline(FakeProcessor(tmp_path), store, manifest, batch_size=2).run()
+    assert diff.deleted == ["a.pdf"]
+    assert sorted(store.chunks.values()) == ["seven", "six"]
+
+def test_interrupted_ingest_resumes_from_last_batch(tmp_path):
+    (tmp_path / "a.pdf").write_text("one two three four five")
+    manifest_path = str(tmp_path / "manifest.json")
+    store = FakeVectorStore(fail_after=1)
+
+    with pytest.raises(RuntimeError):
+        IngestPipeline(FakeProcessor(tmp_path), store, IngestionManifest(manifest_path), batch_size=2).run()
+    checkpoint = IngestionManifest(manifest_path).entries["a.pdf"]
+    assert not checkpoint["complete"]
+    assert len(checkpoint["chunk_ids"]) == 2
+
+    store.fail_after = None
+    manifest = IngestionManifest(manifest_path)
+    IngestPipeline(FakeProcessor(tmp_path), store, manifest, batch_size=2).run()
+    # Only the chunks after the checkpoint were embedded again.
+    assert [len(ids) for ids in store.upserts] == [2, 2, 1]
+    assert len(store.chunks) == 5
+    assert manifest.entries["a.pdf"]["complete"]
+    assert manifest.entries["a.pdf"]["chunk_ids"] == sorted(store.chunks, key=lambda i: int(i.split("-")[-1]))
+
+def test_identical_copies_under_different_names_keep_their_own_chunks(tmp_path):
+    (tmp_path / "vessel-a.pdf").write_text("one two three")
+    (tmp_path / "vessel-b.pdf").write_text("one two three")
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    store = FakeVectorStore()
+    IngestPipeline(FakeProcessor(tmp_path), store, manifest, batch_size=2).run()
+    assert len(store.chunks) == 6
+    assert not set(manifest.entries["vessel-a.pdf"]["chunk_ids"]) & set(manifest.entries["vessel-b.pdf"]["chunk_ids"])
+
+    (tmp_path / "vessel-a.pdf").unlink()
+    IngestPipeline(FakeProcessor(tmp_path), store, manifest, batch_size=2).run()
+    assert sorted(store.chunks) == sorted(manifest.entries["vessel-b.pdf"]["chunk_ids"])
@@ -0,0 +1,49 @@
+from langchain.schema import Document
+from src.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+def test_tokenize_keeps_codes_and_their_variants():
+    terms = tokenize("Close V-231, then reset ALM 4012.")
+    assert "v-231" in terms
+    assert "v231" in terms
+    assert "231" in terms
+    assert "alm4012" in terms
+    assert tokenize("ALM4012") == ["alm4012"]
+
+def test_bm25_ranks_exact_matches_first_and_persists(tmp_path):
+    index = BM25Index(path=str(tmp_path / "bm25.json"))
+    index.add_documents(
+        [
+            Document(page_content="Fuel separator purge procedure.", metadata={"page": 1}),
+            Document(page_content="Valve V-231 controls the fuel separator inlet.", metadata={"page": 2}),
+            Document(page_content="Lubricating oil pump overhaul.", metadata={"page": 3}),
+        ],
+        ["a", "b", "c"],
+    )
+    assert index.search("v231", k=1)[0][0] == "b"
+    assert [doc_id for doc_id, _ in index.search("fuel separator", k=5)] == ["a", "b"]
+    index.save()
+
+    reloaded = BM25Index(path=str(tmp_path / "bm25.json"))
+    assert reloaded.load()
+    assert reloaded.search("V-231", k=1)[0][0] == "b"
+    assert reloaded.get_document("b").metadata == {"page": 2}
+
+    reloaded.delete(["b"])
+    assert reloaded.search("V-231") == []
+    assert len(reloaded) == 2
+
+def test_bm25_search_can_be_limited_to_sources():
+    index = BM25Index()
+    index.add_documents(
+        [
+            Document(page_content="Reset alarm AL-211 on the purifier.", metadata={"source": "purifier.pdf"}),
+            Document(page_content="Reset alarm AL-211 on the boiler.", metadata={"source": "boiler.pdf"}),
+        ],
+        ["a", "b"],
+    )
+    assert sorted(doc_id for doc_id, _ in index.search("AL-211")) == ["a", "b"]
+    assert [doc_id for doc_id, _ in index.search("AL-211", sources={"boiler.pdf"})] == ["b"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[("x", "X"), ("y", "Y")], [("y", "Y"), ("z", "Z")]])
+    assert fused == ["Y", "X", "Z"]
@@ -0,0 +1,53 @@
+import os
+from src.manifest import IngestionManifest, compute_file_hash, make_chunk_ids
+
+def test_diff_detects_added_modified_unchanged_and_deleted(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    kept = data / "kept.pdf"
+    kept.write_bytes(b"kept content")
+    changed = data / "changed.pdf"
+    changed.write_bytes(b"old content")
+    manifest_path = tmp_path / "state" / "manifest.json"
+
+    manifest = IngestionManifest(str(manifest_path))
+    assert not manifest.exists
+    for path in (kept, changed):
+        manifest.record(str(path), compute_file_hash(path), ["a", "b"])
+    manifest.entries["removed.pdf"] = {
+        "path": "removed.pdf", "size": 1, "mtime": 0, "hash": "x", "chunk_ids": ["c"]
+    }
+    manifest.save()
+
+    changed.write_bytes(b"new content!")
+    new = data / "new.pdf"
+    new.write_bytes(b"brand new")
+
+    reloaded = IngestionManifest(str(manifest_path))
+    assert reloaded.exists
+    diff = reloaded.diff([str(kept), str(changed), str(new)])
+    assert diff.unchanged == ["kept.pdf"]
+    assert diff.modified == [(str(changed), compute_file_hash(changed))]
+    assert diff.added == [(str(new), compute_file_hash(new))]
+    assert diff.deleted == ["removed.pdf"]
+    assert diff.has_changes()
+    assert reloaded.remove("removed.pdf") == ["c"]
+
+def test_touched_file_with_same_hash_is_unchanged(tmp_path):
+    pdf = tmp_path / "manual.pdf"
+    pdf.write_bytes(b"content")
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    manifest.record(str(pdf), compute_file_hash(pdf), ["id"])
+
+    stat = os.stat(pdf)
+    os.utime(pdf, (stat.st_atime, stat.st_mtime + 10))
+    diff = manifest.diff([str(pdf)])
+    assert diff.unchanged == ["manual.pdf"]
+    assert not diff.has_changes()
+    assert manifest.entries["manual.pdf"]["mtime"] == stat.st_mtime + 10
+
+def test_make_chunk_ids_is_deterministic():
+    assert make_chunk_ids("manual.pdf", "abcdef" * 8, 2) == make_chunk_ids("manual.pdf", "abcdef" * 8, 2)
+    assert make_chunk_ids("manual.pdf", "abcdef" * 8, 2)[1].endswith("-1")
+    # Copies of the same PDF under another name get their own IDs.
+    assert make_chunk_ids("copy.pdf", "abcdef" * 8, 2) != make_chunk_ids("manual.pdf", "abcdef" * 8, 2)
@@ -0,0 +1,46 @@
+from langchain_core.language_models.fake import FakeListLLM
+from src.memory import SummarizingMemory
+
+def word_counter(text):
+    return len(text.split())
+
+def make_memory(responses, **kwargs):
+    llm = FakeListLLM(responses=responses)
+    return SummarizingMemory(llm=llm, token_counter=word_counter, **kwargs)
+
+def test_recent_turns_are_kept_verbatim():
+    memory = make_memory([], keep_turns=2, max_tokens=1000)
+    memory.add_turn("How do I purge the separator?", "Open valve V-1.")
+    assert memory.summary == ""
+    assert memory.history_text() == "Human: How do I purge the separator?\nAssistant: Open valve V-1."
+    assert memory.load_memory_variables({})["chat_history"][0].content == "How do I purge the separator?"
+
+def test_older_turns_are_folded_into_a_rolling_summary():
+    memory = make_memory(["summary one", "summary two"], keep_turns=2, max_tokens=1000)
+    memory.save_context({"question": "q1"}, {"answer": "a1"})
+    memory.save_context({"question": "q2"}, {"answer": "a2"})
+    memory.save_context({"question": "q3"}, {"answer": "a3"})
+    assert memory.summary == "summary one"
+    assert memory.turns == [("q2", "a2"), ("q3", "a3")]
+
+    memory.save_context({"question": "q4"}, {"answer": "a4"})
+    # The summary is updated incrementally with only the newly evicted turn.
+    assert memory.summary == "summary two"
+    assert memory.history_text().startswith("Summary of the earlier conversation: summary two")
+    assert memory.messages[0].type == "system"
+
+def test_history_is_kept_under_the_token_ceiling():
+    memory = make_memory(["short"] * 5, keep_turns=10, max_tokens=20)
+    for i in range(4):
+        memory.add_turn(f"question {i} " + "word " * 5, f"answer {i}")
+    assert memory.history_token_count() <= 20
+    assert memory.summary == "short"
+    assert len(memory.turns) < 4
+
+def test_clear():
+    memory = make_memory(["s"], keep_turns=1, max_tokens=1000)
+    memory.add_turn("q1", "a1")
+    memory.add_turn("q2", "a2")
+    memory.clear()
+    assert memory.history_text() == ""
+    assert memory.history_token_count() == 0
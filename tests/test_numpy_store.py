@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.numpy_store import NumpyVectorStore, quantize
+from src.vector_db import VectorStore
+
+
+def make_docs(count):
+    return [
+        Document(page_content=f"Maintenance step {i} for valve V-{100 + i}.", metadata={"source": "a.pdf", "page": i})
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_quantize_keeps_cosine_similarity(dtype):
+    vectors = np.random.default_rng(0).normal(size=(20, 64))
+    rows, scales = quantize(vectors, dtype)
+    restored = rows.astype(np.float32) * scales[:, None]
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(restored @ unit[0], unit @ unit[0], atol=0.02)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_search_finds_exact_text(tmp_path, dtype):
+    embeddings = DeterministicFakeEmbedding(size=64)
+    docs = make_docs(30)
+    store = NumpyVectorStore.from_documents(
+        docs, embeddings, ids=[f"id-{i}" for i in range(30)], persist_directory=str(tmp_path), dtype=dtype
+    )
+    results = store.similarity_search(docs[7].page_content, k=3)
+    assert results[0].id == "id-7"
+    assert results[0].metadata == {"source": "a.pdf", "page": 7}
+    assert len(results) == 3
+
+    retriever = store.as_retriever(search_kwargs={"k": 2})
+    assert [doc.id for doc in retriever.invoke(docs[3].page_content)][0] == "id-3"
+
+
+def test_upsert_delete_and_reopen(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=32)
+    docs = make_docs(10)
+    store = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings)
+    store.add_documents(docs, ids=[f"id-{i}" for i in range(10)])
+    replacement = Document(page_content="Replaced text.", metadata={"page": 0})
+    store.add_documents([replacement], ids=["id-0"])
+    store.delete(["id-1", "id-2"])
+    assert len(store) == 8
+    assert store.get(ids=["id-0"])["documents"] == ["Replaced text."]
+
+    reopened = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings)
+    assert sorted(reopened.get(include=[])["ids"]) == sorted(f"id-{i}" for i in [0] + list(range(3, 10)))
+    assert reopened.similarity_search(docs[1].page_content, k=1)[0].id != "id-1"
+    assert reopened.similarity_search("Replaced text.", k=1)[0].id == "id-0"
+
+    # Enough deleted rows trigger a compaction that keeps the live chunks.
+    reopened.delete([f"id-{i}" for i in range(3, 7)])
+    reopened.save()
+    assert len(reopened._offsets) == 4
+    compacted = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings)
+    assert sorted(compacted.get()["ids"]) == ["id-0", "id-7", "id-8", "id-9"]
+    assert compacted.similarity_search(docs[8].page_content, k=1)[0].id == "id-8"
+
+
+def test_interrupted_append_is_dropped_on_open(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings)
+    store.add_documents(make_docs(3), ids=["a", "b", "c"])
+    # A crash before the offsets are written leaves vectors without a record.
+    with open(tmp_path / "vectors.bin", "ab") as f:
+        f.write(b"\0" * 32)
+    reopened = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings)
+    reopened.add_documents(make_docs(1), ids=["d"])
+    assert reopened.similarity_search(make_docs(1)[0].page_content, k=1)[0].id in {"a", "d"}
+    assert len(NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings)) == 4
+
+
+def test_ivf_search(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=32)
+    docs = make_docs(200)
+    store = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings, ivf_lists=4, nprobe=4)
+    store.add_documents(docs, ids=[f"id-{i}" for i in range(200)])
+    store.save()
+    assert store._centroids.shape == (4, 32)
+    # Probing every list gives the exact results.
+    assert store.similarity_search(docs[42].page_content, k=1)[0].id == "id-42"
+    store.add_documents([Document(page_content="New chunk.")], ids=["new"])
+    assert store.similarity_search("New chunk.", k=1)[0].id == "new"
+
+
+def test_ivf_search_probes_further_lists_when_the_nearest_are_deleted(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=32)
+    docs = make_docs(60)
+    store = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings, ivf_lists=4, nprobe=1)
+    store.add_documents(docs, ids=[f"id-{i}" for i in range(60)])
+    store.save()
+    query = np.asarray(embeddings.embed_query(docs[0].page_content), dtype=np.float32)
+    nearest = int(np.argmax(store._centroids @ (query / np.linalg.norm(query))))
+    store.delete([store._ids[row] for row in np.nonzero(store._lists == nearest)[0]])
+    results = store.similarity_search(docs[0].page_content, k=4)
+    assert len(results) == 4
+    assert all(doc.id in store._row for doc in results)
+
+
+def test_vector_store_numpy_backend(tmp_path):
+    store = VectorStore(
+        persist_directory=str(tmp_path / "numpy_db"),
+        embeddings=DeterministicFakeEmbedding(size=32),
+        lexical_index_path=str(tmp_path / "bm25.json"),
+        backend="numpy",
+    )
+    docs = make_docs(5)
+    store.add_documents(docs, ids=[f"id-{i}" for i in range(5)])
+    store.persist()
+
+    reopened = VectorStore(
+        persist_directory=str(tmp_path / "numpy_db"),
+        embeddings=DeterministicFakeEmbedding(size=32),
+        lexical_index_path=str(tmp_path / "bm25.json"),
+        backend="numpy",
+    )
+    retriever = reopened.get_hybrid_retriever(dense_k=2, lexical_k=2, k=2)
+    assert retriever.invoke(docs[4].page_content)[0].metadata["page"] == 4
+
+
+def test_unknown_backend(tmp_path):
+    store = VectorStore(persist_directory=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=8), backend="x")
+    with pytest.raises(ValueError):
+        store.create_db(make_docs(1))
+
+
+def test_search_reads_a_consistent_view_while_the_store_changes(tmp_path, monkeypatch):
+    from src.numpy_store import StoreView
+    # Small blocks, so that searches span several of them.
+    monkeypatch.setattr("src.numpy_store.SEARCH_BLOCK_ROWS", 7)
+    embeddings = DeterministicFakeEmbedding(size=32)
+    docs = make_docs(40)
+    store = NumpyVectorStore(persist_directory=str(tmp_path), embedding_function=embeddings)
+    store.add_documents(docs, ids=[f"id-{i}" for i in range(40)])
+    assert store.similarity_search(docs[33].page_content, k=1)[0].id == "id-33"
+
+    view = StoreView(store)
+    store.delete([f"id-{i}" for i in range(30)])
+    store.save()
+    assert len(store._offsets) == 10
+    # The view still sees the rows as they were when it was taken.
+    assert view.live.all()
+    assert view.document(5).page_content == docs[5].page_content
+    assert store.similarity_search(docs[5].page_content, k=1)[0].id != "id-5"
@@ -0,0 +1,41 @@
+from src.ocr_cache import OCRCache
+
+def test_get_and_put_track_hits_and_misses(tmp_path):
+    cache = OCRCache(path=str(tmp_path / "ocr.sqlite3"), max_bytes=1024)
+    key = OCRCache.make_key("hash", 1, 200, "tesseract-5|")
+    assert cache.get(key) is None
+    cache.put(key, "Page one text")
+    assert cache.get(key) == "Page one text"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] == len("Page one text")
+
+def test_key_depends_on_every_component():
+    base = OCRCache.make_key("hash", 1, 200, "sig")
+    assert base != OCRCache.make_key("other", 1, 200, "sig")
+    assert base != OCRCache.make_key("hash", 2, 200, "sig")
+    assert base != OCRCache.make_key("hash", 1, 300, "sig")
+    assert base != OCRCache.make_key("hash", 1, 200, "sig2")
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = OCRCache(path=str(tmp_path / "ocr.sqlite3"), max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    # Touch "a" so that "b" becomes the least recently used entry.
+    cache.get("a")
+    cache.put("c", "z" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.get("c") == "z" * 10
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "ocr.sqlite3")
+    OCRCache(path=path).put("key", "text")
+    reopened = OCRCache(path=path)
+    assert reopened.get("key") == "text"
+    assert reopened.stats()["size_bytes"] == 4
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain.schema import Document
+from src.ocr_scheduler import OCRJob, OCRScheduler
+
+def fake_worker(file_path, start_page, last_page, file_name, delay=0.0):
+    # Later pages finish first, so results arrive out of order.
+    time.sleep(delay / start_page)
+    return [
+        Document(page_content=f"{file_name} {page}", metadata={"source": file_name, "page": page})
+        for page in range(start_page, last_page + 1)
+    ]
+
+def test_results_are_ordered_per_job_and_across_jobs():
+    jobs = [
+        OCRJob("a.pdf", "a.pdf", [3, 1, 2, 7]),
+        OCRJob("b.pdf", "b.pdf", [1, 2]),
+        OCRJob("c.pdf", "c.pdf", [5]),
+    ]
+    scheduler = OCRScheduler(
+        fake_worker, worker_args=(0.01,), executor=ThreadPoolExecutor(max_workers=4)
+    )
+    results = list(scheduler.run(jobs))
+    assert [index for index, _ in results] == [0, 1, 2]
+    assert [doc.metadata["page"] for doc in results[0][1]] == [1, 2, 3, 7]
+    assert [doc.page_content for doc in results[1][1]] == ["b.pdf 1", "b.pdf 2"]
+    assert [doc.metadata["page"] for doc in results[2][1]] == [5]
+
+def test_work_units_span_files_and_use_every_worker():
+    units = []
+    def recording_worker(file_path, start_page, last_page, file_name):
+        units.append((file_name, start_page, last_page))
+        return fake_worker(file_path, start_page, last_page, file_name)
+
+    jobs = [OCRJob("a.pdf", "a.pdf", range(1, 13)), OCRJob("b.pdf", "b.pdf", range(1, 5))]
+    scheduler = OCRScheduler(recording_worker, executor=ThreadPoolExecutor(max_workers=8))
+    list(scheduler.run(jobs))
+    # 16 pages over 8 workers: single-page units from both files.
+    assert len(units) == 16
+    assert {name for name, _, _ in units} == {"a.pdf", "b.pdf"}
+
+def test_unit_size_adapts_to_observed_page_time():
+    scheduler = OCRScheduler(
+        fake_worker, executor=ThreadPoolExecutor(max_workers=2),
+        target_unit_seconds=10.0, max_unit_pages=10
+    )
+    # Without timings the pages are spread over the workers.
+    assert scheduler.unit_size(600) == 10
+    assert scheduler.unit_size(16) == 2
+    assert scheduler.unit_size(1) == 1
+    # Slow pages shrink the units to roughly the target duration.
+    scheduler._observe(pages=2, seconds=10.0)
+    assert scheduler.unit_size(600) == 2
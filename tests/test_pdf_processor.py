@@ -40,4 +40,166 @@ def test_split_documents():
     # And each chunk should still have the metadata.
     for chunk in split_docs:
         assert "source" in chunk.metadata
-        assert "page" in chunk.metadata
\ No newline at end of file
+        assert "page" in chunk.metadata
+
+def test_load_scanned_pdf_only_ocrs_uncached_pages(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.config import Config
+    from src.ocr_cache import OCRCache
+    from src.pdf_processor import ocr_settings_signature
+
+    pdf_file = tmp_path / "scanned.pdf"
+    pdf_file.write_bytes(b"scanned")
+    converted = []
+
+    def fake_process_chunk(file_path, start_page, last_page, file_name, dpis, *settings):
+        converted.append((start_page, last_page))
+        return [
+            Document(page_content=f"OCR page {page}", metadata={"source": file_name, "page": page})
+            for page in range(start_page, last_page + 1)
+        ]
+
+    monkeypatch.setattr("src.pdf_processor.pdfinfo_from_path", lambda path: {"Pages": 3})
+    monkeypatch.setattr("src.pdf_processor.process_chunk", fake_process_chunk)
+    monkeypatch.setattr("src.pdf_processor.tesseract_signature", lambda config: "tesseract-test")
+
+    cache = OCRCache(path=str(tmp_path / "ocr.sqlite3"))
+    processor = PDFProcessor(
+        data_folder=str(tmp_path), ocr_cache=cache, ocr_executor=ThreadPoolExecutor(max_workers=1)
+    )
+    first = processor.load_scanned_pdf(str(pdf_file), file_hash="abc")
+    assert [doc.metadata["page"] for doc in first] == [1, 2, 3]
+    assert sorted(converted) == [(1, 1), (2, 2), (3, 3)]
+
+    # Evict page 2 only; a second load must re-OCR just that page.
+    cache._conn.execute(
+        "DELETE FROM ocr_pages WHERE key = ?",
+        (OCRCache.make_key("abc", 2, Config.OCR_DPI, ocr_settings_signature()),)
+    )
+    converted.clear()
+    second = processor.load_scanned_pdf(str(pdf_file), file_hash="abc")
+    assert [doc.page_content for doc in second] == ["OCR page 1", "OCR page 2", "OCR page 3"]
+    assert converted == [(2, 2)]
+
+
+def test_page_needs_ocr():
+    from src.pdf_processor import page_needs_ocr
+    assert page_needs_ocr("")
+    assert page_needs_ocr("   12  ")
+    assert page_needs_ocr("(cid:12)(cid:34)(cid:56) " * 20)
+    assert page_needs_ocr("#### ~~~~ |||| ==== " * 5 + "abc")
+    assert not page_needs_ocr("Remove the cylinder head bolts in the sequence shown.")
+
+def test_load_pdf_only_ocrs_pages_without_text(monkeypatch, tmp_path):
+    pdf_file = tmp_path / "mixed.pdf"
+    pdf_file.write_text("Dummy PDF file content")
+    body = "Open the fuel valve and check the pressure gauge reading."
+
+    class MixedLoader:
+        def __init__(self, file_path):
+            pass
+        def load(self):
+            return [
+                Document(page_content=body, metadata={}),
+                Document(page_content="", metadata={}),
+                Document(page_content="(cid:3)(cid:4)(cid:5)" * 10, metadata={}),
+            ]
+
+    requested = []
+    def fake_ocr_pdfs(requests):
+        results = []
+        for file_path, file_hash, pages in requests:
+            requested.extend(pages)
+            results.append([
+                Document(page_content=f"OCR text {page}", metadata={"source": "mixed.pdf", "page": page})
+                for page in pages
+            ])
+        return results
+
+    monkeypatch.setattr("src.pdf_processor.PyPDFLoader", MixedLoader)
+    processor = PDFProcessor(data_folder=str(tmp_path))
+    monkeypatch.setattr(processor, "ocr_pdfs", fake_ocr_pdfs)
+    docs = processor.load_pdf(str(pdf_file))
+
+    assert requested == [2, 3]
+    assert [doc.page_content for doc in docs] == [body, "OCR text 2", "OCR text 3"]
+    assert [doc.metadata["page"] for doc in docs] == [1, 2, 3]
+
+def test_iter_chunks_matches_split_documents():
+    processor = PDFProcessor(data_folder="dummy")
+    docs = [
+        Document(page_content="B" * 1500, metadata={"source": "dummy.pdf", "page": page})
+        for page in (1, 2)
+    ]
+    expected = [chunk.page_content for chunk in processor.split_documents(docs)]
+    assert [chunk.page_content for chunk in processor.iter_chunks(docs)] == expected
+
+
+class FakeImage:
+    """A page raster whose histogram has the given share of black pixels."""
+    def __init__(self, dpi, ink=0.1):
+        self.dpi = dpi
+        self.mode = "L"
+        self.ink = ink
+
+    def histogram(self):
+        return [int(self.ink * 1000)] + [0] * 254 + [1000 - int(self.ink * 1000)]
+
+
+class FakeTesseract:
+    """Recognises two lines of words, with a confidence depending on the DPI."""
+    class Output:
+        DICT = "dict"
+
+    def __init__(self, confidence_by_dpi):
+        self.confidence_by_dpi = confidence_by_dpi
+        self.calls = []
+
+    def image_to_data(self, image, config="", output_type=None):
+        self.calls.append(image.dpi)
+        confidence = self.confidence_by_dpi[image.dpi]
+        return {
+            "text": ["", "Check", "oil", "", "level", "  "],
+            "conf": [-1, confidence, confidence, -1, confidence, -1],
+            "block_num": [1, 1, 1, 1, 1, 1],
+            "par_num": [1, 1, 1, 1, 1, 1],
+            "line_num": [0, 1, 1, 2, 2, 2],
+        }
+
+
+def test_ocr_page_rescans_at_higher_dpi_only_when_confidence_is_low(monkeypatch):
+    from src.pdf_processor import process_chunk
+    rasterized = []
+
+    def fake_convert(file_path, dpi, first_page, last_page, grayscale):
+        assert first_page == last_page and grayscale
+        rasterized.append((first_page, dpi))
+        # Page 2 is blank.
+        return [FakeImage(dpi, ink=0.0 if first_page == 2 else 0.1)]
+
+    tesseract = FakeTesseract({150: 50.0, 300: 90.0})
+    monkeypatch.setattr("src.pdf_processor.convert_from_path", fake_convert)
+    monkeypatch.setattr("src.pdf_processor.pytesseract", tesseract)
+    docs = process_chunk("manual.pdf", 1, 2, "manual.pdf", (150, 300), "", 70.0, True, 0.002)
+    assert rasterized == [(1, 150), (1, 300), (2, 150)]
+    assert tesseract.calls == [150, 300]
+    assert docs[0].page_content == "Check oil\nlevel"
+    assert docs[0].metadata["ocr_confidence"] == 90.0
+    assert docs[0].metadata["ocr_dpi"] == 300
+    assert docs[1].page_content == "" and docs[1].metadata["ocr_blank"]
+
+    # A confident first pass is kept without a rescan.
+    rasterized.clear()
+    tesseract.confidence_by_dpi[150] = 80.0
+    docs = process_chunk("manual.pdf", 1, 1, "manual.pdf", (150, 300), "", 70.0, True, 0.002)
+    assert rasterized == [(1, 150)]
+    assert docs[0].metadata["ocr_attempts"] == 1
+
+
+def test_ocr_statistics_are_moved_out_of_page_metadata():
+    doc = Document(page_content="text", metadata={
+        "source": "manual.pdf", "page": 1, "rasterize_seconds": 0.1, "ocr_seconds": 0.5,
+        "ocr_confidence": 60.0, "ocr_dpi": 300, "ocr_attempts": 2,
+    })
+    PDFProcessor._record_ocr_stats("manual.pdf", [doc])
+    assert doc.metadata == {"source": "manual.pdf", "page": 1}
@@ -1,21 +1,14 @@
 import pytest
-from unittest.mock import MagicMock
-
-# Import the ConversationalRetrievalChain so we can patch its factory method.
-from langchain.chains import ConversationalRetrievalChain
 
 # Import the QueryEngine and Config from your project.
-from src.query_engine import QueryEngine
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.answer_cache import AnswerCache
+from src.query_engine import QueryEngine, is_self_contained
+from src.context_packer import PackedRetriever
 from src.config import Config
+from tests.helpers import DummyRetriever, DummyVectorStore, make_engine
 
 
-# Define dummy classes for dependencies that are not used in our test.
-class DummyRetriever:
-    pass
-
-class DummyVectorStore:
-    pass
-
 @pytest.fixture(autouse=True)
 def set_dummy_config():
     """
@@ -28,29 +21,14 @@ def set_dummy_config():
     yield
     # Cleanup or reset config values here if necessary.
 
-def test_query_engine(monkeypatch):
+def test_query_engine():
     """
-    Test that QueryEngine.query returns the expected answer and that the underlying
-    chain is invoked with the correct parameters.
+    Test that QueryEngine.query returns the expected answer and that the
+    answer prompt is built from the question, context and history.
     """
-    # The answer we expect the dummy chain to return.
+    # The answer we expect the dummy LLM to return.
     dummy_answer = "This is a test answer."
-
-    # Create a dummy chain with an 'invoke' method that always returns dummy_answer.
-    dummy_chain = MagicMock()
-    dummy_chain.invoke.return_value = {"answer": dummy_answer}
-
-    # Monkey-patch the from_llm factory method to return our dummy chain.
-    monkeypatch.setattr(
-        ConversationalRetrievalChain,
-        "from_llm",
-        lambda llm, retriever, memory, combine_docs_chain_kwargs: dummy_chain,
-    )
-
-    # Instantiate QueryEngine with dummy vector store and retriever.
-    vector_store = DummyVectorStore()
-    retriever = DummyRetriever()
-    query_engine = QueryEngine(vector_store, retriever)
+    query_engine, llm, condense_llm = make_engine([dummy_answer])
 
     # Define a test question.
     test_question = "How to remove the cylinder head?"
@@ -61,12 +39,113 @@ def test_query_engine(monkeypatch):
     # Assert that the returned answer matches the dummy answer.
     assert returned_answer == dummy_answer
 
-    # Verify that the dummy chain's 'invoke' method was called exactly once.
-    dummy_chain.invoke.assert_called_once()
-
-    # Retrieve the arguments with which the dummy chain was called.
-    call_args = dummy_chain.invoke.call_args[0][0]
-    # Check that the question passed to the chain is as expected.
-    assert call_args["question"] == test_question
+    # The answer LLM was called exactly once, and nothing was condensed on the first turn.
+    assert len(llm.prompts) == 1
+    assert condense_llm.prompts == []
+    prompt = llm.prompts[0]
+    # Check that the question and packed context reached the prompt.
+    assert f"question: {test_question}" in prompt
+    assert "[manual.pdf - Page 4]\nUnscrew the nuts." in prompt
     # Since the memory is empty at the first query, chat_history should be an empty string.
-    assert call_args["chat_history"] == ""
\ No newline at end of file
+    assert "chat_history: ," in prompt
+    assert set(query_engine.last_timings) >= {"condense", "retrieve", "generate", "total"}
+
+def test_query_engine_packs_retrieved_context():
+    """
+    Test that the engine's retriever packs context into at most top_k sections.
+    """
+    retriever = DummyRetriever()
+    query_engine, _, _ = make_engine([], retriever=retriever, top_k=2)
+    assert isinstance(query_engine.retriever, PackedRetriever)
+    assert query_engine.retriever.base_retriever is retriever
+    assert query_engine.retriever.max_sections == 2
+
+def test_self_contained_follow_up_skips_condensing():
+    retriever = DummyRetriever()
+    query_engine, llm, condense_llm = make_engine(["a1", "a2"], retriever=retriever)
+    query_engine.query("How to remove the cylinder head?")
+    query_engine.query("How do I purge the fuel oil separator?")
+    assert condense_llm.prompts == []
+    assert retriever.questions[-1] == "How do I purge the fuel oil separator?"
+    # The history still reaches the answer prompt.
+    assert "Human: How to remove the cylinder head?" in llm.prompts[-1]
+
+def test_follow_up_is_condensed_and_retrieved_with_standalone_question():
+    retriever = DummyRetriever()
+    standalone = "What torque is used for the cylinder head nuts?"
+    query_engine, llm, condense_llm = make_engine(["a1", "a2"], [standalone], retriever=retriever)
+    query_engine.query("How to remove the cylinder head?")
+    query_engine.query("What torque for those?")
+    assert len(condense_llm.prompts) == 1
+    assert "Follow Up Input: What torque for those?" in condense_llm.prompts[0]
+    # The speculative retrieval on the raw question is discarded.
+    assert retriever.questions[-1] == standalone
+    assert f"question: {standalone}" in llm.prompts[-1]
+    assert query_engine.last_timings["condense"] >= 0.0
+
+def test_speculative_retrieval_is_reused_when_question_is_unchanged():
+    retriever = DummyRetriever()
+    query_engine, _, _ = make_engine(
+        ["a1", "a2"], ["How to tighten it?"], retriever=retriever
+    )
+    query_engine.query("How to remove the cylinder head?")
+    query_engine.query("How to tighten it?")
+    assert retriever.questions == ["How to remove the cylinder head?", "How to tighten it?"]
+    assert "retrieve_wait" in query_engine.last_timings
+
+def test_is_self_contained():
+    assert is_self_contained("How do I purge the fuel oil separator?")
+    assert not is_self_contained("And what about it?")
+    assert not is_self_contained("Torque values?")
+    assert not is_self_contained("What is the pressure for those valves?")
+
+def test_stream_yields_tokens_and_reports_sources():
+    query_engine, _, _ = make_engine(["Unscrew the nuts."])
+    stream = query_engine.stream("How to remove the cylinder head?")
+    tokens = list(stream)
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Unscrew the nuts."
+    assert stream.answer == "Unscrew the nuts."
+    assert stream.sources == [{"source": "manual.pdf", "page": 4}]
+    assert stream.timings["first_token"] <= stream.timings["total"]
+    # The streamed turn is stored in memory like a regular query.
+    assert query_engine.memory.turns == [("How to remove the cylinder head?", "Unscrew the nuts.")]
+
+class EmbeddingVectorStore:
+    def __init__(self):
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+        self.index_version = "v1"
+
+def test_repeated_first_turn_question_is_answered_from_the_cache():
+    cache = AnswerCache()
+    first, llm, _ = make_engine(["Unscrew the nuts."], answer_cache=cache)
+    first.vector_store = EmbeddingVectorStore()
+    assert first.query("How to remove the cylinder head?") == "Unscrew the nuts."
+
+    # A new session asking the same question does not call the LLM.
+    second, llm2, _ = make_engine([], answer_cache=cache)
+    second.vector_store = first.vector_store
+    stream = second.stream("How to remove the cylinder head?")
+    assert "".join(stream) == "Unscrew the nuts."
+    assert llm2.prompts == []
+    assert cache.stats()["hits"] == 1
+
+    # Follow-up turns are not eligible and go to the LLM.
+    second.llm.responses.append("Torque them to 300 Nm.")
+    assert second.query("How to remove the cylinder head?") == "Torque them to 300 Nm."
+    assert cache.stats()["hits"] == 1
+
+    # Once the index changes the cached answer is no longer used.
+    third, llm3, _ = make_engine(["Fresh answer."], answer_cache=cache)
+    third.vector_store = EmbeddingVectorStore()
+    third.vector_store.index_version = "v2"
+    assert third.query("How to remove the cylinder head?") == "Fresh answer."
+
+def test_engines_share_clients_and_chains():
+    first = QueryEngine(DummyVectorStore(), DummyRetriever())
+    second = QueryEngine(DummyVectorStore(), DummyRetriever())
+    assert first.llm is second.llm
+    assert first.qa_chain is second.qa_chain
+    assert first.condense_chain is second.condense_chain
+    # Conversation state stays per engine.
+    assert first.memory is not second.memory
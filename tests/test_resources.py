@@ -0,0 +1,104 @@
+import time
+import threading
+import pytest
+from src.resources import ConcurrencyLimiter, ResourceRegistry
+
+def test_registry_creates_each_resource_once():
+    registry = ResourceRegistry()
+    created = []
+    def factory():
+        created.append(object())
+        return created[-1]
+    first = registry.get("client", factory)
+    assert registry.get("client", factory) is first
+    assert len(created) == 1
+    assert "client" in registry
+
+def test_registry_closes_resources_on_clear():
+    class Client:
+        closed = False
+        def close(self):
+            self.closed = True
+    registry = ResourceRegistry()
+    client = registry.get("client", Client)
+    registry.clear()
+    assert client.closed
+    assert "client" not in registry
+
+def test_each_vector_store_gets_its_own_retriever(monkeypatch):
+    from src import resources
+    class Store:
+        def get_hybrid_retriever(self):
+            return object()
+        get_retriever = get_hybrid_retriever
+    monkeypatch.setattr(resources, "registry", ResourceRegistry())
+    first, second = Store(), Store()
+    retriever = resources.get_retriever(first)
+    assert resources.get_retriever(first) is retriever
+    assert resources.get_retriever(second) is not retriever
+
+def test_limiter_caps_calls_in_flight():
+    limiter = ConcurrencyLimiter(max_in_flight=2, timeout=5)
+    peak = []
+    def call():
+        with limiter.slot():
+            peak.append(limiter.stats()["in_flight"])
+            time.sleep(0.05)
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = limiter.stats()
+    assert max(peak) == 2
+    assert stats["calls"] == 6
+    assert stats["queued_calls"] >= 4
+    assert stats["in_flight"] == 0
+
+def test_limiter_times_out_when_no_slot_frees_up():
+    limiter = ConcurrencyLimiter(max_in_flight=1, timeout=0.05)
+    with limiter.slot():
+        with pytest.raises(TimeoutError):
+            with limiter.slot():
+                pass
+
+def test_async_waiters_are_served_in_arrival_order():
+    import asyncio
+    limiter = ConcurrencyLimiter(max_in_flight=1, timeout=5)
+    order = []
+
+    async def call(name):
+        async with limiter.aslot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        async with limiter.aslot():
+            tasks = []
+            for name in range(5):
+                tasks.append(asyncio.create_task(call(name)))
+                await asyncio.sleep(0)
+            assert limiter.stats()["waiting"] == 5
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.stats()["in_flight"] == 0
+
+def test_cancelled_async_waiter_gives_up_its_place():
+    import asyncio
+    limiter = ConcurrencyLimiter(max_in_flight=1, timeout=5)
+
+    async def main():
+        async with limiter.aslot():
+            waiter = asyncio.create_task(limiter.aslot().__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert limiter.stats()["waiting"] == 0
+        # The slot is free again, for sync and async callers alike.
+        with limiter.slot() as waited:
+            assert waited < 0.01
+
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+import zlib
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from src.sharding import ShardedVectorStore
+from src.numpy_store import NumpyVectorStore
+from src.vector_db import VectorStore
+
+MANUALS = {
+    "purifier.pdf": "purifier bowl disc stack sludge discharge gravity disc",
+    "boiler.pdf": "boiler burner flame furnace steam drum water level",
+    "engine.pdf": "engine cylinder liner piston ring crankshaft bearing",
+    "steering.pdf": "steering gear rudder ram hydraulic pump telemotor",
+}
+
+
+# Bag-of-words embedding, so that texts sharing words are similar.
+class WordEmbedding(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = [0.0] * 64
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+        return vector
+
+
+def make_chunks():
+    docs, ids = [], []
+    for source, words in MANUALS.items():
+        for i, word in enumerate(words.split()):
+            docs.append(Document(page_content=f"Maintenance of the {word} ({words})", metadata={"source": source, "page": i + 1}))
+            ids.append(f"{source}-{i}")
+    return docs, ids
+
+
+def make_store(tmp_path, shard_class=NumpyVectorStore, **kwargs):
+    return ShardedVectorStore(
+        persist_directory=str(tmp_path / "shards"), embedding_function=WordEmbedding(),
+        shard_class=shard_class, **kwargs
+    )
+
+
+def test_routes_queries_to_the_matching_manual(tmp_path):
+    docs, ids = make_chunks()
+    store = make_store(tmp_path, shards_per_query=1, keyword_weight=0.0)
+    store.add_documents(docs, ids=ids)
+    assert len(store.shards) == 4
+    results = store.similarity_search("sludge in the purifier bowl", k=3)
+    assert {doc.metadata["source"] for doc in results} == {"purifier.pdf"}
+    assert len(results) == 3
+
+    # Keywords alone route too.
+    store.keyword_weight = 1.0
+    vector = [0.0] * 64
+    assert [shard.source for shard in store.route("rudder telemotor", vector)] == ["steering.pdf"]
+
+
+def test_searches_several_shards_and_merges(tmp_path):
+    docs, ids = make_chunks()
+    store = make_store(tmp_path, shards_per_query=2)
+    store.add_documents(docs, ids=ids)
+    results = store.as_retriever(search_kwargs={"k": 4}).invoke("boiler burner and engine piston")
+    assert {doc.metadata["source"] for doc in results} == {"boiler.pdf", "engine.pdf"}
+    assert len(results) == 4
+    assert all(doc.id for doc in results)
+
+
+def test_weakly_routed_manuals_do_not_displace_better_chunks(tmp_path):
+    docs, ids = make_chunks()
+    store = make_store(tmp_path, shards_per_query=3)
+    store.add_documents(docs, ids=ids)
+    results = store.similarity_search("sludge discharge from the purifier bowl", k=4)
+    assert {doc.metadata["source"] for doc in results} == {"purifier.pdf"}
+    scores = [score for _, score in store.similarity_search_by_vector_with_relevance_scores(
+        store.embeddings.embed_query("purifier bowl"), k=4, query="purifier bowl"
+    )]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_deletes_and_reopens(tmp_path):
+    docs, ids = make_chunks()
+    store = make_store(tmp_path)
+    store.add_documents(docs, ids=ids)
+    engine_ids = [doc_id for doc_id in ids if doc_id.startswith("engine.pdf")]
+    store.delete(engine_ids)
+    assert not store.shards["engine.pdf"].ids
+    assert "engine.pdf" not in [shard.source for shard in store.route("engine piston", [0.0] * 64, n=4)]
+    store.delete(["boiler.pdf-0"])
+    assert "boiler.pdf-0" not in store.shards["boiler.pdf"].ids
+
+    reopened = make_store(tmp_path)
+    assert sorted(source for source, shard in reopened.shards.items() if shard.ids) == [
+        "boiler.pdf", "purifier.pdf", "steering.pdf"
+    ]
+    stored = reopened.get(include=[])["ids"]
+    assert len(stored) == len(ids) - len(engine_ids) - 1
+    assert reopened.get(ids=["purifier.pdf-1"])["documents"][0].startswith("Maintenance of the bowl")
+
+
+def test_vector_store_sharded_hybrid_retrieval(tmp_path):
+    docs, ids = make_chunks()
+    store = VectorStore(
+        embeddings=WordEmbedding(), lexical_index_path=str(tmp_path / "bm25.json"),
+        persist_directory=str(tmp_path / "sharded_db"), backend="numpy", sharded=True,
+    )
+    store.add_documents(docs, ids=ids)
+    store.persist()
+
+    reopened = VectorStore(
+        embeddings=WordEmbedding(), lexical_index_path=str(tmp_path / "bm25.json"),
+        persist_directory=str(tmp_path / "sharded_db"), backend="numpy", sharded=True,
+    )
+    retriever = reopened.get_hybrid_retriever(dense_k=2, lexical_k=2, k=2)
+    assert retriever.invoke("crankshaft bearing")[0].metadata["source"] == "engine.pdf"
+
+
+def test_hybrid_keyword_hits_come_from_routed_manuals_only(tmp_path):
+    docs, ids = make_chunks()
+    store = VectorStore(
+        embeddings=WordEmbedding(), lexical_index_path=str(tmp_path / "bm25.json"),
+        persist_directory=str(tmp_path / "sharded_db"), backend="numpy", sharded=True,
+    )
+    store.add_documents(docs, ids=ids)
+    store.db.shards_per_query = 1
+    retriever = store.get_hybrid_retriever(dense_k=4, lexical_k=16, k=20)
+    # "telemotor" only occurs in the steering gear manual, which is not routed to.
+    results = retriever.invoke("purifier bowl sludge discharge telemotor")
+    assert results
+    assert {doc.metadata["source"] for doc in results} == {"purifier.pdf"}
+
+
+def test_chroma_shard_emptied_and_refilled(tmp_path):
+    from src.vector_db import get_backend
+    docs, ids = make_chunks()
+    store = make_store(tmp_path, shard_class=get_backend("chroma"))
+    store.add_documents(docs, ids=ids)
+    purifier_ids = [doc_id for doc_id in ids if doc_id.startswith("purifier.pdf")]
+    # Re-ingesting a modified manual deletes all of its chunks, then adds the new ones.
+    store.delete(purifier_ids)
+    assert not store.shards["purifier.pdf"].ids
+    assert all(doc.metadata["source"] != "purifier.pdf" for doc in store.similarity_search("purifier bowl", k=4))
+    store.add_documents([Document(page_content="Purifier bowl revision 2", metadata={"source": "purifier.pdf"})],
+                        ids=["purifier.pdf-new"])
+    assert store.get(ids=["purifier.pdf-new"])["documents"] == ["Purifier bowl revision 2"]
+
+    store.reset_collection()
+    store.add_documents(docs[:1], ids=ids[:1])
+    assert store.get()["ids"] == ids[:1]
@@ -0,0 +1,119 @@
+import pytest
+from src.config import Config
+from src.manifest import IngestionManifest, compute_file_hash
+from src.snapshot import (
+    SnapshotMismatchError, export_snapshot, import_snapshot, import_snapshot_at_startup, read_snapshot,
+)
+
+
+def build_index(tmp_path):
+    """Write a data folder, a fake vector database and a manifest of the PDFs."""
+    data = tmp_path / "data"
+    data.mkdir()
+    vector_dir = tmp_path / "vectors"
+    vector_dir.mkdir()
+    (vector_dir / "vectors.bin").write_bytes(b"vectors")
+    state = tmp_path / "index_state"
+    manifest = IngestionManifest(str(state / "manifest.json"))
+    for name in ("a.pdf", "b.pdf"):
+        path = data / name
+        path.write_bytes(f"%PDF {name}".encode())
+        manifest.record(str(path), compute_file_hash(path), [f"{name}-0"])
+    manifest.save()
+    return data, vector_dir, state
+
+
+def test_export_and_import_round_trip(tmp_path):
+    data, vector_dir, state = build_index(tmp_path)
+    archive = str(tmp_path / "index.tar.gz")
+    snapshot = export_snapshot(archive, str(vector_dir), str(state), str(state / "manifest.json"))
+    assert snapshot["chunks"] == 2
+    assert read_snapshot(archive)["config"]["embedding_model"] == Config.EMBEDDING_MODEL
+
+    target = tmp_path / "replica"
+    differences = import_snapshot(archive, str(target / "vectors"), str(target / "index_state"), str(data))
+    assert differences == {"added": [], "modified": [], "deleted": []}
+    assert (target / "vectors" / "vectors.bin").read_bytes() == b"vectors"
+    manifest = IngestionManifest(str(target / "index_state" / "manifest.json"))
+    assert manifest.diff([str(data / "a.pdf"), str(data / "b.pdf")]).has_changes() is False
+
+
+def test_changed_sources_are_imported_for_incremental_rebuild(tmp_path):
+    data, vector_dir, state = build_index(tmp_path)
+    archive = str(tmp_path / "index.tar.gz")
+    export_snapshot(archive, str(vector_dir), str(state), str(state / "manifest.json"))
+    (data / "b.pdf").write_bytes(b"%PDF new revision")
+    (data / "c.pdf").write_bytes(b"%PDF new manual")
+
+    target = tmp_path / "replica"
+    differences = import_snapshot(archive, str(target / "vectors"), str(target / "index_state"), str(data))
+    assert differences == {"added": ["c.pdf"], "modified": ["b.pdf"], "deleted": []}
+    # Only the changed PDFs are left for the ingestion pipeline.
+    diff = IngestionManifest(str(target / "index_state" / "manifest.json")).diff(
+        [str(data / name) for name in ("a.pdf", "b.pdf", "c.pdf")]
+    )
+    assert diff.unchanged == ["a.pdf"]
+    assert [path for path, _ in diff.modified] == [str(data / "b.pdf")]
+    assert [path for path, _ in diff.added] == [str(data / "c.pdf")]
+
+
+def test_config_mismatch_is_refused(tmp_path, monkeypatch):
+    data, vector_dir, state = build_index(tmp_path)
+    archive = str(tmp_path / "index.tar.gz")
+    export_snapshot(archive, str(vector_dir), str(state), str(state / "manifest.json"))
+    monkeypatch.setattr(Config, "CHUNK_SIZE", Config.CHUNK_SIZE + 1)
+
+    target = tmp_path / "replica"
+    with pytest.raises(SnapshotMismatchError):
+        import_snapshot(archive, str(target / "vectors"), str(target / "index_state"), str(data))
+    assert not (target / "vectors").exists()
+    # At startup the snapshot is skipped and the index is built from scratch.
+    assert import_snapshot_at_startup(archive, str(target / "vectors"), str(target / "index_state"), str(data)) is False
+
+
+def test_startup_import_keeps_existing_index(tmp_path):
+    data, vector_dir, state = build_index(tmp_path)
+    archive = str(tmp_path / "index.tar.gz")
+    export_snapshot(archive, str(vector_dir), str(state), str(state / "manifest.json"))
+
+    target = tmp_path / "replica"
+    assert import_snapshot_at_startup("", str(target / "vectors"), str(target / "index_state"), str(data)) is False
+    assert import_snapshot_at_startup(archive, str(target / "vectors"), str(target / "index_state"), str(data))
+    (target / "vectors" / "vectors.bin").write_bytes(b"updated")
+    assert import_snapshot_at_startup(archive, str(target / "vectors"), str(target / "index_state"), str(data)) is False
+    assert (target / "vectors" / "vectors.bin").read_bytes() == b"updated"
+
+
+def test_incomplete_ingestion_is_not_exported(tmp_path):
+    data, vector_dir, state = build_index(tmp_path)
+    manifest = IngestionManifest(str(state / "manifest.json"))
+    manifest.record(str(data / "a.pdf"), compute_file_hash(data / "a.pdf"), [], complete=False)
+    manifest.save()
+    with pytest.raises(ValueError):
+        export_snapshot(str(tmp_path / "index.tar.gz"), str(vector_dir), str(state), str(state / "manifest.json"))
+
+
+def test_failed_swap_restores_the_current_index(tmp_path, monkeypatch):
+    data, vector_dir, state = build_index(tmp_path)
+    archive = str(tmp_path / "index.tar.gz")
+    export_snapshot(archive, str(vector_dir), str(state), str(state / "manifest.json"))
+    target = tmp_path / "replica"
+    (target / "vectors").mkdir(parents=True)
+    (target / "vectors" / "vectors.bin").write_bytes(b"current")
+    (target / "index_state").mkdir()
+    (target / "index_state" / "manifest.json").write_text("{}")
+
+    import shutil
+    move = shutil.move
+    def failing_move(source, destination):
+        # The vector database is swapped in, then the index state fails.
+        if str(destination).endswith("index_state"):
+            raise OSError("disk full")
+        return move(source, destination)
+    monkeypatch.setattr("src.snapshot.shutil.move", failing_move)
+
+    with pytest.raises(OSError):
+        import_snapshot(archive, str(target / "vectors"), str(target / "index_state"), str(data))
+    assert (target / "vectors" / "vectors.bin").read_bytes() == b"current"
+    assert (target / "index_state" / "manifest.json").read_text() == "{}"
+    assert sorted(path.name for path in target.iterdir()) == ["index_state", "vectors"]
@@ -0,0 +1,71 @@
+import json
+import logging
+import pytest
+from src.telemetry import NOOP_SPAN, Telemetry, telemetry
+from tests.helpers import make_engine
+
+@pytest.fixture
+def enabled_telemetry():
+    telemetry.reset()
+    telemetry.enabled = True
+    yield telemetry
+    telemetry.enabled = False
+    telemetry.reset()
+
+def test_disabled_telemetry_records_nothing():
+    metrics = Telemetry(enabled=False)
+    assert metrics.span("split") is NOOP_SPAN
+    with metrics.span("split"):
+        pass
+    metrics.count("chunks", 3)
+    metrics.observe("ocr_page", 0.5)
+    assert metrics.snapshot() == {"counters": {}, "durations": {}}
+
+def test_spans_and_counters_are_exported_for_prometheus():
+    metrics = Telemetry(enabled=True)
+    with metrics.span("search", kind="dense"):
+        pass
+    metrics.observe("search", 0.2, kind="dense")
+    metrics.count("chunks", 3)
+    metrics.count("chunks", 2)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"chunks": 5}
+    assert snapshot["durations"]['search{kind="dense"}']["count"] == 2
+
+    text = metrics.render_prometheus()
+    assert "# TYPE ship_ai_chunks_total counter" in text
+    assert "ship_ai_chunks_total 5" in text
+    assert 'ship_ai_search_seconds_bucket{kind="dense",le="0.25"} 2' in text
+    assert 'ship_ai_search_seconds_bucket{kind="dense",le="+Inf"} 2' in text
+    assert 'ship_ai_search_seconds_count{kind="dense"} 2' in text
+
+def test_failed_spans_are_labelled_with_the_error():
+    metrics = Telemetry(enabled=True)
+    with pytest.raises(ValueError):
+        with metrics.span("upsert"):
+            raise ValueError("boom")
+    assert 'upsert{error="ValueError"}' in metrics.snapshot()["durations"]
+
+def test_json_logs(caplog):
+    metrics = Telemetry(enabled=True, json_logs=True)
+    with caplog.at_level(logging.INFO, logger="src.telemetry"):
+        metrics.count("queries")
+    assert json.loads(caplog.records[-1].getMessage()) == {"metric": "queries", "count": 1}
+
+def test_query_stages_and_tokens_are_recorded(enabled_telemetry):
+    engine, _, _ = make_engine(["Unscrew the nuts."])
+    engine.query("How to remove the cylinder head?")
+    snapshot = enabled_telemetry.snapshot()
+    assert snapshot["counters"]["queries"] == 1
+    assert snapshot["counters"]['llm_tokens{direction="out"}'] == 3
+    assert 'query_stage{stage="generate"}' in snapshot["durations"]
+    assert 'query_stage{stage="retrieve"}' in snapshot["durations"]
+
+def test_split_is_recorded(enabled_telemetry):
+    from langchain.schema import Document
+    from src.pdf_processor import PDFProcessor
+    chunks = PDFProcessor().split_documents([Document(page_content="text", metadata={"source": "a.pdf", "page": 1})])
+    snapshot = enabled_telemetry.snapshot()
+    assert snapshot["counters"]["chunks"] == len(chunks)
+    assert snapshot["durations"]["split"]["count"] == 1
@@ -2,9 +2,20 @@ import streamlit as st
 from src.ui import run_ui
 
 # A dummy query engine that returns a predictable answer.
+class DummyStream:
+    def __init__(self, answer):
+        self.tokens = answer.split(" ")
+        self.answer = answer
+        self.timings = {"first_token": 0.1}
+    def __iter__(self):
+        for i, token in enumerate(self.tokens):
+            yield token if i == 0 else " " + token
+
 class DummyQueryEngine:
     def query(self, question):
         return "Dummy response for: " + question
+    def stream(self, question):
+        return DummyStream("Dummy response for: " + question)
 
 def test_run_ui(monkeypatch):
     # Ensure that session_state and messages exist.
@@ -28,6 +39,10 @@ def test_run_ui(monkeypatch):
         class DummyMessage:
             def markdown(self, content):
                 captured_messages.append((role, content))
+            def write_stream(self, stream):
+                content = "".join(stream)
+                captured_messages.append((role, content))
+                return content
         return DummyMessage()
     monkeypatch.setattr(st, "chat_message", dummy_chat_message)
 
@@ -37,4 +52,7 @@ def test_run_ui(monkeypatch):
     # Check that both a user and an assistant message have been added.
     roles = [role for role, content in captured_messages]
     assert "user" in roles
-    assert "assistant" in roles
\ No newline at end of file
+    assert "assistant" in roles
+    # The streamed answer is stored as the final assistant message.
+    assert ("assistant", "Dummy response for: Test message") in captured_messages
+    assert st.session_state.messages[-1] == {"role": "assistant", "content": "Dummy response for: Test message"}
\ No newline at end of file
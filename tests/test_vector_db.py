@@ -1,5 +1,6 @@
 from src.vector_db import VectorStore
 from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
 
 # A dummy Chroma class that mimics the interface used by VectorStore.
 class DummyChroma:
@@ -7,13 +8,29 @@ class DummyChroma:
         self.persist_directory = persist_directory
         self.embedding_function = embedding_function
         self.docs = []
+        self.ids = []
     @classmethod
-    def from_documents(cls, docs, embedding, persist_directory):
+    def from_documents(cls, docs, embedding, persist_directory, ids=None):
         instance = cls(persist_directory, embedding)
         instance.docs = docs
+        instance.ids = list(ids or [])
         return instance
-    def as_retriever(self):
+    def add_documents(self, docs, ids=None):
+        self.docs.extend(docs)
+        self.ids.extend(ids or [])
+    def get(self, ids=None, include=None):
+        selected = [(i, d) for i, d in zip(self.ids, self.docs) if ids is None or i in ids]
+        return {
+            "ids": [i for i, _ in selected],
+            "documents": [d.page_content for _, d in selected],
+            "metadatas": [d.metadata for _, d in selected],
+        }
+    def as_retriever(self, search_kwargs=None):
         return "dummy_retriever"
+    def delete(self, ids=None):
+        keep = [(i, d) for i, d in zip(self.ids, self.docs) if i not in ids]
+        self.ids = [i for i, _ in keep]
+        self.docs = [d for _, d in keep]
 
 def test_create_db(monkeypatch, tmp_path):
     # Replace the real Chroma class with our dummy.
@@ -47,4 +64,63 @@ def test_get_retriever(monkeypatch, tmp_path):
     docs = [Document(page_content="Test", metadata={"source": "dummy.pdf", "page": 1})]
     store.create_db(docs)
     retriever = store.get_retriever()
-    assert retriever == "dummy_retriever"
\ No newline at end of file
+    assert retriever == "dummy_retriever"
+
+def test_add_and_delete_documents(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.vector_db.Chroma", DummyChroma)
+    store = VectorStore(persist_directory=str(tmp_path / "chroma_db"))
+    first = [Document(page_content="One", metadata={"source": "a.pdf", "page": 1})]
+    second = [Document(page_content="Two", metadata={"source": "b.pdf", "page": 1})]
+    store.add_documents(first, ids=["a-0"])
+    store.add_documents(second, ids=["b-0"])
+    assert store.db.ids == ["a-0", "b-0"]
+
+    store.delete_documents(["a-0"])
+    assert store.db.docs == second
+
+
+# A dense retriever that returns the stored documents in insertion order.
+class InsertionOrderRetriever(BaseRetriever):
+    store: object
+    k: int
+    def _get_relevant_documents(self, query, *, run_manager):
+        return [
+            Document(page_content=d.page_content, metadata=d.metadata, id=i)
+            for i, d in zip(self.store.ids, self.store.docs)
+        ][:self.k]
+
+class RetrievingChroma(DummyChroma):
+    def as_retriever(self, search_kwargs=None):
+        return InsertionOrderRetriever(store=self, k=search_kwargs["k"])
+
+def test_hybrid_retriever_finds_exact_codes(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.vector_db.Chroma", RetrievingChroma)
+    store = VectorStore(
+        persist_directory=str(tmp_path / "chroma_db"),
+        lexical_index_path=str(tmp_path / "bm25.json"),
+    )
+    docs = [
+        Document(page_content=f"General maintenance notes {i}.", metadata={"source": "a.pdf", "page": i})
+        for i in range(1, 5)
+    ]
+    docs.append(Document(page_content="Close valve V-231 before ALM 4012 reset.", metadata={"source": "b.pdf", "page": 9}))
+    store.add_documents(docs, ids=[f"id-{i}" for i in range(5)])
+
+    retriever = store.get_hybrid_retriever(dense_k=2, lexical_k=2, k=3)
+    results = retriever.invoke("What does alarm ALM4012 mean for v231?")
+    # The dense side alone only returns the first two chunks.
+    assert 9 in [doc.metadata["page"] for doc in results]
+    assert len(results) == 3
+
+    # The lexical index is persisted and reloaded to match the collection.
+    store.persist()
+    reopened = VectorStore(
+        persist_directory=str(tmp_path / "chroma_db"),
+        lexical_index_path=str(tmp_path / "bm25.json"),
+    )
+    reopened.db = store.db
+    reopened.ensure_lexical_index()
+    assert len(reopened.lexical_index) == 5
+
+    store.delete_documents(["id-4"])
+    assert store.lexical_index.search("V-231") == []